@@ -3,165 +3,10 @@ class ARMCoreArm:
     def __init__(self, cpu):
         self.cpu = cpu
 
-        self.addressingMode23Immediate = [
-            # 000x0
-            lambda rn, offset, condOp: (
-                lambda: (
-                    self.cpu.gprs.__setitem__(rn, self.cpu.gprs[rn] - offset) if not condOp or condOp() else None
-                )
-            ),
-            # 000xW
-            None,
-            None,
-            None,
-            # 00Ux0
-            lambda rn, offset, condOp: (
-                lambda: (
-                    self.cpu.gprs.__setitem__(rn, self.cpu.gprs[rn] + offset) if not condOp or condOp() else None
-                )
-            ),
-            # 00UxW
-            None,
-            None,
-            None,
-            # 0P0x0
-            lambda rn, offset, condOp: (
-                lambda: (
-                    self.cpu.gprs.__setitem__(rn, self.cpu.gprs[rn] - offset)
-                )
-            ),
-            # 0P0xW
-            lambda rn, offset, condOp: (
-                lambda: (
-                    self.cpu.gprs.__setitem__(rn, self.cpu.gprs[rn] - offset) if not condOp or condOp() else None
-                )
-            ),
-            None,
-            None,
-            # 0PUx0
-            lambda rn, offset, condOp: (
-                lambda: (
-                    self.cpu.gprs.__setitem__(rn, self.cpu.gprs[rn] + offset)
-                )
-            ),
-            # 0PUxW
-            lambda rn, offset, condOp: (
-                lambda: (
-                    self.cpu.gprs.__setitem__(rn, self.cpu.gprs[rn] + offset) if not condOp or condOp() else None
-                )
-            ),
-            None,
-            None
-        ]
-
-        self.addressingMode23Register = [
-            # I00x0
-            lambda rn, rm, condOp: (
-                lambda: (
-                    self.cpu.gprs.__setitem__(rn, self.cpu.gprs[rn] - self.cpu.gprs[rm]) if not condOp or condOp() else None
-                )
-            ),
-            # I00xW
-            None,
-            None,
-            None,
-            # I0Ux0
-            lambda rn, rm, condOp: (
-                lambda: (
-                    self.cpu.gprs.__setitem__(rn, self.cpu.gprs[rn] + self.cpu.gprs[rm]) if not condOp or condOp() else None
-                )
-            ),
-            # I0UxW
-            None,
-            None,
-            None,
-            # IP0x0
-            lambda rn, rm, condOp: (
-                lambda: (
-                    self.cpu.gprs.__setitem__(rn, self.cpu.gprs[rn] - self.cpu.gprs[rm])
-                )
-            ),
-            # IP0xW
-            lambda rn, rm, condOp: (
-                lambda: (
-                    self.cpu.gprs.__setitem__(rn, self.cpu.gprs[rn] - self.cpu.gprs[rm]) if not condOp or condOp() else None
-                )
-            ),
-            None,
-            None,
-            # IPUx0
-            lambda rn, rm, condOp: (
-                lambda: (
-                    self.cpu.gprs.__setitem__(rn, self.cpu.gprs[rn] + self.cpu.gprs[rm])
-                )
-            ),
-            # IPUxW
-            lambda rn, rm, condOp: (
-                lambda: (
-                    self.cpu.gprs.__setitem__(rn, self.cpu.gprs[rn] + self.cpu.gprs[rm]) if not condOp or condOp() else None
-                )
-            ),
-            None,
-            None
-        ]
-
-        self.addressingMode2RegisterShifted = [
-            # I00x0
-            lambda rn, shiftOp, condOp: (
-                lambda: (
-                    self.cpu.gprs.__setitem__(rn, self.cpu.gprs[rn] - self.cpu.shifterOperand) if not condOp or condOp() else None
-                )
-            ),
-            # I00xW
-            None,
-            None,
-            None,
-            # I0Ux0
-            lambda rn, shiftOp, condOp: (
-                lambda: (
-                    self.cpu.gprs.__setitem__(rn, self.cpu.gprs[rn] + self.cpu.shifterOperand) if not condOp or condOp() else None
-                )
-            ),
-            # I0UxW
-            None,
-            None,
-            None,
-            # IP0x0
-            lambda rn, shiftOp, condOp: (
-                lambda: (
-                    self.cpu.gprs.__setitem__(rn, self.cpu.gprs[rn] - self.cpu.shifterOperand)
-                )
-            ),
-            # IP0xW
-            lambda rn, shiftOp, condOp: (
-                lambda: (
-                    self.cpu.gprs.__setitem__(rn, self.cpu.gprs[rn] - self.cpu.shifterOperand) if not condOp or condOp() else None
-                )
-            ),
-            None,
-            None,
-            # IPUx0
-            lambda rn, shiftOp, condOp: (
-                lambda: (
-                    self.cpu.gprs.__setitem__(rn, self.cpu.gprs[rn] + self.cpu.shifterOperand)
-                )
-            ),
-            # IPUxW
-            lambda rn, shiftOp, condOp: (
-                lambda: (
-                    self.cpu.gprs.__setitem__(rn, self.cpu.gprs[rn] + self.cpu.shifterOperand) if not condOp or condOp() else None
-                )
-            ),
-            None,
-            None
-        ]
-
-        
-    def constructAddressingMode1ASR(rs, rm):
-        
+    def constructAddressingMode1ASR(self, rs, rm):
+        cpu = self.cpu
+        gprs = cpu.gprs
         def addressing_mode():
-            global cpu
-            global gprs
             cpu.cycles += 1
             shift = gprs[rs]
             if rs == cpu.PC:
@@ -172,7 +17,7 @@ class ARMCoreArm:
                 shift_val += 4
             if shift == 0:
                 cpu.shifterOperand = shift_val
-                cpu.shifterCarryOut = cpu.cpsrC
+                cpu.shifterCarryOut = None
             elif shift < 32:
                 cpu.shifterOperand = shift_val >> shift
                 cpu.shifterCarryOut = shift_val & (1 << (shift - 1))
@@ -184,24 +29,24 @@ class ARMCoreArm:
                 cpu.shifterCarryOut = 0
         return addressing_mode
 
-    def constructAddressingMode1Immediate(immediate):
+    def constructAddressingMode1Immediate(self, immediate):
+        cpu = self.cpu
         def addressing_mode():
-            global cpu
             cpu.shifterOperand = immediate
-            cpu.shifterCarryOut = cpu.cpsrC
+            cpu.shifterCarryOut = None
         return addressing_mode
 
-    def constructAddressingMode1ImmediateRotate(immediate, rotate):
+    def constructAddressingMode1ImmediateRotate(self, immediate, rotate):
+        cpu = self.cpu
         def addressing_mode():
-            global cpu
-            cpu.shifterOperand = (immediate >> rotate) | (immediate << (32 - rotate))
+            cpu.shifterOperand = ((immediate >> rotate) | (immediate << (32 - rotate))) & 0xffffffff
             cpu.shifterCarryOut = cpu.shifterOperand >> 31
         return addressing_mode
 
-    def constructAddressingMode1LSL(rs, rm):
+    def constructAddressingMode1LSL(self, rs, rm):
+        cpu = self.cpu
+        gprs = cpu.gprs
         def addressing_mode():
-            global cpu
-            global gprs
             cpu.cycles += 1
             shift = gprs[rs]
             if rs == cpu.PC:
@@ -212,7 +57,7 @@ class ARMCoreArm:
                 shift_val += 4
             if shift == 0:
                 cpu.shifterOperand = shift_val
-                cpu.shifterCarryOut = cpu.cpsrC
+                cpu.shifterCarryOut = None
             elif shift < 32:
                 cpu.shifterOperand = shift_val << shift
                 cpu.shifterCarryOut = shift_val & (1 << (32 - shift))
@@ -224,10 +69,10 @@ class ARMCoreArm:
                 cpu.shifterCarryOut = 0
         return addressing_mode
 
-    def constructAddressingMode1LSR(rs, rm):
+    def constructAddressingMode1LSR(self, rs, rm):
+        cpu = self.cpu
+        gprs = cpu.gprs
         def addressing_mode():
-            global cpu
-            global gprs
             cpu.cycles += 1
             shift = gprs[rs]
             if rs == cpu.PC:
@@ -238,7 +83,7 @@ class ARMCoreArm:
                 shift_val += 4
             if shift == 0:
                 cpu.shifterOperand = shift_val
-                cpu.shifterCarryOut = cpu.cpsrC
+                cpu.shifterCarryOut = None
             elif shift < 32:
                 cpu.shifterOperand = shift_val >> shift
                 cpu.shifterCarryOut = shift_val & (1 << (shift - 1))
@@ -250,10 +95,10 @@ class ARMCoreArm:
                 cpu.shifterCarryOut = 0
         return addressing_mode
 
-    def constructAddressingMode1ROR(rs, rm):
+    def constructAddressingMode1ROR(self, rs, rm):
+        cpu = self.cpu
+        gprs = cpu.gprs
         def addressing_mode():
-            global cpu
-            global gprs
             cpu.cycles += 1
             shift = gprs[rs]
             if rs == cpu.PC:
@@ -265,7 +110,7 @@ class ARMCoreArm:
             rotate = shift & 0x1f
             if shift == 0:
                 cpu.shifterOperand = shift_val
-                cpu.shifterCarryOut = cpu.cpsrC
+                cpu.shifterCarryOut = None
             elif rotate:
                 cpu.shifterOperand = (gprs[rm] >> rotate) | (gprs[rm] << (32 - rotate))
                 cpu.shifterCarryOut = shift_val & (1 << (rotate - 1))
@@ -274,30 +119,106 @@ class ARMCoreArm:
                 cpu.shifterCarryOut = shift_val >> 31
         return addressing_mode
 
-    def constructAddressingMode23Immediate(instruction, immediate, condOp):
+    def constructAddressingMode23Immediate(self, instruction, immediate, condOp):
+        cpu = self.cpu
+        gprs = cpu.gprs
         rn = (instruction & 0x000f0000) >> 16
-        return addressingMode23Immediate[(instruction & 0x01a00000) >> 21](rn, immediate, condOp)
-
-    def constructAddressingMode23Register(instruction, rm, condOp):
+        offset = immediate if instruction & 0x00800000 else -immediate
+        if not (instruction & 0x01000000):
+            def address():
+                addr = gprs[rn] & 0xffffffff
+                gprs[rn] = (addr + offset) & 0xffffffff
+                return addr
+            address.writesPC = rn == cpu.PC
+        elif instruction & 0x00200000:
+            def address():
+                addr = (gprs[rn] + offset) & 0xffffffff
+                gprs[rn] = addr
+                return addr
+            address.writesPC = rn == cpu.PC
+        else:
+            def address():
+                return (gprs[rn] + offset) & 0xffffffff
+            address.writesPC = False
+        return address
+
+    def constructAddressingMode23Register(self, instruction, rm, condOp):
+        cpu = self.cpu
+        gprs = cpu.gprs
         rn = (instruction & 0x000f0000) >> 16
-        return addressingMode23Register[(instruction & 0x01a00000) >> 21](rn, rm, condOp)
-
-    def constructAddressingMode2RegisterShifted(instruction, shiftOp, condOp):
+        up = instruction & 0x00800000
+        if not (instruction & 0x01000000):
+            def address():
+                addr = gprs[rn] & 0xffffffff
+                if up:
+                    gprs[rn] = (addr + gprs[rm]) & 0xffffffff
+                else:
+                    gprs[rn] = (addr - gprs[rm]) & 0xffffffff
+                return addr
+            address.writesPC = rn == cpu.PC
+        elif instruction & 0x00200000:
+            def address():
+                if up:
+                    addr = (gprs[rn] + gprs[rm]) & 0xffffffff
+                else:
+                    addr = (gprs[rn] - gprs[rm]) & 0xffffffff
+                gprs[rn] = addr
+                return addr
+            address.writesPC = rn == cpu.PC
+        else:
+            def address():
+                if up:
+                    return (gprs[rn] + gprs[rm]) & 0xffffffff
+                return (gprs[rn] - gprs[rm]) & 0xffffffff
+            address.writesPC = False
+        return address
+
+    def constructAddressingMode2RegisterShifted(self, instruction, shiftOp, condOp):
+        cpu = self.cpu
+        gprs = cpu.gprs
         rn = (instruction & 0x000f0000) >> 16
-        return addressingMode2RegisterShifted[(instruction & 0x01a00000) >> 21](rn, shiftOp, condOp)
-
-    def constructAddressingMode4(immediate, rn):
+        up = instruction & 0x00800000
+        if not (instruction & 0x01000000):
+            def address():
+                addr = gprs[rn] & 0xffffffff
+                shiftOp()
+                if up:
+                    gprs[rn] = (addr + cpu.shifterOperand) & 0xffffffff
+                else:
+                    gprs[rn] = (addr - cpu.shifterOperand) & 0xffffffff
+                return addr
+            address.writesPC = rn == cpu.PC
+        elif instruction & 0x00200000:
+            def address():
+                shiftOp()
+                if up:
+                    addr = (gprs[rn] + cpu.shifterOperand) & 0xffffffff
+                else:
+                    addr = (gprs[rn] - cpu.shifterOperand) & 0xffffffff
+                gprs[rn] = addr
+                return addr
+            address.writesPC = rn == cpu.PC
+        else:
+            def address():
+                shiftOp()
+                if up:
+                    return (gprs[rn] + cpu.shifterOperand) & 0xffffffff
+                return (gprs[rn] - cpu.shifterOperand) & 0xffffffff
+            address.writesPC = False
+        return address
+
+    def constructAddressingMode4(self, immediate, rn):
+        cpu = self.cpu
+        gprs = cpu.gprs
         def addressing_mode():
-            global cpu
-            global gprs
             addr = gprs[rn] + immediate
             return addr
         return addressing_mode
 
-    def constructAddressingMode4Writeback(immediate, offset, rn, overlap):
+    def constructAddressingMode4Writeback(self, immediate, offset, rn, overlap):
+        cpu = self.cpu
+        gprs = cpu.gprs
         def addressing_mode(write_initial):
-            global cpu
-            global gprs
             addr = gprs[rn] + immediate
             if write_initial and overlap:
                 cpu.mmu.store32(gprs[rn] + immediate - 4, gprs[rn])
@@ -305,144 +226,157 @@ class ARMCoreArm:
             return addr
         return addressing_mode
 
-    def constructADC(rd, rn, shiftOp, condOp):
+    def constructADC(self, rd, rn, shiftOp, condOp):
+        cpu = self.cpu
+        gprs = cpu.gprs
         def adc():
-            global cpu
-            global gprs
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             shiftOp()
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             shifter_operand = (cpu.shifterOperand & 0xffffffff) + int(cpu.cpsrC)
             gprs[rd] = (gprs[rn] & 0xffffffff) + shifter_operand
         return adc
 
-    def constructADCS(rd, rn, shiftOp, condOp):
+    def constructADCS(self, rd, rn, shiftOp, condOp):
+        cpu = self.cpu
+        gprs = cpu.gprs
         def adcs():
-            global cpu
-            global gprs
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             shiftOp()
-            shifter_operand = (cpu.shifterOperand & 0xffffffff) + int(cpu.cpsrC)
-            d = (gprs[rn] & 0xffffffff) + shifter_operand
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
+            n = gprs[rn] & 0xffffffff
+            m = cpu.shifterOperand & 0xffffffff
+            d = n + m + (1 if cpu.cpsrC else 0)
             if rd == cpu.PC and cpu.hasSPSR():
                 cpu.unpackCPSR(cpu.spsr)
             else:
-                cpu.cpsrN = d >> 31
-                cpu.cpsrZ = not (d & 0xffffffff)
-                cpu.cpsrC = d > 0xffffffff
-                cpu.cpsrV = (gprs[rn] >> 31 == shifter_operand >> 31 and
-                            gprs[rn] >> 31 != d >> 31 and
-                            shifter_operand >> 31 != d >> 31)
-            gprs[rd] = d
+                cpu.lazyFlags = (cpu.FLAGS_ADD, n, m, d)
+            gprs[rd] = d & 0xffffffff
         return adcs
 
-    def constructADD(rd, rn, shiftOp, condOp):
+    def constructADD(self, rd, rn, shiftOp, condOp):
+        cpu = self.cpu
+        gprs = cpu.gprs
         def add():
-            global cpu
-            global gprs
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             shiftOp()
             gprs[rd] = (gprs[rn] & 0xffffffff) + (cpu.shifterOperand & 0xffffffff)
         return add
 
-    def constructADDS(rd, rn, shiftOp, condOp):
+    def constructADDS(self, rd, rn, shiftOp, condOp):
+        cpu = self.cpu
+        gprs = cpu.gprs
         def adds():
-            global cpu
-            global gprs
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             shiftOp()
-            d = (gprs[rn] & 0xffffffff) + (cpu.shifterOperand & 0xffffffff)
+            n = gprs[rn] & 0xffffffff
+            m = cpu.shifterOperand & 0xffffffff
+            d = n + m
             if rd == cpu.PC and cpu.hasSPSR():
                 cpu.unpackCPSR(cpu.spsr)
             else:
-                cpu.cpsrN = d >> 31
-                cpu.cpsrZ = not (d & 0xffffffff)
-                cpu.cpsrC = d > 0xffffffff
-                cpu.cpsrV = (gprs[rn] >> 31 == cpu.shifterOperand >> 31 and
-                            gprs[rn] >> 31 != d >> 31 and
-                            cpu.shifterOperand >> 31 != d >> 31)
-            gprs[rd] = d
+                cpu.lazyFlags = (cpu.FLAGS_ADD, n, m, d)
+            gprs[rd] = d & 0xffffffff
         return adds
 
-    def constructAND(rd, rn, shiftOp, condOp):
+    def constructAND(self, rd, rn, shiftOp, condOp):
+        cpu = self.cpu
+        gprs = cpu.gprs
         def and_():
-            global cpu
-            global gprs
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             shiftOp()
-            gprs[rd] = gprs[rn] & cpu.shifterOperand
+            gprs[rd] = gprs[rn] & cpu.shifterOperand & 0xffffffff
         return and_
 
-    def constructANDS(rd, rn, shiftOp, condOp):
+    def constructANDS(self, rd, rn, shiftOp, condOp):
+        cpu = self.cpu
+        gprs = cpu.gprs
         def ands():
-            global cpu
-            global gprs
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             shiftOp()
-            gprs[rd] = gprs[rn] & cpu.shifterOperand
+            gprs[rd] = gprs[rn] & cpu.shifterOperand & 0xffffffff
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             if rd == cpu.PC and cpu.hasSPSR():
                 cpu.unpackCPSR(cpu.spsr)
             else:
                 cpu.cpsrN = gprs[rd] >> 31
                 cpu.cpsrZ = not (gprs[rd] & 0xffffffff)
-                cpu.cpsrC = cpu.shifterCarryOut
+                if cpu.shifterCarryOut is not None:
+                    cpu.cpsrC = cpu.shifterCarryOut
         return ands
 
-    def constructB(immediate, condOp):
+    def constructB(self, immediate, condOp):
+        cpu = self.cpu
+        gprs = cpu.gprs
         def b():
-            global cpu
-            global gprs
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 cpu.mmu.waitPrefetch32(gprs[cpu.PC])
                 return
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
             gprs[cpu.PC] += immediate
         return b
 
-    def constructBIC(rd, rn, shiftOp, condOp):
+    def constructBIC(self, rd, rn, shiftOp, condOp):
+        cpu = self.cpu
+        gprs = cpu.gprs
         def bic():
-            global cpu
-            global gprs
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             shiftOp()
-            gprs[rd] = gprs[rn] & ~cpu.shifterOperand
+            gprs[rd] = gprs[rn] & ~cpu.shifterOperand & 0xffffffff
         return bic
 
-    def constructBICS(rd, rn, shiftOp, condOp):
+    def constructBICS(self, rd, rn, shiftOp, condOp):
+        cpu = self.cpu
+        gprs = cpu.gprs
         def bics():
-            global cpu
-            global gprs
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             shiftOp()
-            gprs[rd] = gprs[rn] & ~cpu.shifterOperand
+            gprs[rd] = gprs[rn] & ~cpu.shifterOperand & 0xffffffff
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             if rd == cpu.PC and cpu.hasSPSR():
                 cpu.unpackCPSR(cpu.spsr)
             else:
                 cpu.cpsrN = gprs[rd] >> 31
                 cpu.cpsrZ = not (gprs[rd] & 0xffffffff)
-                cpu.cpsrC = cpu.shifterCarryOut
+                if cpu.shifterCarryOut is not None:
+                    cpu.cpsrC = cpu.shifterCarryOut
         return bics
 
-    def constructBL(immediate, condOp):
+    def constructBL(self, immediate, condOp):
+        cpu = self.cpu
+        gprs = cpu.gprs
         def bl():
-            global cpu
-            global gprs
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 cpu.mmu.waitPrefetch32(gprs[cpu.PC])
                 return
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
@@ -450,11 +384,12 @@ class ARMCoreArm:
             gprs[cpu.PC] += immediate
         return bl
 
-    def constructBX(rm, condOp):
+    def constructBX(self, rm, condOp):
+        cpu = self.cpu
+        gprs = cpu.gprs
         def bx():
-            global cpu
-            global gprs
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 cpu.mmu.waitPrefetch32(gprs[cpu.PC])
                 return
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
@@ -462,74 +397,75 @@ class ARMCoreArm:
             gprs[cpu.PC] = gprs[rm] & 0xfffffffe
         return bx
 
-    def constructCMN(rd, rn, shiftOp, condOp):
+    def constructCMN(self, rd, rn, shiftOp, condOp):
+        cpu = self.cpu
+        gprs = cpu.gprs
         def cmn():
-            global cpu
-            global gprs
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             shiftOp()
-            alu_out = (gprs[rn] & 0xffffffff) + (cpu.shifterOperand & 0xffffffff)
-            cpu.cpsrN = alu_out >> 31
-            cpu.cpsrZ = not (alu_out & 0xffffffff)
-            cpu.cpsrC = alu_out > 0xffffffff
-            cpu.cpsrV = (gprs[rn] >> 31 == cpu.shifterOperand >> 31 and
-                        gprs[rn] >> 31 != alu_out >> 31 and
-                        cpu.shifterOperand >> 31 != alu_out >> 31)
+            n = gprs[rn] & 0xffffffff
+            m = cpu.shifterOperand & 0xffffffff
+            cpu.lazyFlags = (cpu.FLAGS_ADD, n, m, n + m)
         return cmn
 
-    def constructCMP(rd, rn, shiftOp, condOp):
+    def constructCMP(self, rd, rn, shiftOp, condOp):
+        cpu = self.cpu
+        gprs = cpu.gprs
         def cmp():
-            global cpu
-            global gprs
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             shiftOp()
-            alu_out = gprs[rn] - cpu.shifterOperand
-            cpu.cpsrN = alu_out >> 31
-            cpu.cpsrZ = not (alu_out & 0xffffffff)
-            cpu.cpsrC = gprs[rn] & 0xffffffff >= cpu.shifterOperand & 0xffffffff
-            cpu.cpsrV = (gprs[rn] >> 31 != cpu.shifterOperand >> 31 and
-                        gprs[rn] >> 31 != alu_out >> 31)
+            n = gprs[rn] & 0xffffffff
+            m = cpu.shifterOperand & 0xffffffff
+            cpu.lazyFlags = (cpu.FLAGS_SUB, n, m, n - m)
         return cmp
 
-    def constructEOR(rd, rn, shiftOp, condOp):
+    def constructEOR(self, rd, rn, shiftOp, condOp):
+        cpu = self.cpu
+        gprs = cpu.gprs
         def eor():
-            global cpu
-            global gprs
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             shiftOp()
-            gprs[rd] = gprs[rn] ^ cpu.shifterOperand
+            gprs[rd] = (gprs[rn] ^ cpu.shifterOperand) & 0xffffffff
         return eor
 
-    def constructEORS(rd, rn, shiftOp, condOp):
+    def constructEORS(self, rd, rn, shiftOp, condOp):
+        cpu = self.cpu
+        gprs = cpu.gprs
         def eors():
-            global cpu
-            global gprs
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             shiftOp()
-            gprs[rd] = gprs[rn] ^ cpu.shifterOperand
+            gprs[rd] = (gprs[rn] ^ cpu.shifterOperand) & 0xffffffff
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             if rd == cpu.PC and cpu.hasSPSR():
                 cpu.unpackCPSR(cpu.spsr)
             else:
                 cpu.cpsrN = gprs[rd] >> 31
                 cpu.cpsrZ = not (gprs[rd] & 0xffffffff)
-                cpu.cpsrC = cpu.shifterCarryOut
+                if cpu.shifterCarryOut is not None:
+                    cpu.cpsrC = cpu.shifterCarryOut
         return eors
 
-    def constructLDM(rs, address, condOp):
+    def constructLDM(self, rs, address, condOp):
+        cpu = self.cpu
+        gprs = cpu.gprs
+        mmu = cpu.mmu
         def ldm():
-            global cpu
-            global gprs
-            global mmu
             mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             addr = address(False)
             total = 0
@@ -545,13 +481,14 @@ class ARMCoreArm:
             cpu.cycles += 1
         return ldm
     
-    def constructLDMS(rs, address, condOp):
+    def constructLDMS(self, rs, address, condOp):
         cpu = self.cpu
         gprs = cpu.gprs
         mmu = cpu.mmu
         def ldms():
             mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             addr = address(False)
             total = 0
@@ -570,12 +507,13 @@ class ARMCoreArm:
             cpu.cycles += 1
         return ldms
 
-    def constructLDR(rd, address, condOp):
+    def constructLDR(self, rd, address, condOp):
         cpu = self.cpu
         gprs = cpu.gprs
         def ldr():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             addr = address()
             gprs[rd] = cpu.mmu.load32(addr)
@@ -583,12 +521,13 @@ class ARMCoreArm:
             cpu.cycles += 1
         return ldr
 
-    def constructLDRB(rd, address, condOp):
+    def constructLDRB(self, rd, address, condOp):
         cpu = self.cpu
         gprs = cpu.gprs
         def ldrb():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             addr = address()
             gprs[rd] = cpu.mmu.loadU8(addr)
@@ -596,12 +535,13 @@ class ARMCoreArm:
             cpu.cycles += 1
         return ldrb
 
-    def constructLDRH(rd, address, condOp):
+    def constructLDRH(self, rd, address, condOp):
         cpu = self.cpu
         gprs = cpu.gprs
         def ldrh():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             addr = address()
             gprs[rd] = cpu.mmu.loadU16(addr)
@@ -609,12 +549,13 @@ class ARMCoreArm:
             cpu.cycles += 1
         return ldrh
 
-    def constructLDRSB(rd, address, condOp):
+    def constructLDRSB(self, rd, address, condOp):
         cpu = self.cpu
         gprs = cpu.gprs
         def ldrsb():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             addr = address()
             gprs[rd] = cpu.mmu.load8(addr)
@@ -622,12 +563,13 @@ class ARMCoreArm:
             cpu.cycles += 1
         return ldrsb
 
-    def constructLDRSH(rd, address, condOp):
+    def constructLDRSH(self, rd, address, condOp):
         cpu = self.cpu
         gprs = cpu.gprs
         def ldrsh():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             addr = address()
             gprs[rd] = cpu.mmu.load16(addr)
@@ -635,12 +577,13 @@ class ARMCoreArm:
             cpu.cycles += 1
         return ldrsh
 
-    def constructMLA(rd, rn, rs, rm, condOp):
+    def constructMLA(self, rd, rn, rs, rm, condOp):
         cpu = self.cpu
         gprs = cpu.gprs
         def mla():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             cpu.cycles += 1
             cpu.mmu.waitMul(rs)
@@ -652,12 +595,13 @@ class ARMCoreArm:
                 gprs[rd] = gprs[rm] * gprs[rs] + gprs[rn]
         return mla
 
-    def constructMLAS(rd, rn, rs, rm, condOp):
+    def constructMLAS(self, rd, rn, rs, rm, condOp):
         cpu = self.cpu
         gprs = cpu.gprs
         def mlas():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             cpu.cycles += 1
             cpu.mmu.waitMul(rs)
@@ -667,44 +611,52 @@ class ARMCoreArm:
                 gprs[rd] = (hi + lo + gprs[rn]) & 0xffffffff
             else:
                 gprs[rd] = gprs[rm] * gprs[rs] + gprs[rn]
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             cpu.cpsrN = gprs[rd] >> 31
             cpu.cpsrZ = not (gprs[rd] & 0xffffffff)
         return mlas
 
-    def constructMOV(rd, rn, shiftOp, condOp):
+    def constructMOV(self, rd, rn, shiftOp, condOp):
         cpu = self.cpu
         gprs = cpu.gprs
         def mov():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             shiftOp()
             gprs[rd] = cpu.shifterOperand
         return mov
 
-    def constructMOVS(rd, rn, shiftOp, condOp):
+    def constructMOVS(self, rd, rn, shiftOp, condOp):
         cpu = self.cpu
         gprs = cpu.gprs
         def movs():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             shiftOp()
             gprs[rd] = cpu.shifterOperand
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             if rd == cpu.PC and cpu.hasSPSR():
                 cpu.unpackCPSR(cpu.spsr)
             else:
                 cpu.cpsrN = gprs[rd] >> 31
                 cpu.cpsrZ = not (gprs[rd] & 0xffffffff)
-                cpu.cpsrC = cpu.shifterCarryOut
+                if cpu.shifterCarryOut is not None:
+                    cpu.cpsrC = cpu.shifterCarryOut
         return movs
 
-    def constructMRS(rd, r, condOp):
+    def constructMRS(self, rd, r, condOp):
         cpu = self.cpu
         gprs = cpu.gprs
         def mrs():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             if r:
                 gprs[rd] = cpu.spsr
@@ -712,14 +664,15 @@ class ARMCoreArm:
                 gprs[rd] = cpu.packCPSR()
         return mrs
 
-    def constructMSR(rm, r, instruction, immediate, condOp):
+    def constructMSR(self, rm, r, instruction, immediate, condOp):
         cpu = self.cpu
         gprs = cpu.gprs
         c = instruction & 0x00010000
         f = instruction & 0x00080000
         def msr():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             if instruction & 0x02000000:
                 operand = immediate
@@ -731,22 +684,21 @@ class ARMCoreArm:
                 cpu.spsr = (cpu.spsr & ~mask) | (operand & mask)
             else:
                 if mask & cpu.USER_MASK:
-                    cpu.cpsrN = operand >> 31
-                    cpu.cpsrZ = operand & 0x40000000
-                    cpu.cpsrC = operand & 0x20000000
-                    cpu.cpsrV = operand & 0x10000000
+                    cpu.lazyFlags = None
+                    cpu.nzcv = (operand >> 28) & 0xf
                 if cpu.mode != cpu.MODE_USER and mask & cpu.PRIV_MASK:
                     cpu.switchMode((operand & 0x0000000f) | 0x00000010)
                     cpu.cpsrI = operand & 0x00000080
                     cpu.cpsrF = operand & 0x00000040
         return msr
 
-    def constructMUL(rd, rs, rm, condOp):
+    def constructMUL(self, rd, rs, rm, condOp):
         cpu = self.cpu
         gprs = cpu.gprs
         def mul():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             cpu.mmu.waitMul(gprs[rs])
             if gprs[rm] & 0xffff0000 and gprs[rs] & 0xffff0000:
@@ -757,12 +709,13 @@ class ARMCoreArm:
                 gprs[rd] = gprs[rm] * gprs[rs]
         return mul
 
-    def constructMULS(rd, rs, rm, condOp):
+    def constructMULS(self, rd, rs, rm, condOp):
         cpu = self.cpu
         gprs = cpu.gprs
         def muls():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             cpu.mmu.waitMul(gprs[rs])
             if gprs[rm] & 0xffff0000 and gprs[rs] & 0xffff0000:
@@ -771,184 +724,209 @@ class ARMCoreArm:
                 gprs[rd] = hi + lo
             else:
                 gprs[rd] = gprs[rm] * gprs[rs]
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             cpu.cpsrN = gprs[rd] >> 31
             cpu.cpsrZ = not (gprs[rd] & 0xffffffff)
         return muls
 
-    def constructMVN(rd, rn, shiftOp, condOp):
+    def constructMVN(self, rd, rn, shiftOp, condOp):
         cpu = self.cpu
         gprs = cpu.gprs
         def mvn():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             shiftOp()
-            gprs[rd] = ~cpu.shifterOperand
+            gprs[rd] = ~cpu.shifterOperand & 0xffffffff
         return mvn
 
-    def constructMVNS(rd, rn, shiftOp, condOp):
+    def constructMVNS(self, rd, rn, shiftOp, condOp):
         cpu = self.cpu
         gprs = cpu.gprs
         def mvns():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             shiftOp()
-            gprs[rd] = ~cpu.shifterOperand
+            gprs[rd] = ~cpu.shifterOperand & 0xffffffff
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             if rd == cpu.PC and cpu.hasSPSR():
                 cpu.unpackCPSR(cpu.spsr)
             else:
                 cpu.cpsrN = gprs[rd] >> 31
                 cpu.cpsrZ = not (gprs[rd] & 0xffffffff)
-                cpu.cpsrC = cpu.shifterCarryOut
+                if cpu.shifterCarryOut is not None:
+                    cpu.cpsrC = cpu.shifterCarryOut
         return mvns
 
-    def constructORR(rd, rn, shiftOp, condOp):
+    def constructORR(self, rd, rn, shiftOp, condOp):
         cpu = self.cpu
         gprs = cpu.gprs
         def orr():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             shiftOp()
-            gprs[rd] = gprs[rn] | cpu.shifterOperand
+            gprs[rd] = (gprs[rn] | cpu.shifterOperand) & 0xffffffff
         return orr
 
-    def constructORRS(rd, rn, shiftOp, condOp):
+    def constructORRS(self, rd, rn, shiftOp, condOp):
         cpu = self.cpu
         gprs = cpu.gprs
         def orrs():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             shiftOp()
-            gprs[rd] = gprs[rn] | cpu.shifterOperand
+            gprs[rd] = (gprs[rn] | cpu.shifterOperand) & 0xffffffff
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             if rd == cpu.PC and cpu.hasSPSR():
                 cpu.unpackCPSR(cpu.spsr)
             else:
                 cpu.cpsrN = gprs[rd] >> 31
                 cpu.cpsrZ = not (gprs[rd] & 0xffffffff)
-                cpu.cpsrC = cpu.shifterCarryOut
+                if cpu.shifterCarryOut is not None:
+                    cpu.cpsrC = cpu.shifterCarryOut
         return orrs
 
-    def constructRSB(rd, rn, shiftOp, condOp):
+    def constructRSB(self, rd, rn, shiftOp, condOp):
         cpu = self.cpu
         gprs = cpu.gprs
         def rsb():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             shiftOp()
-            gprs[rd] = cpu.shifterOperand - gprs[rn]
+            gprs[rd] = (cpu.shifterOperand - gprs[rn]) & 0xffffffff
         return rsb
 
-    def constructRSBS(rd, rn, shiftOp, condOp):
+    def constructRSBS(self, rd, rn, shiftOp, condOp):
         cpu = self.cpu
         gprs = cpu.gprs
         def rsbs():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             shiftOp()
-            d = cpu.shifterOperand - gprs[rn]
+            n = cpu.shifterOperand & 0xffffffff
+            m = gprs[rn] & 0xffffffff
+            d = n - m
             if rd == cpu.PC and cpu.hasSPSR():
                 cpu.unpackCPSR(cpu.spsr)
             else:
-                cpu.cpsrN = d >> 31
-                cpu.cpsrZ = not (d & 0xffffffff)
-                cpu.cpsrC = cpu.shifterOperand >= gprs[rn]
-                cpu.cpsrV = (cpu.shifterOperand >> 31) != (gprs[rn] >> 31) and (cpu.shifterOperand >> 31) != (d >> 31)
-            gprs[rd] = d
+                cpu.lazyFlags = (cpu.FLAGS_SUB, n, m, d)
+            gprs[rd] = d & 0xffffffff
         return rsbs
 
-    def constructRSC(rd, rn, shiftOp, condOp):
+    def constructRSC(self, rd, rn, shiftOp, condOp):
         cpu = self.cpu
         gprs = cpu.gprs
         def rsc():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             shiftOp()
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             n = (gprs[rn] >> 0) + (not cpu.cpsrC)
 
             gprs[rd] = (cpu.shifterOperand >> 0) - n
 
         return rsc
 
-    def constructRSCS(rd, rn, shiftOp, condOp):
+    def constructRSCS(self, rd, rn, shiftOp, condOp):
         cpu = self.cpu
         gprs = cpu.gprs
         def rscs():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             shiftOp()
-            n = (gprs[rn] >> 0) + (not cpu.cpsrC)
-
-            d = (cpu.shifterOperand >> 0) - n
-
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
+            n = cpu.shifterOperand & 0xffffffff
+            m = gprs[rn] & 0xffffffff
+            d = n - m - (0 if cpu.cpsrC else 1)
             if rd == cpu.PC and cpu.hasSPSR():
                 cpu.unpackCPSR(cpu.spsr)
             else:
-                cpu.cpsrN = d >> 31
-                cpu.cpsrZ = not (d & 0xffffffff)
-                cpu.cpsrC = gprs[rn] >> 0 >= d >> 0
-                cpu.cpsrV = (gprs[rn] >> 31) != (cpu.shifterOperand >> 31) and (gprs[rn] >> 31) != (d >> 31)
-            gprs[rd] = d
+                cpu.lazyFlags = (cpu.FLAGS_SUB, n, m, d)
+            gprs[rd] = d & 0xffffffff
         return rscs
 
-    def constructSBC(rd, rn, shiftOp, condOp):
+    def constructSBC(self, rd, rn, shiftOp, condOp):
         cpu = self.cpu
         gprs = cpu.gprs
         def sbc():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             shiftOp()
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             shifterOperand = (cpu.shifterOperand >> 0) + (not cpu.cpsrC)
             gprs[rd] = (gprs[rn] >> 0) - shifterOperand
         return sbc
 
-    def constructSBCS(rd, rn, shiftOp, condOp):
+    def constructSBCS(self, rd, rn, shiftOp, condOp):
         cpu = self.cpu
         gprs = cpu.gprs
         def sbcs():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             shiftOp()
-            shifterOperand = (cpu.shifterOperand >> 0) + (not cpu.cpsrC)
-            d = (gprs[rn] >> 0) - shifterOperand
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
+            n = gprs[rn] & 0xffffffff
+            m = cpu.shifterOperand & 0xffffffff
+            d = n - m - (0 if cpu.cpsrC else 1)
             if rd == cpu.PC and cpu.hasSPSR():
                 cpu.unpackCPSR(cpu.spsr)
             else:
-                cpu.cpsrN = d >> 31
-                cpu.cpsrZ = not (d & 0xffffffff)
-                cpu.cpsrC = gprs[rn] >> 0 >= d >> 0
-                cpu.cpsrV = (gprs[rn] >> 31) != (shifterOperand >> 31) and (gprs[rn] >> 31) != (d >> 31)
-            gprs[rd] = d
+                cpu.lazyFlags = (cpu.FLAGS_SUB, n, m, d)
+            gprs[rd] = d & 0xffffffff
         return sbcs
-def constructSMLAL(cpu, rd, rn, rs, rm, condOp):
-    SHIFT_32 = 1 / 0x100000000
-    gprs = cpu.gprs
-    def inner():
-        cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-        if condOp and not condOp():
-            return
-        cpu.cycles += 2
-        cpu.mmu.waitMul(rs)
-        hi = (gprs[rm] & 0xffff0000) * gprs[rs]
-        lo = (gprs[rm] & 0x0000ffff) * gprs[rs]
-        carry = (gprs[rn] >> 0) + hi + lo
-        gprs[rn] = carry
-        gprs[rd] += int(carry * SHIFT_32)
-    return inner  # Make sure to properly close the function
-    def constructSMLALS(rd, rn, rs, rm, condOp):
+
+    def constructSMLAL(self, rd, rn, rs, rm, condOp):
+        cpu = self.cpu
+        gprs = cpu.gprs
         SHIFT_32 = 1 / 0x100000000
+        def inner():
+            cpu.mmu.waitPrefetch32(gprs[cpu.PC])
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
+                return
+            cpu.cycles += 2
+            cpu.mmu.waitMul(rs)
+            hi = (gprs[rm] & 0xffff0000) * gprs[rs]
+            lo = (gprs[rm] & 0x0000ffff) * gprs[rs]
+            carry = (gprs[rn] >> 0) + hi + lo
+            gprs[rn] = carry
+            gprs[rd] += int(carry * SHIFT_32)
+        return inner
+
+    def constructSMLALS(self, rd, rn, rs, rm, condOp):
+        cpu = self.cpu
         gprs = cpu.gprs
+        SHIFT_32 = 1 / 0x100000000
         def inner():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             cpu.cycles += 2
             cpu.mmu.waitMul(rs)
@@ -957,16 +935,20 @@ def constructSMLAL(cpu, rd, rn, rs, rm, condOp):
             carry = (gprs[rn] >> 0) + hi + lo
             gprs[rn] = carry
             gprs[rd] += int(carry * SHIFT_32)
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             cpu.cpsrN = gprs[rd] >> 31
             cpu.cpsrZ = not (gprs[rd] & 0xffffffff or gprs[rn] & 0xffffffff)
         return inner
 
-    def constructSMULL(rd, rn, rs, rm, condOp):
-        SHIFT_32 = 1 / 0x100000000
+    def constructSMULL(self, rd, rn, rs, rm, condOp):
+        cpu = self.cpu
         gprs = cpu.gprs
+        SHIFT_32 = 1 / 0x100000000
         def inner():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             cpu.cycles += 1
             cpu.mmu.waitMul(gprs[rs])
@@ -976,12 +958,14 @@ def constructSMLAL(cpu, rd, rn, rs, rm, condOp):
             gprs[rd] = int(hi * SHIFT_32 + lo * SHIFT_32)
         return inner
 
-    def constructSMULLS(rd, rn, rs, rm, condOp):
-        SHIFT_32 = 1 / 0x100000000
+    def constructSMULLS(self, rd, rn, rs, rm, condOp):
+        cpu = self.cpu
         gprs = cpu.gprs
+        SHIFT_32 = 1 / 0x100000000
         def inner():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             cpu.cycles += 1
             cpu.mmu.waitMul(gprs[rs])
@@ -989,15 +973,19 @@ def constructSMLAL(cpu, rd, rn, rs, rm, condOp):
             lo = ((gprs[rm] & 0x0000ffff) >> 0) * (gprs[rs] >> 0)
             gprs[rn] = ((hi & 0xffffffff) + (lo & 0xffffffff)) & 0xffffffff
             gprs[rd] = int(hi * SHIFT_32 + lo * SHIFT_32)
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             cpu.cpsrN = gprs[rd] >> 31
             cpu.cpsrZ = not (gprs[rd] & 0xffffffff or gprs[rn] & 0xffffffff)
         return inner
 
-    def constructSTM(rs, address, condOp):
+    def constructSTM(self, rs, address, condOp):
+        cpu = self.cpu
         gprs = cpu.gprs
         mmu = cpu.mmu
         def inner():
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 mmu.waitPrefetch32(gprs[cpu.PC])
                 return
             mmu.wait32(gprs[cpu.PC])
@@ -1014,11 +1002,13 @@ def constructSMLAL(cpu, rd, rn, rs, rm, condOp):
             mmu.waitMulti32(addr, total)
         return inner
 
-    def constructSTMS(rs, address, condOp):
+    def constructSTMS(self, rs, address, condOp):
+        cpu = self.cpu
         gprs = cpu.gprs
         mmu = cpu.mmu
         def inner():
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 mmu.waitPrefetch32(gprs[cpu.PC])
                 return
             mmu.wait32(gprs[cpu.PC])
@@ -1038,10 +1028,12 @@ def constructSMLAL(cpu, rd, rn, rs, rm, condOp):
             mmu.waitMulti32(addr, total)
         return inner
 
-    def constructSTR(rd, address, condOp):
+    def constructSTR(self, rd, address, condOp):
+        cpu = self.cpu
         gprs = cpu.gprs
         def inner():
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 cpu.mmu.waitPrefetch32(gprs[cpu.PC])
                 return
             addr = address()
@@ -1050,10 +1042,12 @@ def constructSMLAL(cpu, rd, rn, rs, rm, condOp):
             cpu.mmu.wait32(gprs[cpu.PC])
         return inner
 
-    def constructSTRB(rd, address, condOp):
+    def constructSTRB(self, rd, address, condOp):
+        cpu = self.cpu
         gprs = cpu.gprs
         def inner():
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 cpu.mmu.waitPrefetch32(gprs[cpu.PC])
                 return
             addr = address()
@@ -1062,10 +1056,12 @@ def constructSMLAL(cpu, rd, rn, rs, rm, condOp):
             cpu.mmu.wait32(gprs[cpu.PC])
         return inner
 
-    def constructSTRH(rd, address, condOp):
+    def constructSTRH(self, rd, address, condOp):
+        cpu = self.cpu
         gprs = cpu.gprs
         def inner():
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 cpu.mmu.waitPrefetch32(gprs[cpu.PC])
                 return
             addr = address()
@@ -1074,49 +1070,56 @@ def constructSMLAL(cpu, rd, rn, rs, rm, condOp):
             cpu.mmu.wait32(gprs[cpu.PC])
         return inner
 
-    def constructSUB(rd, rn, shiftOp, condOp):
+    def constructSUB(self, rd, rn, shiftOp, condOp):
+        cpu = self.cpu
         gprs = cpu.gprs
         def inner():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             shiftOp()
-            gprs[rd] = gprs[rn] - cpu.shifterOperand
+            gprs[rd] = (gprs[rn] - cpu.shifterOperand) & 0xffffffff
         return inner
 
-    def constructSUBS(rd, rn, shiftOp, condOp):
+    def constructSUBS(self, rd, rn, shiftOp, condOp):
+        cpu = self.cpu
         gprs = cpu.gprs
-        def inner():
+        def subs():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             shiftOp()
-            d = gprs[rn] - cpu.shifterOperand
+            n = gprs[rn] & 0xffffffff
+            m = cpu.shifterOperand & 0xffffffff
+            d = n - m
             if rd == cpu.PC and cpu.hasSPSR():
                 cpu.unpackCPSR(cpu.spsr)
             else:
-                cpu.cpsrN = d >> 31
-                cpu.cpsrZ = not (d & 0xFFFFFFFF)
-                cpu.cpsrC = (gprs[rn] >> 0) >= (cpu.shifterOperand >> 0)
-                cpu.cpsrV = (gprs[rn] >> 31) != (cpu.shifterOperand >> 31) and (gprs[rn] >> 31) != (d >> 31)
-            gprs[rd] = d
-        return inner
+                cpu.lazyFlags = (cpu.FLAGS_SUB, n, m, d)
+            gprs[rd] = d & 0xffffffff
+        return subs
 
-    def constructSWI(immediate, condOp):
+    def constructSWI(self, immediate, condOp):
+        cpu = self.cpu
         gprs = cpu.gprs
         def inner():
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 cpu.mmu.waitPrefetch32(gprs[cpu.PC])
                 return
             cpu.irq.swi32(immediate)
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
         return inner
 
-    def constructSWP(rd, rn, rm, condOp):
+    def constructSWP(self, rd, rn, rm, condOp):
+        cpu = self.cpu
         gprs = cpu.gprs
         def inner():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             cpu.mmu.wait32(gprs[rn])
             cpu.mmu.wait32(gprs[rn])
@@ -1126,11 +1129,13 @@ def constructSMLAL(cpu, rd, rn, rs, rm, condOp):
             cpu.cycles += 1
         return inner
 
-    def constructSWPB(rd, rn, rm, condOp):
+    def constructSWPB(self, rd, rn, rm, condOp):
+        cpu = self.cpu
         gprs = cpu.gprs
         def inner():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             cpu.mmu.wait(gprs[rn])
             cpu.mmu.wait(gprs[rn])
@@ -1140,38 +1145,50 @@ def constructSMLAL(cpu, rd, rn, rs, rm, condOp):
             cpu.cycles += 1
         return inner
 
-    def constructTEQ(rd, rn, shiftOp, condOp):
+    def constructTEQ(self, rd, rn, shiftOp, condOp):
+        cpu = self.cpu
         gprs = cpu.gprs
         def inner():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             shiftOp()
             aluOut = gprs[rn] ^ cpu.shifterOperand
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             cpu.cpsrN = aluOut >> 31
             cpu.cpsrZ = not (aluOut & 0xffffffff)
-            cpu.cpsrC = cpu.shifterCarryOut
+            if cpu.shifterCarryOut is not None:
+                cpu.cpsrC = cpu.shifterCarryOut
         return inner
 
-    def constructTST(rd, rn, shiftOp, condOp):
+    def constructTST(self, rd, rn, shiftOp, condOp):
+        cpu = self.cpu
         gprs = cpu.gprs
         def inner():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             shiftOp()
             aluOut = gprs[rn] & cpu.shifterOperand
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             cpu.cpsrN = aluOut >> 31
             cpu.cpsrZ = not (aluOut & 0xffffffff)
-            cpu.cpsrC = cpu.shifterCarryOut
+            if cpu.shifterCarryOut is not None:
+                cpu.cpsrC = cpu.shifterCarryOut
         return inner
 
-    def constructUMLAL(rd, rn, rs, rm, condOp):
-        SHIFT_32 = 1 / 0x100000000
+    def constructUMLAL(self, rd, rn, rs, rm, condOp):
+        cpu = self.cpu
         gprs = cpu.gprs
+        SHIFT_32 = 1 / 0x100000000
         def inner():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             cpu.cycles += 2
             cpu.mmu.waitMul(rs)
@@ -1182,12 +1199,14 @@ def constructSMLAL(cpu, rd, rn, rs, rm, condOp):
             gprs[rd] += carry * SHIFT_32
         return inner
 
-    def constructUMLALS(rd, rn, rs, rm, condOp):
-        SHIFT_32 = 1 / 0x100000000
+    def constructUMLALS(self, rd, rn, rs, rm, condOp):
+        cpu = self.cpu
         gprs = cpu.gprs
+        SHIFT_32 = 1 / 0x100000000
         def inner():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             cpu.cycles += 2
             cpu.mmu.waitMul(rs)
@@ -1196,16 +1215,20 @@ def constructSMLAL(cpu, rd, rn, rs, rm, condOp):
             carry = (gprs[rn] >> 0) + hi + lo
             gprs[rn] = carry
             gprs[rd] += carry * SHIFT_32
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             cpu.cpsrN = gprs[rd] >> 31
             cpu.cpsrZ = not (gprs[rd] & 0xffffffff or gprs[rn] & 0xffffffff)
         return inner
 
-    def constructUMULL(rd, rn, rs, rm, condOp):
-        SHIFT_32 = 1 / 0x100000000
+    def constructUMULL(self, rd, rn, rs, rm, condOp):
+        cpu = self.cpu
         gprs = cpu.gprs
+        SHIFT_32 = 1 / 0x100000000
         def inner():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             cpu.cycles += 1
             cpu.mmu.waitMul(gprs[rs])
@@ -1215,12 +1238,14 @@ def constructSMLAL(cpu, rd, rn, rs, rm, condOp):
             gprs[rd] = (hi * SHIFT_32 + lo * SHIFT_32) >> 0
         return inner
 
-    def constructUMULLS(rd, rn, rs, rm, condOp):
-        SHIFT_32 = 1 / 0x100000000
+    def constructUMULLS(self, rd, rn, rs, rm, condOp):
+        cpu = self.cpu
         gprs = cpu.gprs
+        SHIFT_32 = 1 / 0x100000000
         def inner():
             cpu.mmu.waitPrefetch32(gprs[cpu.PC])
-            if condOp and not condOp():
+            if condOp and not condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
+                cpu.conditionPassed = False
                 return
             cpu.cycles += 1
             cpu.mmu.waitMul(gprs[rs])
@@ -1228,6 +1253,8 @@ def constructSMLAL(cpu, rd, rn, rs, rm, condOp):
             lo = ((gprs[rm] & 0x0000ffff) >> 0) * (gprs[rs] >> 0)
             gprs[rn] = ((hi & 0xffffffff) + (lo & 0xffffffff)) & 0xffffffff
             gprs[rd] = (hi * SHIFT_32 + lo * SHIFT_32) >> 0
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             cpu.cpsrN = gprs[rd] >> 31
             cpu.cpsrZ = not (gprs[rd] & 0xffffffff or gprs[rn] & 0xffffffff)
         return inner     
\ No newline at end of file
@@ -5,7 +5,9 @@ class GameBoyAdvanceAudio:
     def __init__(self, cpu):
         self.cpu = cpu
         self.core = cpu
-        self.sampleInterval = 0.0000625  # 1 / 16000
+        self.SAMPLE_RATE = 32768
+        # CPU cycles between output samples; the scheduler needs this in cycles, not seconds
+        self.sampleInterval = 0x1000000 // self.SAMPLE_RATE
         self.bufferSize = 4096
         self.maxSamples = self.bufferSize << 2
         self.resampleRatio = 1.0 
@@ -15,7 +17,7 @@ class GameBoyAdvanceAudio:
         ]
         self.sampleMask = self.maxSamples - 1
         self.jsAudio = sd.OutputStream(
-            samplerate=32768,
+            samplerate=self.SAMPLE_RATE,
             channels=2,
             callback=self.audioProcess,
             blocksize=self.bufferSize
@@ -128,73 +130,62 @@ class GameBoyAdvanceAudio:
         else:
             self.jsAudio.start()
 
-    def updateTimers(self):
-        cycles = self.cpu.cycles
-        if not self.enabled or (cycles < self.nextEvent and cycles < self.nextSample):
-            return
+    def stepChannels(self, cycles):
+        # Called by the interrupt handler's scheduler when the next channel event is due
+        channel = self.squareChannels[0]
+        self.nextEvent = float("inf")
+        if channel["playing"]:
+            self.updateSquareChannel(channel, cycles)
 
-        if cycles >= self.nextEvent:
-            channel = self.squareChannels[0]
-            self.nextEvent = float("inf")
-            if channel["playing"]:
-                self.updateSquareChannel(channel, cycles)
-
-            channel = self.squareChannels[1]
-            if channel["playing"]:
-                self.updateSquareChannel(channel, cycles)
-
-            if self.enableChannel3 and self.playingChannel3:
-                if cycles >= self.channel3Next:
-                    if self.channel3Write:
-                        sample = self.waveData[self.channel3Pointer >> 1]
-                        self.channel3Sample = (((sample >> ((self.channel3Pointer & 1) << 2)) & 0xF) - 0x8) / 8
-                        self.channel3Pointer = (self.channel3Pointer + 1)
-                        if self.channel3Dimension and self.channel3Pointer >= 64:
-                            self.channel3Pointer -= 64
-                        elif not self.channel3Bank and self.channel3Pointer >= 32:
-                            self.channel3Pointer -= 32
-                        elif self.channel3Pointer >= 64:
-                            self.channel3Pointer -= 32
-                    self.channel3Next += self.channel3Interval
-                    if self.channel3Interval and self.nextEvent > self.channel3Next:
-                        self.nextEvent = self.channel3Next
-
-                if self.channel3Timed and cycles >= self.channel3End:
-                    self.playingChannel3 = False
-
-            if self.enableChannel4 and self.playingChannel4:
-                if self.channel4["timed"] and cycles >= self.channel4["end"]:
-                    self.playingChannel4 = False
-                else:
-                    if cycles >= self.channel4["next"]:
-                        self.channel4["lfsr"] >>= 1
-                        sample = self.channel4["lfsr"] & 1
-                        self.channel4["lfsr"] |= (((self.channel4["lfsr"] >> 1) & 1) ^ sample) << (self.channel4["width"] - 1)
-                        self.channel4["next"] += self.channel4["interval"]
-                        self.channel4["sample"] = (sample - 0.5) * 2 * self.channel4["volume"]
-
-                    self.updateEnvelope(self.channel4, cycles)
-
-                    if self.nextEvent > self.channel4["next"]:
-                        self.nextEvent = self.channel4["next"]
-
-                    if self.channel4["timed"] and self.nextEvent > self.channel4["end"]:
-                        self.nextEvent = self.channel4["end"]
-
-        if cycles >= self.nextSample:
-            self.sample()
-            self.nextSample += self.sampleInterval
+        channel = self.squareChannels[1]
+        if channel["playing"]:
+            self.updateSquareChannel(channel, cycles)
+
+        if self.enableChannel3 and self.playingChannel3:
+            if cycles >= self.channel3Next:
+                if self.channel3Write:
+                    sample = self.waveData[self.channel3Pointer >> 1]
+                    self.channel3Sample = (((sample >> ((self.channel3Pointer & 1) << 2)) & 0xF) - 0x8) / 8
+                    self.channel3Pointer = (self.channel3Pointer + 1)
+                    if self.channel3Dimension and self.channel3Pointer >= 64:
+                        self.channel3Pointer -= 64
+                    elif not self.channel3Bank and self.channel3Pointer >= 32:
+                        self.channel3Pointer -= 32
+                    elif self.channel3Pointer >= 64:
+                        self.channel3Pointer -= 32
+                self.channel3Next += self.channel3Interval
+                if self.channel3Interval and self.nextEvent > self.channel3Next:
+                    self.nextEvent = self.channel3Next
+
+            if self.channel3Timed and cycles >= self.channel3End:
+                self.playingChannel3 = False
+
+        if self.enableChannel4 and self.playingChannel4:
+            if self.channel4["timed"] and cycles >= self.channel4["end"]:
+                self.playingChannel4 = False
+            else:
+                if cycles >= self.channel4["next"]:
+                    self.channel4["lfsr"] >>= 1
+                    sample = self.channel4["lfsr"] & 1
+                    self.channel4["lfsr"] |= (((self.channel4["lfsr"] >> 1) & 1) ^ sample) << (self.channel4["width"] - 1)
+                    self.channel4["next"] += self.channel4["interval"]
+                    self.channel4["sample"] = (sample - 0.5) * 2 * self.channel4["volume"]
+
+                self.updateEnvelope(self.channel4, cycles)
+
+                if self.nextEvent > self.channel4["next"]:
+                    self.nextEvent = self.channel4["next"]
+
+                if self.channel4["timed"] and self.nextEvent > self.channel4["end"]:
+                    self.nextEvent = self.channel4["end"]
 
         self.nextEvent = np.ceil(self.nextEvent)
-        if self.nextEvent < cycles or self.nextSample < cycles:
-            self.updateTimers()
 
     def writeEnable(self, value):
         self.enabled = bool(value)
         self.nextEvent = self.cpu.cycles
         self.nextSample = self.nextEvent
-        self.updateTimers()
-        self.core.irq.pollNextEvent()
+        self.core.irq.rescheduleAudio()
 
     def writeSoundControlLo(self, value):
         #print(value, type(value))
@@ -215,8 +206,7 @@ class GameBoyAdvanceAudio:
         self.enableChannel3 = bool((self.enabledLeft | self.enabledRight) & 0x4)
         self.setChannel4Enabled(bool((self.enabledLeft | self.enabledRight) & 0x8))
 
-        self.updateTimers()
-        self.core.irq.pollNextEvent()
+        self.core.irq.rescheduleAudio()
 
     def writeSoundControlHi(self, value):
         #value = int(value, 16)  # Convert hex string to integer
@@ -256,14 +246,12 @@ class GameBoyAdvanceAudio:
             self.nextEvent = self.cpu.cycles
 
         channel["playing"] = channel["enabled"]
-        self.updateTimers()
-        self.core.irq.pollNextEvent()
+        self.core.irq.rescheduleAudio()
 
     def setSquareChannelEnabled(self, channel, enable):
         if not (channel["enabled"] and channel["playing"]) and enable:
             channel["enabled"] = bool(enable)
-            self.updateTimers()
-            self.core.irq.pollNextEvent()
+            self.core.irq.rescheduleAudio()
         else:
             channel["enabled"] = bool(enable)
 
@@ -374,8 +362,7 @@ class GameBoyAdvanceAudio:
         self.nextEvent = self.channel3Next
         self.channel3End = self.cpu.cycles + self.channel3Length
         self.playingChannel3 = self.channel3Write
-        self.updateTimers()
-        self.core.irq.pollNextEvent()
+        self.core.irq.rescheduleAudio()
 
     def writeWaveData(self, offset, data, width):
         if not self.channel3Bank:
@@ -394,8 +381,7 @@ class GameBoyAdvanceAudio:
             self.playingChannel4 = True
             self.nextEvent = self.cpu.cycles
             self.updateEnvelope(self.channel4, self.nextEvent)
-            self.updateTimers()
-            self.core.irq.pollNextEvent()
+            self.core.irq.rescheduleAudio()
         else:
             self.enableChannel4 = enable
 
@@ -435,8 +421,7 @@ class GameBoyAdvanceAudio:
         self.channel4["next"] = self.cpu.cycles
         self.nextEvent = self.channel4["next"]
         self.playingChannel4 = self.enableChannel4
-        self.updateTimers()
-        self.core.irq.pollNextEvent()
+        self.core.irq.rescheduleAudio()
 
     def writeChannelLE(self, channel, value):
         channel["length"] = self.cpuFrequency * ((0x40 - (value & 0x3f)) / 256)
@@ -0,0 +1,835 @@
+import hashlib
+import importlib.util
+import marshal
+
+class ARMCoreBlock:
+    def __init__(self, cpu):
+        self.cpu = cpu
+
+        self.MAX_BLOCK_LENGTH = 64
+
+        # Bump whenever the generated source for a block changes shape
+        self.CACHE_VERSION = 4
+        self.persisted = {}
+
+        # Generated lines that read or advance cpu.cycles; pending fetch cycles are added before them
+        self.CYCLE_OBSERVERS = ('load', 'store', 'wait', 'cycles')
+
+        # Idle-loop analysis tracks the flags as registers 16-19
+        self.FLAG_N = 16
+        self.FLAG_Z = 17
+        self.FLAG_C = 18
+        self.FLAG_V = 19
+        N, Z, C, V = self.FLAG_N, self.FLAG_Z, self.FLAG_C, self.FLAG_V
+        self.CONDITION_FLAGS = [
+            (Z,), (Z,), (C,), (C,), (N,), (N,), (V,), (V,),
+            (C, Z), (C, Z), (N, V), (N, V), (N, Z, V), (N, Z, V),
+            (), ()
+        ]
+
+    def compileBlock(self, address, execMode):
+        cpu = self.cpu
+        mmu = cpu.mmu
+        if execMode == cpu.MODE_ARM:
+            width = cpu.WORD_SIZE_ARM
+            loadInstruction = cpu.load_instruction_arm
+            emit = self.emitArm
+            prefetchName = 'waitPrefetch32'
+            waitstates = mmu.waitstatesPrefetch32
+        else:
+            width = cpu.WORD_SIZE_THUMB
+            loadInstruction = cpu.loadInstructionThumb
+            emit = self.emitThumb
+            prefetchName = 'waitPrefetch'
+            waitstates = mmu.waitstatesPrefetch
+
+        pageBits = mmu.memory[address >> mmu.BASE_OFFSET].ICACHE_PAGE_BITS
+        pageId = address >> pageBits
+        page = cpu.page
+
+        namespace = {
+            'cpu': cpu,
+            'gprs': cpu.gprs,
+            'page': page,
+            # Invalidation and timing changes both bump it, so a guard on it catches either mid-block
+            'generation': page.generation,
+            'waitPrefetch': mmu.waitPrefetch,
+            'waitPrefetch32': mmu.waitPrefetch32,
+            'wait': mmu.wait,
+            'wait32': mmu.wait32,
+            'waitSeq32': mmu.waitSeq32,
+            'waitMulti32': mmu.waitMulti32,
+            'load8': mmu.load8,
+            'load16': mmu.load16,
+            'load32': mmu.load32,
+            'loadU8': mmu.loadU8,
+            'loadU16': mmu.loadU16,
+            'store8': mmu.store8,
+            'store16': mmu.store16,
+            'store32': mmu.store32,
+            'iram': mmu.memory[mmu.REGION_WORKING_IRAM],
+            'ewram': mmu.memory[mmu.REGION_WORKING_RAM],
+        }
+
+        entry = self.persisted.get(address | execMode)
+        if entry and not cpu.breakpoints and entry[2] == self.timingSignature():
+            length, idle, signature, source, code = entry
+            for i in range(length):
+                instruction = loadInstruction(address + i * width)
+                namespace['i%d' % i] = instruction
+                namespace['x%d' % i] = instruction.execute
+            exec(code, namespace)
+            return self.finishBlock(namespace, address, execMode, length, page, source, code, idle)
+
+        lines = ['def block():']
+        opcodes = []
+        syncedPC = None
+        pending = 0
+        length = 0
+        current = address
+        while True:
+            instruction = loadInstruction(current)
+            opcodes.append(instruction.opcode)
+            name = 'i%d' % length
+            namespace[name] = instruction
+            call = 'x%d' % length
+            namespace[call] = instruction.execute
+            length += 1
+            pc = current + 2 * width
+            terminal = instruction.writesPC or self.isSWI(instruction.opcode, execMode)
+
+            emitted = None
+            if not terminal:
+                emitted = emit(instruction.opcode, pc)
+            if emitted:
+                body, sideEffects = emitted
+                if sideEffects and syncedPC != pc:
+                    lines.append('    gprs[15] = %#x' % pc)
+                    syncedPC = pc
+                # Sequential fetches are known now, so fold them into one cycle update
+                prefetch = '%s(%#x)' % (prefetchName, pc)
+                sync = 'gprs[15] = %#x' % pc
+                for line in body:
+                    if line == sync:
+                        # Loads that may hit open bus read the prefetch address back from PC
+                        if syncedPC == pc:
+                            continue
+                        syncedPC = pc
+                    elif line == prefetch:
+                        pending += 1 + waitstates[pc >> mmu.BASE_OFFSET]
+                        continue
+                    if line.startswith('cpu.cycles += ') and line[14:].isdigit():
+                        pending += int(line[14:])
+                        continue
+                    if pending and self.observesCycles(line):
+                        lines.append('    cpu.cycles += %d' % pending)
+                        pending = 0
+                    lines.append('    ' + line)
+            else:
+                sideEffects = not terminal
+                if pending:
+                    lines.append('    cpu.cycles += %d' % pending)
+                    pending = 0
+                if syncedPC != pc:
+                    lines.append('    gprs[15] = %#x' % pc)
+                    syncedPC = pc
+                if terminal:
+                    lines.append('    cpu.conditionPassed = True')
+                lines.append('    %s()' % call)
+            if sideEffects:
+                if pending:
+                    lines.append('    cpu.cycles += %d' % pending)
+                    pending = 0
+                lines.append('    if gprs[15] != %#x or page.generation != generation or cpu.halted:' % pc)
+                lines.append('        return %s' % name)
+
+            current += width
+            if terminal or length >= self.MAX_BLOCK_LENGTH or (current >> pageBits) != pageId or current in cpu.breakpoints:
+                if syncedPC != pc and not terminal:
+                    lines.append('    gprs[15] = %#x' % pc)
+                if pending:
+                    lines.append('    cpu.cycles += %d' % pending)
+                lines.append('    return %s' % name)
+                break
+
+        source = '\n'.join(lines) + '\n'
+        code = compile(source, '<block %#010x>' % address, 'exec')
+        exec(code, namespace)
+        idle = terminal and self.isIdleLoop(address, opcodes, execMode)
+        return self.finishBlock(namespace, address, execMode, length, page, source, code, idle)
+
+    def finishBlock(self, namespace, address, execMode, length, page, source, code, idle):
+        block = namespace['block']
+        block.address = address
+        block.execMode = execMode
+        block.length = length
+        block.page = page
+        block.source = source
+        block.code = code
+        block.idle = idle
+        block.jumpLink = None
+        block.nextLink = None
+        return block
+
+    def timingSignature(self):
+        # Fetch and literal-load cycles are folded into the source, so it is only valid under these timings
+        mmu = self.cpu.mmu
+        return tuple(mmu.waitstates[:16] + mmu.waitstates32[:16] + mmu.waitstatesSeq[:16] +
+                     mmu.waitstatesSeq32[:16] + mmu.waitstatesPrefetch[:16] + mmu.waitstatesPrefetch32[:16])
+
+    def romHash(self):
+        return hashlib.sha1(self.cpu.mmu.cart['memory']).hexdigest()
+
+    def loadCache(self, path):
+        self.persisted = {}
+        try:
+            with open(path, 'rb') as cacheFile:
+                cache = marshal.load(cacheFile)
+        except (OSError, EOFError, ValueError, TypeError):
+            return False
+        if (not isinstance(cache, dict) or cache.get('version') != self.CACHE_VERSION or
+                cache.get('python') != importlib.util.MAGIC_NUMBER or cache.get('rom') != self.romHash()):
+            return False
+        self.persisted = cache['blocks']
+        return True
+
+    def saveCache(self, path):
+        signature = self.timingSignature()
+        blocks = dict(self.persisted)
+        for page in self.cpu.mmu.residentPages.values():
+            for key, block in page.blocks.items():
+                blocks[key] = (block.length, block.idle, signature, block.source, block.code)
+        cache = {
+            'version': self.CACHE_VERSION,
+            'python': importlib.util.MAGIC_NUMBER,
+            'rom': self.romHash(),
+            'blocks': blocks,
+        }
+        try:
+            with open(path, 'wb') as cacheFile:
+                marshal.dump(cache, cacheFile)
+        except OSError:
+            return False
+        return True
+
+    def observesCycles(self, line):
+        # Compound statements may charge cycles on only one branch, so flush before them
+        if line.endswith(':'):
+            return line != 'if cpu.lazyFlags:'
+        if line.startswith(' '):
+            return False
+        for name in self.CYCLE_OBSERVERS:
+            if name in line:
+                return True
+        return False
+
+    def isIdleLoop(self, address, opcodes, execMode):
+        # A block that branches back to itself without storing anything or carrying
+        # a register across iterations can only leave the loop after an event
+        branchAddress = address + (len(opcodes) - 1) * (4 if execMode == self.cpu.MODE_ARM else 2)
+        if execMode == self.cpu.MODE_ARM:
+            branch = self.idleBranchArm(opcodes[-1], branchAddress)
+            effectsOf = self.idleEffectsArm
+        else:
+            branch = self.idleBranchThumb(opcodes[-1], branchAddress)
+            effectsOf = self.idleEffectsThumb
+        if not branch or branch[0] != address:
+            return False
+        read = set()
+        written = set()
+        for opcode in opcodes[:-1]:
+            effects = effectsOf(opcode)
+            if not effects:
+                return False
+            reads, writes = effects
+            read.update(r for r in reads if r not in written)
+            written.update(writes)
+        read.update(f for f in self.CONDITION_FLAGS[branch[1]] if f not in written)
+        return not (read & written)
+
+    def idleBranchThumb(self, opcode, address):
+        if (opcode & 0xf000) == 0xd000 and (opcode & 0x0f00) < 0x0e00:
+            # B(1)
+            immediate = opcode & 0x00ff
+            if immediate & 0x80:
+                immediate -= 0x100
+            return address + 4 + (immediate << 1), (opcode & 0x0f00) >> 8
+        if (opcode & 0xf800) == 0xe000:
+            # B(2)
+            immediate = opcode & 0x07ff
+            if immediate & 0x0400:
+                immediate -= 0x800
+            return address + 4 + (immediate << 1), 0xe
+        return None
+
+    def idleBranchArm(self, opcode, address):
+        if (opcode & 0x0f000000) != 0x0a000000 or (opcode >> 28) == 0xf:
+            return None
+        immediate = opcode & 0x00ffffff
+        if immediate & 0x00800000:
+            immediate -= 0x01000000
+        return address + 8 + (immediate << 2), opcode >> 28
+
+    def idleEffectsThumb(self, opcode):
+        N, Z, C, V = self.FLAG_N, self.FLAG_Z, self.FLAG_C, self.FLAG_V
+        if opcode < 0x1800:
+            # Shift by immediate
+            rd = opcode & 0x0007
+            rm = (opcode & 0x0038) >> 3
+            if opcode < 0x0040:
+                return (rm,), (rd, N, Z)
+            return (rm,), (rd, N, Z, C)
+        if (opcode & 0xf800) == 0x2000:
+            # MOV(1)
+            return (), ((opcode & 0x0700) >> 8, N, Z)
+        if (opcode & 0xf800) == 0x2800:
+            # CMP(1)
+            return ((opcode & 0x0700) >> 8,), (N, Z, C, V)
+        if (opcode & 0xfc00) == 0x4000:
+            rd = opcode & 0x0007
+            rm = (opcode & 0x0038) >> 3
+            kind = (opcode & 0x03c0) >> 6
+            if kind in (0x0, 0x1, 0xc, 0xe):
+                # AND, EOR, ORR, BIC
+                return (rd, rm), (rd, N, Z)
+            if kind == 0xf:
+                # MVN
+                return (rm,), (rd, N, Z)
+            if kind == 0x8:
+                # TST
+                return (rd, rm), (N, Z)
+            if kind in (0xa, 0xb):
+                # CMP(2), CMN
+                return (rd, rm), (N, Z, C, V)
+            return None
+        if (opcode & 0xff00) == 0x4500:
+            # CMP(3)
+            return ((opcode & 0x0007) | ((opcode & 0x0080) >> 4), (opcode & 0x0078) >> 3), (N, Z, C, V)
+        if (opcode & 0xff00) == 0x4600:
+            # MOV(3)
+            rd = (opcode & 0x0007) | ((opcode & 0x0080) >> 4)
+            if rd == self.cpu.PC:
+                return None
+            return ((opcode & 0x0078) >> 3,), (rd,)
+        if (opcode & 0xf800) == 0x4800:
+            # LDR(3)
+            return (), ((opcode & 0x0700) >> 8,)
+        if (opcode & 0xf000) == 0x5000 and (opcode & 0x0e00) >= 0x0600:
+            # Loads with register offset
+            return ((opcode & 0x0038) >> 3, (opcode & 0x01c0) >> 6), (opcode & 0x0007,)
+        if (opcode & 0xe800) == 0x6800 or (opcode & 0xf800) == 0x8800:
+            # LDR(1), LDRB(1), LDRH(1)
+            return ((opcode & 0x0038) >> 3,), (opcode & 0x0007,)
+        return None
+
+    def idleEffectsArm(self, opcode):
+        N, Z, C, V = self.FLAG_N, self.FLAG_Z, self.FLAG_C, self.FLAG_V
+        if (opcode & 0xf0000000) != 0xe0000000:
+            return None
+        rn = (opcode & 0x000f0000) >> 16
+        rd = (opcode & 0x0000f000) >> 12
+        if rd == self.cpu.PC:
+            return None
+        if not (opcode & 0x0c000000) and ((opcode & 0x02000000) or (opcode & 0x00000090) != 0x00000090):
+            # Data processing
+            kind = (opcode & 0x01e00000) >> 21
+            s = opcode & 0x00100000
+            if 0x8 <= kind <= 0xb and not s:
+                return None
+            reads = [] if kind in (0xd, 0xf) else [rn]
+            if 0x5 <= kind <= 0x7:
+                reads.append(C)
+            if not (opcode & 0x02000000):
+                reads.append(opcode & 0x0000000f)
+                if opcode & 0x00000010:
+                    reads.append((opcode & 0x00000f00) >> 8)
+            writes = [] if 0x8 <= kind <= 0xb else [rd]
+            if s:
+                if 0x2 <= kind <= 0x7 or kind in (0xa, 0xb):
+                    writes += [N, Z, C, V]
+                else:
+                    writes += [N, Z, C]
+            return reads, writes
+        if (opcode & 0x0c000000) == 0x04000000:
+            # LDR, LDRB with pre-indexing and no writeback
+            if (opcode & 0x01300000) != 0x01100000:
+                return None
+            if opcode & 0x02000000:
+                return (rn, opcode & 0x0000000f), (rd,)
+            return (rn,), (rd,)
+        if (opcode & 0x0e000090) == 0x00000090 and (opcode & 0x00000060):
+            # LDRH, LDRSB, LDRSH with pre-indexing and no writeback
+            if (opcode & 0x01300000) != 0x01100000:
+                return None
+            if opcode & 0x00400000:
+                return (rn,), (rd,)
+            return (rn, opcode & 0x0000000f), (rd,)
+        return None
+
+    def isSWI(self, opcode, execMode):
+        if execMode == self.cpu.MODE_ARM:
+            return (opcode & 0x0f000000) == 0x0f000000
+        return (opcode & 0xff00) == 0xdf00
+
+    def readRegister(self, register, pc):
+        if register == self.cpu.PC:
+            return '%#x' % pc
+        return 'gprs[%d]' % register
+
+    def emitAdd(self, rd, a, b):
+        body = [
+            'a = %s' % a,
+            'b = %s' % b,
+            'd = a + b',
+            'cpu.lazyFlags = (%d, a, b, d)' % self.cpu.FLAGS_ADD,
+        ]
+        if rd is not None:
+            body.append('gprs[%d] = d & 0xffffffff' % rd)
+        return body
+
+    def emitSub(self, rd, a, b):
+        body = [
+            'a = %s' % a,
+            'b = %s' % b,
+            'd = a - b',
+            'cpu.lazyFlags = (%d, a, b, d)' % self.cpu.FLAGS_SUB,
+        ]
+        if rd is not None:
+            body.append('gprs[%d] = d & 0xffffffff' % rd)
+        return body
+
+    def emitLogical(self, rd, expression, carry=None):
+        body = [
+            'if cpu.lazyFlags:',
+            '    cpu.resolveFlags()',
+            'd = (%s) & 0xffffffff' % expression,
+        ]
+        if carry is None:
+            body.append('cpu.nzcv = (cpu.nzcv & 3) | ((d >> 28) & 8) | (0 if d else 4)')
+        else:
+            body.append('cpu.nzcv = (cpu.nzcv & 1) | ((d >> 28) & 8) | (0 if d else 4) | ((%s) << 1)' % carry)
+        if rd is not None:
+            body.append('gprs[%d] = d' % rd)
+        return body
+
+    def emitThumb(self, opcode, pc):
+        prefetch = 'waitPrefetch(%#x)' % pc
+        if (opcode & 0xf800) == 0x1800:
+            # Add/subtract
+            rm = (opcode & 0x01c0) >> 6
+            rn = (opcode & 0x0038) >> 3
+            rd = opcode & 0x0007
+            kind = opcode & 0x0600
+            if kind == 0x0000:
+                # ADD(3)
+                body = self.emitAdd(rd, 'gprs[%d] & 0xffffffff' % rn, 'gprs[%d] & 0xffffffff' % rm)
+            elif kind == 0x0200:
+                # SUB(3)
+                body = self.emitSub(rd, 'gprs[%d] & 0xffffffff' % rn, 'gprs[%d] & 0xffffffff' % rm)
+            elif kind == 0x0400:
+                if rm:
+                    # ADD(1)
+                    body = self.emitAdd(rd, 'gprs[%d] & 0xffffffff' % rn, rm)
+                else:
+                    # MOV(2)
+                    body = self.emitLogical(rd, 'gprs[%d]' % rn, '0') + ['cpu.nzcv &= 0xe']
+            else:
+                # SUB(1)
+                body = self.emitSub(rd, 'gprs[%d] & 0xffffffff' % rn, rm)
+            return [prefetch] + body, False
+        elif not (opcode & 0xe000):
+            # Shift by immediate
+            rd = opcode & 0x0007
+            rm = (opcode & 0x0038) >> 3
+            immediate = (opcode & 0x07c0) >> 6
+            kind = opcode & 0x1800
+            body = [prefetch, 'm = gprs[%d] & 0xffffffff' % rm]
+            if kind == 0x0000:
+                # LSL(1)
+                if immediate:
+                    body += self.emitLogical(rd, 'm << %d' % immediate, '(m >> %d) & 1' % (32 - immediate))
+                else:
+                    body += self.emitLogical(rd, 'm')
+            elif kind == 0x0800:
+                # LSR(1)
+                if immediate:
+                    body += self.emitLogical(rd, 'm >> %d' % immediate, '(m >> %d) & 1' % (immediate - 1))
+                else:
+                    body += self.emitLogical(rd, '0', 'm >> 31')
+            elif kind == 0x1000:
+                # ASR(1)
+                if immediate:
+                    body += self.emitLogical(rd, '((m ^ 0x80000000) - 0x80000000) >> %d' % immediate, '(m >> %d) & 1' % (immediate - 1))
+                else:
+                    body += self.emitLogical(rd, '-(m >> 31)', 'm >> 31')
+            else:
+                return None
+            return body, False
+        elif (opcode & 0xe000) == 0x2000:
+            # Add/subtract/compare/move immediate
+            immediate = opcode & 0x00ff
+            rn = (opcode & 0x0700) >> 8
+            kind = opcode & 0x1800
+            if kind == 0x0000:
+                # MOV(1)
+                body = [
+                    'gprs[%d] = %d' % (rn, immediate),
+                    'if cpu.lazyFlags:',
+                    '    cpu.resolveFlags()',
+                    'cpu.nzcv = (cpu.nzcv & 3) | %d' % (0 if immediate else 4),
+                ]
+            elif kind == 0x0800:
+                # CMP(1)
+                body = self.emitSub(None, 'gprs[%d] & 0xffffffff' % rn, immediate)
+            elif kind == 0x1000:
+                # ADD(2)
+                body = self.emitAdd(rn, 'gprs[%d] & 0xffffffff' % rn, immediate)
+            else:
+                # SUB(2)
+                body = self.emitSub(rn, 'gprs[%d] & 0xffffffff' % rn, immediate)
+            return [prefetch] + body, False
+        elif (opcode & 0xfc00) == 0x4000:
+            # Data-processing register
+            rm = (opcode & 0x0038) >> 3
+            rd = opcode & 0x0007
+            kind = opcode & 0x03c0
+            if kind == 0x0000:
+                # AND
+                body = self.emitLogical(rd, 'gprs[%d] & gprs[%d]' % (rd, rm))
+            elif kind == 0x0040:
+                # EOR
+                body = self.emitLogical(rd, 'gprs[%d] ^ gprs[%d]' % (rd, rm))
+            elif kind == 0x0200:
+                # TST
+                body = self.emitLogical(None, 'gprs[%d] & gprs[%d]' % (rd, rm))
+            elif kind == 0x0240:
+                # NEG
+                body = self.emitSub(rd, 0, 'gprs[%d] & 0xffffffff' % rm)
+            elif kind == 0x0280:
+                # CMP(2)
+                body = self.emitSub(None, 'gprs[%d] & 0xffffffff' % rd, 'gprs[%d] & 0xffffffff' % rm)
+            elif kind == 0x02c0:
+                # CMN
+                body = self.emitAdd(None, 'gprs[%d] & 0xffffffff' % rd, 'gprs[%d] & 0xffffffff' % rm)
+            elif kind == 0x0300:
+                # ORR
+                body = self.emitLogical(rd, 'gprs[%d] | gprs[%d]' % (rd, rm))
+            elif kind == 0x0380:
+                # BIC
+                body = self.emitLogical(rd, 'gprs[%d] & ~gprs[%d]' % (rd, rm))
+            elif kind == 0x03c0:
+                # MVN
+                body = self.emitLogical(rd, '~gprs[%d]' % rm)
+            else:
+                return None
+            return [prefetch] + body, False
+        elif (opcode & 0xfc00) == 0x4400:
+            # Special data processing
+            rm = (opcode & 0x0078) >> 3
+            rd = (opcode & 0x0007) | ((opcode & 0x0080) >> 4)
+            kind = opcode & 0x0300
+            if kind == 0x0000 and rd != self.cpu.PC:
+                # ADD(4)
+                body = ['gprs[%d] = (gprs[%d] + %s) & 0xffffffff' % (rd, rd, self.readRegister(rm, pc))]
+            elif kind == 0x0100:
+                # CMP(3)
+                body = self.emitSub(None, self.readRegister(rd, pc) + ' & 0xffffffff', self.readRegister(rm, pc) + ' & 0xffffffff')
+            elif kind == 0x0200 and rd != self.cpu.PC:
+                # MOV(3)
+                body = ['gprs[%d] = %s' % (rd, self.readRegister(rm, pc))]
+            else:
+                return None
+            return [prefetch] + body, False
+        elif (opcode & 0xf800) == 0x4800:
+            # LDR(3)
+            rd = (opcode & 0x0700) >> 8
+            immediate = (opcode & 0x00ff) << 2
+            literal = self.readLiteral((pc & 0xfffffffc) + immediate)
+            if literal is not None:
+                mmu = self.cpu.mmu
+                return [
+                    prefetch,
+                    'gprs[%d] = %#x' % (rd, literal),
+                    'cpu.cycles += %d' % (2 + mmu.waitstates32[pc >> mmu.BASE_OFFSET]),
+                ], False
+            address = (pc & 0xfffffffc) + immediate
+            body = [prefetch]
+            if not self.isWorkingRam(address):
+                body.append('gprs[15] = %#x' % pc)
+            return body + [
+                'gprs[%d] = load32(%#x)' % (rd, address),
+                'wait32(%#x)' % pc,
+                'cpu.cycles += 1',
+            ], False
+        elif (opcode & 0xe000) == 0x6000:
+            # Load and store with immediate offset
+            rd = opcode & 0x0007
+            rn = (opcode & 0x0038) >> 3
+            immediate = (opcode & 0x07c0) >> 4
+            if opcode & 0x1000:
+                immediate >>= 2
+                load, store, waitData = 'loadU8', 'store8', 'wait'
+            else:
+                load, store, waitData = 'load32', 'store32', 'wait32'
+            return self.emitTransfer(opcode & 0x0800, rd, 'gprs[%d] + %d' % (rn, immediate), load, store, waitData, pc)
+        elif (opcode & 0xf000) == 0x8000:
+            # Load and store halfword
+            rd = opcode & 0x0007
+            rn = (opcode & 0x0038) >> 3
+            immediate = (opcode & 0x07c0) >> 5
+            return self.emitTransfer(opcode & 0x0800, rd, 'gprs[%d] + %d' % (rn, immediate), 'loadU16', 'store16', 'wait', pc)
+        elif (opcode & 0xf000) == 0x9000:
+            # SP-relative load and store
+            rd = (opcode & 0x0700) >> 8
+            immediate = (opcode & 0x00ff) << 2
+            return self.emitStackTransfer(opcode & 0x0800, rd, immediate, pc)
+        elif (opcode & 0xf000) == 0xa000:
+            # Load address
+            rd = (opcode & 0x0700) >> 8
+            immediate = (opcode & 0x00ff) << 2
+            if opcode & 0x0800:
+                # ADD(6)
+                body = ['gprs[%d] = (gprs[13] + %d) & 0xffffffff' % (rd, immediate)]
+            else:
+                # ADD(5)
+                body = ['gprs[%d] = %#x' % (rd, (pc & 0xfffffffc) + immediate)]
+            return [prefetch] + body, False
+        elif (opcode & 0xff00) == 0xb000:
+            # ADD(7)/SUB(4)
+            immediate = (opcode & 0x7f) << 2
+            if opcode & 0x0080:
+                immediate = -immediate
+            return [prefetch, 'gprs[13] = (gprs[13] + %d) & 0xffffffff' % immediate], False
+        elif (opcode & 0xfe00) == 0xb400:
+            # PUSH
+            return self.emitPush(opcode & 0x00ff, opcode & 0x0100, pc)
+        elif (opcode & 0xff00) == 0xbc00:
+            # POP without PC
+            return self.emitPop(opcode & 0x00ff, pc)
+        elif (opcode & 0xf800) == 0xf000:
+            # BL(1)
+            immediate = opcode & 0x07ff
+            if immediate & 0x0400:
+                immediate -= 0x800
+            return [prefetch, 'gprs[14] = %#x' % ((pc + (immediate << 12)) & 0xffffffff)], False
+        return None
+
+    def readLiteral(self, address):
+        # Cartridge ROM is immutable, so literal pools there can be read at compile time
+        mmu = self.cpu.mmu
+        region = address >> mmu.BASE_OFFSET
+        if region < mmu.REGION_CART0 or region >= mmu.REGION_CART_SRAM:
+            return None
+        return mmu.load32(address) & 0xffffffff
+
+    def isWorkingRam(self, address):
+        mmu = self.cpu.mmu
+        return (address >> mmu.BASE_OFFSET) in (mmu.REGION_WORKING_RAM, mmu.REGION_WORKING_IRAM)
+
+    def emitRegionSwitch(self, size, fast, slow):
+        # Word accesses that land inside IWRAM or EWRAM go straight to the backing buffer,
+        # anything else (other regions, misalignment, mirror wraparound) takes the mmu path
+        mmu = self.cpu.mmu
+        body = ['r = a >> %d' % mmu.BASE_OFFSET]
+        keyword = 'if'
+        for region, name in ((mmu.REGION_WORKING_IRAM, 'iram'), (mmu.REGION_WORKING_RAM, 'ewram')):
+            memory = mmu.memory[region]
+            body.append('%s r == %d and not a & 3 and (a & %#x) <= %#x:' % (keyword, region, memory.mask, memory.mask + 1 - size))
+            body.append('    o = a & %#x' % memory.mask)
+            body.extend('    ' + line for line in fast(name, memory, region))
+            keyword = 'elif'
+        body.append('else:')
+        body.extend('    ' + line for line in slow)
+        return body
+
+    def emitInvalidate(self, name, memory, size):
+        bits = memory.ICACHE_PAGE_BITS
+        return [
+            'if %s.icache[o >> %d] or %s.icache[(o + %d) >> %d]:' % (name, bits, name, size - 1, bits),
+            '    %s.invalidatePage(o)' % name,
+            '    %s.invalidatePage(o + %d)' % (name, size - 1),
+        ]
+
+    def emitStackTransfer(self, load, rd, immediate, pc):
+        mmu = self.cpu.mmu
+        prefetch = 1 + mmu.waitstatesPrefetch[pc >> mmu.BASE_OFFSET]
+        if load:
+            def fast(name, memory, region):
+                return [
+                    'gprs[%d] = %s.view32[o >> 2]' % (rd, name),
+                    'cpu.cycles += %d' % (prefetch + 2 + mmu.waitstates32[region]),
+                ]
+            slow = [
+                'waitPrefetch(%#x)' % pc,
+                'gprs[15] = %#x' % pc,
+                'gprs[%d] = load32(a)' % rd,
+                'wait32(a)',
+                'cpu.cycles += 1',
+            ]
+        else:
+            def fast(name, memory, region):
+                return [
+                    '%s.view32[o >> 2] = gprs[%d] & 0xffffffff' % (name, rd),
+                    'cpu.cycles += %d' % (2 + mmu.waitstates[pc >> mmu.BASE_OFFSET] + mmu.waitstates32[region]),
+                ] + self.emitInvalidate(name, memory, 4)
+            slow = [
+                'store32(a, gprs[%d])' % rd,
+                'wait(%#x)' % pc,
+                'wait32(a)',
+            ]
+        return ['a = (gprs[13] + %d) & 0xffffffff' % immediate] + self.emitRegionSwitch(4, fast, slow), not load
+
+    def emitPush(self, rs, r, pc):
+        registers = [i for i in range(8) if rs & (1 << i)]
+        if r:
+            registers.append(14)
+        if not registers:
+            return None
+        mmu = self.cpu.mmu
+        size = 4 * len(registers)
+        def fast(name, memory, region):
+            body = ['w = %s.view32' % name, 'o >>= 2']
+            for offset, i in enumerate(registers):
+                body.append('w[o + %d] = gprs[%d] & 0xffffffff' % (offset, i))
+            return body + [
+                'o <<= 2',
+                'cpu.cycles += %d' % (
+                    2 + mmu.waitstatesPrefetch[pc >> mmu.BASE_OFFSET] + mmu.waitstates32[region] +
+                    (1 + mmu.waitstatesSeq32[region]) * (len(registers) - 1)
+                ),
+            ] + self.emitInvalidate(name, memory, size)
+        slow = ['waitPrefetch(%#x)' % pc]
+        for offset, i in reversed(list(enumerate(registers))):
+            slow.append('store32((a + %d) & 0xffffffff, gprs[%d])' % (4 * offset, i))
+        slow.append('waitMulti32((a - 4) & 0xffffffff, %d)' % len(registers))
+        return ['a = (gprs[13] - %d) & 0xffffffff' % size] + self.emitRegionSwitch(size, fast, slow) + ['gprs[13] = a'], True
+
+    def emitPop(self, rs, pc):
+        registers = [i for i in range(8) if rs & (1 << i)]
+        if not registers:
+            return None
+        mmu = self.cpu.mmu
+        size = 4 * len(registers)
+        def fast(name, memory, region):
+            body = ['w = %s.view32' % name, 'o >>= 2']
+            for offset, i in enumerate(registers):
+                body.append('gprs[%d] = w[o + %d]' % (i, offset))
+            return body + [
+                'cpu.cycles += %d' % (
+                    3 + mmu.waitstatesPrefetch[pc >> mmu.BASE_OFFSET] + mmu.waitstates32[region] +
+                    (1 + mmu.waitstatesSeq32[region]) * (2 * len(registers) - 1)
+                ),
+            ]
+        slow = ['waitPrefetch(%#x)' % pc, 'gprs[15] = %#x' % pc, 'cpu.cycles += 1']
+        for offset, i in enumerate(registers):
+            slow.append('waitSeq32((a + %d) & 0xffffffff)' % (4 * offset))
+            slow.append('gprs[%d] = load32((a + %d) & 0xffffffff)' % (i, 4 * offset))
+        slow.append('waitMulti32((a + %d) & 0xffffffff, %d)' % (size, len(registers)))
+        return ['a = gprs[13] & 0xffffffff'] + self.emitRegionSwitch(size, fast, slow) + ['gprs[13] = (a + %d) & 0xffffffff' % size], False
+
+    def emitTransfer(self, load, rd, address, loadName, storeName, waitName, pc):
+        if load:
+            return [
+                'n = (%s) & 0xffffffff' % address,
+                'waitPrefetch(%#x)' % pc,
+                'gprs[15] = %#x' % pc,
+                'gprs[%d] = %s(n)' % (rd, loadName),
+                '%s(n)' % waitName,
+                'cpu.cycles += 1',
+            ], False
+        return [
+            'n = (%s) & 0xffffffff' % address,
+            '%s(n, gprs[%d])' % (storeName, rd),
+            'wait(%#x)' % pc,
+            '%s(n)' % waitName,
+        ], True
+
+    def emitArm(self, opcode, pc):
+        if (opcode & 0xf0000000) != 0xe0000000:
+            return None
+        if (opcode & 0x0f7f0000) == 0x051f0000 and (opcode & 0x0000f000) != 0x0000f000:
+            # LDR Rd, [PC, #+/-immediate]
+            rd = (opcode & 0x0000f000) >> 12
+            immediate = opcode & 0x00000fff
+            address = pc + immediate if opcode & 0x00800000 else pc - immediate
+            literal = self.readLiteral(address)
+            if literal is None:
+                return None
+            mmu = self.cpu.mmu
+            return [
+                'waitPrefetch32(%#x)' % pc,
+                'gprs[%d] = %#x' % (rd, literal),
+                'cpu.cycles += %d' % (2 + mmu.waitstates32[address >> mmu.BASE_OFFSET]),
+            ], False
+        if (opcode & 0x0c000000) != 0x00000000:
+            return None
+        kind = (opcode & 0x01e00000) >> 21
+        s = opcode & 0x00100000
+        rn = (opcode & 0x000f0000) >> 16
+        rd = (opcode & 0x0000f000) >> 12
+        if opcode & 0x02000000:
+            immediate = opcode & 0x000000ff
+            rotate = (opcode & 0x00000f00) >> 7
+            operand = ((immediate >> rotate) | (immediate << (32 - rotate))) & 0xffffffff
+            carry = None
+            if rotate:
+                carry = '%d' % (operand > 0x7fffffff)
+            operand = '%#x' % operand
+        elif kind == 0xd and not s and not (opcode & 0x00000ff0) and (opcode & 0xf) != self.cpu.PC:
+            # MOV with an unshifted register
+            operand = 'gprs[%d]' % (opcode & 0xf)
+            carry = None
+        else:
+            return None
+
+        prefetch = 'waitPrefetch32(%#x)' % pc
+        operandN = self.readRegister(rn, pc)
+        if 0x8 <= kind <= 0xb:
+            if not s:
+                return None
+            if kind == 0x8:
+                # TST
+                body = self.emitLogical(None, '%s & %s' % (operandN, operand), carry)
+            elif kind == 0x9:
+                # TEQ
+                body = self.emitLogical(None, '%s ^ %s' % (operandN, operand), carry)
+            elif kind == 0xa:
+                # CMP
+                body = self.emitSub(None, operandN + ' & 0xffffffff', operand)
+            else:
+                # CMN
+                body = self.emitAdd(None, operandN + ' & 0xffffffff', operand)
+            return [prefetch] + body, False
+
+        if s or rd == self.cpu.PC:
+            return None
+        if kind == 0x0:
+            # AND
+            expression = '%s & %s' % (operandN, operand)
+        elif kind == 0x1:
+            # EOR
+            expression = '(%s ^ %s) & 0xffffffff' % (operandN, operand)
+        elif kind == 0x2:
+            # SUB
+            expression = '(%s - %s) & 0xffffffff' % (operandN, operand)
+        elif kind == 0x3:
+            # RSB
+            expression = '(%s - %s) & 0xffffffff' % (operand, operandN)
+        elif kind == 0x4:
+            # ADD
+            expression = '(%s + %s) & 0xffffffff' % (operandN, operand)
+        elif kind == 0xc:
+            # ORR
+            expression = '(%s | %s) & 0xffffffff' % (operandN, operand)
+        elif kind == 0xd:
+            # MOV
+            expression = operand
+        elif kind == 0xe:
+            # BIC
+            expression = '%s & ~%s & 0xffffffff' % (operandN, operand)
+        elif kind == 0xf:
+            # MVN
+            expression = '~%s & 0xffffffff' % operand
+        else:
+            return None
+        return [prefetch, 'gprs[%d] = %s' % (rd, expression)], False
@@ -0,0 +1,118 @@
+import random
+from gba import GameBoyAdvance
+from mmu import MemoryBlock
+
+# Runs random opcodes the block compiler emits inline, once as compiled source
+# and once through the instruction closures, and checks both leave the same state
+
+BASE = 0x03004000
+CASES = 500
+
+
+def makeGba(emit):
+    gba = GameBoyAdvance()
+    gba.logLevel = 0
+    gba.setBios(bytearray(0x4000), False)
+    # Only the CPU, memory and scheduler are exercised, so video memory is plain RAM
+    # and the video and audio resets are skipped
+    mmu = gba.mmu
+    mmu.clear()
+    gba.io.clear()
+    mmu.mmap(mmu.REGION_IO, gba.io)
+    mmu.mmap(mmu.REGION_PALETTE_RAM, MemoryBlock(mmu.SIZE_PALETTE_RAM, 9))
+    mmu.mmap(mmu.REGION_VRAM, MemoryBlock(mmu.SIZE_VRAM, 9))
+    mmu.mmap(mmu.REGION_OAM, MemoryBlock(mmu.SIZE_OAM, 9))
+    gba.video.nextEvent = float('inf')
+    gba.cpu.resetCPU(0)
+    if not emit:
+        # Every instruction falls back to calling its closure
+        gba.cpu.blockCompiler.emitArm = lambda opcode, pc: None
+        gba.cpu.blockCompiler.emitThumb = lambda opcode, pc: None
+    return gba
+
+
+def randomOpcodes(rnd, thumb, compiler):
+    opcodes = []
+    length = rnd.randint(1, 6)
+    while len(opcodes) < length:
+        if thumb:
+            opcode = rnd.getrandbits(16)
+            emitted = compiler.emitThumb(opcode, BASE)
+        else:
+            opcode = 0xe0000000 | rnd.getrandbits(28)
+            emitted = compiler.emitArm(opcode, BASE)
+        if emitted:
+            opcodes.append(opcode)
+    return opcodes
+
+
+def randomRegisters(rnd):
+    registers = []
+    for i in range(15):
+        kind = rnd.random()
+        if kind < 0.5:
+            registers.append(0x03006000 + (rnd.getrandbits(10) & ~3))
+        elif kind < 0.7:
+            registers.append(0x02000100 + (rnd.getrandbits(10) & ~3))
+        elif kind < 0.8:
+            registers.append(rnd.getrandbits(5))
+        else:
+            registers.append(rnd.getrandbits(32))
+    registers[13] = 0x03007e00 + (rnd.getrandbits(7) << 2)
+    return registers
+
+
+def run(seed, thumb, opcodes, registers, nzcv, emit):
+    gba = makeGba(emit)
+    cpu = gba.cpu
+    mmu = gba.mmu
+    rnd = random.Random(seed)
+    for i in range(0, 0x800, 4):
+        mmu.store32(0x03006000 + i, rnd.getrandbits(32))
+        mmu.store32(0x02000100 + i, rnd.getrandbits(32))
+    if thumb:
+        cpu.switchExecMode(cpu.MODE_THUMB)
+        for i, opcode in enumerate(opcodes + [0xe7fe]):
+            mmu.store16(BASE + i * 2, opcode)
+    else:
+        for i, opcode in enumerate(opcodes + [0xeafffffe]):
+            mmu.store32(BASE + i * 4, opcode)
+    for i, value in enumerate(registers):
+        cpu.gprs[i] = value
+    cpu.gprs[cpu.PC] = BASE + cpu.instructionWidth
+    cpu.nzcv = nzcv
+    cpu.cycles = 0
+
+    cpu.step()
+
+    if cpu.lazyFlags:
+        cpu.resolveFlags()
+    return (
+        [value & 0xffffffff for value in cpu.gprs],
+        cpu.nzcv,
+        cpu.cycles,
+        bytes(mmu.memory[mmu.REGION_WORKING_IRAM].buffer),
+        bytes(mmu.memory[mmu.REGION_WORKING_RAM].buffer),
+    )
+
+
+compiler = makeGba(True).cpu.blockCompiler
+compared = 0
+for seed in range(CASES):
+    rnd = random.Random(seed)
+    thumb = bool(seed & 1)
+    opcodes = randomOpcodes(rnd, thumb, compiler)
+    registers = randomRegisters(rnd)
+    nzcv = rnd.getrandbits(4)
+    try:
+        expected = run(seed, thumb, opcodes, registers, nzcv, False)
+    except (IndexError, ValueError):
+        # The closures don't mask every intermediate, so wild addresses can fall off the memory map
+        continue
+    actual = run(seed, thumb, opcodes, registers, nzcv, True)
+    for name, a, b in zip(('gprs', 'nzcv', 'cycles', 'iram', 'ewram'), actual, expected):
+        assert a == b, 'seed %d %s %s: %s differs' % (seed, 'thumb' if thumb else 'arm', [hex(opcode) for opcode in opcodes], name)
+    compared += 1
+
+assert compared > CASES * 0.9, 'only %d of %d cases compared' % (compared, CASES)
+print('%d of %d blocks match the closures' % (compared, CASES))
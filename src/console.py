@@ -25,6 +25,8 @@ class Console:
 
     def updateCPSR(self):
         cpu = self.cpu
+        if cpu.lazyFlags:
+            cpu.resolveFlags()
         bit = lambda psr, member: getattr(cpu, member)
         cpsrN = bit('cpsrN', 'cpsrN')
         cpsrZ = bit('cpsrZ', 'cpsrZ')
@@ -0,0 +1,528 @@
+class ARMCoreDecoder:
+    def __init__(self, cpu):
+        self.cpu = cpu
+
+        # ARM opcodes are indexed by bits 27-20 and 7-4, Thumb opcodes by bits 15-6
+        self.armTable = [None] * 4096
+        self.thumbTable = [None] * 1024
+        self.buildArmTable()
+        self.buildThumbTable()
+
+    def buildArmTable(self):
+        arm = self.cpu.armCompiler
+        dataProcessing = [
+            (arm.constructAND, arm.constructANDS),
+            (arm.constructEOR, arm.constructEORS),
+            (arm.constructSUB, arm.constructSUBS),
+            (arm.constructRSB, arm.constructRSBS),
+            (arm.constructADD, arm.constructADDS),
+            (arm.constructADC, arm.constructADCS),
+            (arm.constructSBC, arm.constructSBCS),
+            (arm.constructRSC, arm.constructRSCS),
+            (arm.constructTST, arm.constructTST),
+            (arm.constructTEQ, arm.constructTEQ),
+            (arm.constructCMP, arm.constructCMP),
+            (arm.constructCMN, arm.constructCMN),
+            (arm.constructORR, arm.constructORRS),
+            (arm.constructMOV, arm.constructMOVS),
+            (arm.constructBIC, arm.constructBICS),
+            (arm.constructMVN, arm.constructMVNS)
+        ]
+        multiplies = {
+            0x0: self.armMultiplyShort(arm.constructMUL),
+            0x1: self.armMultiplyShort(arm.constructMULS),
+            0x2: self.armMultiply(arm.constructMLA),
+            0x3: self.armMultiply(arm.constructMLAS),
+            0x8: self.armMultiply(arm.constructUMULL),
+            0x9: self.armMultiply(arm.constructUMULLS),
+            0xa: self.armMultiply(arm.constructUMLAL),
+            0xb: self.armMultiply(arm.constructUMLALS),
+            0xc: self.armMultiply(arm.constructSMULL),
+            0xd: self.armMultiply(arm.constructSMULLS),
+            0xe: self.armMultiply(arm.constructSMLAL),
+            0xf: self.armMultiply(arm.constructSMLALS)
+        }
+        for index in range(4096):
+            instruction = ((index & 0xff0) << 16) | ((index & 0x00f) << 4)
+            i = instruction & 0x0e000000
+            decode = self.decodeUndefined
+            if index == 0x121:
+                decode = self.decodeArmBX
+            elif not (instruction & 0x0c000000) and (i == 0x02000000 or (instruction & 0x00000090) != 0x00000090):
+                opcode = (instruction & 0x01e00000) >> 21
+                s = instruction & 0x00100000
+                if (opcode & 0xc) == 0x8 and not s:
+                    decode = self.decodeArmStatus
+                else:
+                    decode = self.armDataProcessing(dataProcessing[opcode][bool(s)])
+            elif (instruction & 0x0fb000f0) == 0x01000090:
+                decode = self.decodeArmSwap
+            elif i == 0x00000000:
+                if (instruction & 0x010000f0) == 0x00000090:
+                    decode = multiplies.get((instruction & 0x00f00000) >> 20, self.decodeUndefined)
+                else:
+                    load = instruction & 0x00100000
+                    h = instruction & 0x00000020
+                    s = instruction & 0x00000040
+                    if load and h and s:
+                        decode = self.armHalfwordTransfer(arm.constructLDRSH)
+                    elif load and h:
+                        decode = self.armHalfwordTransfer(arm.constructLDRH)
+                    elif load and s:
+                        decode = self.armHalfwordTransfer(arm.constructLDRSB)
+                    elif not load and h and not s:
+                        decode = self.armHalfwordTransfer(arm.constructSTRH)
+            elif i == 0x04000000 or i == 0x06000000:
+                load = instruction & 0x00100000
+                b = instruction & 0x00400000
+                if load:
+                    decode = self.armSingleTransfer(arm.constructLDRB if b else arm.constructLDR)
+                else:
+                    decode = self.armSingleTransfer(arm.constructSTRB if b else arm.constructSTR)
+            elif i == 0x08000000:
+                load = instruction & 0x00100000
+                user = instruction & 0x00400000
+                if load:
+                    decode = self.armBlockTransfer(arm.constructLDMS if user else arm.constructLDM, True)
+                else:
+                    decode = self.armBlockTransfer(arm.constructSTMS if user else arm.constructSTM, False)
+            elif i == 0x0a000000:
+                decode = self.armBranch(arm.constructBL if instruction & 0x01000000 else arm.constructB)
+            elif (instruction & 0x0f000000) == 0x0f000000:
+                decode = self.decodeArmSWI
+            self.armTable[index] = decode
+
+    def buildThumbTable(self):
+        thumb = self.cpu.thumbCompiler
+        dataProcessing = [
+            thumb.constructAND,
+            thumb.constructEOR,
+            thumb.constructLSL2,
+            thumb.constructLSR2,
+            thumb.constructASR2,
+            thumb.constructADC,
+            thumb.constructSBC,
+            thumb.constructROR,
+            thumb.constructTST,
+            thumb.constructNEG,
+            thumb.constructCMP2,
+            thumb.constructCMN,
+            thumb.constructORR,
+            thumb.constructMUL,
+            thumb.constructBIC,
+            thumb.constructMVN
+        ]
+        specialDataProcessing = [
+            self.decodeThumbADD4,
+            self.decodeThumbCMP3,
+            self.decodeThumbMOV3,
+            self.decodeThumbBX
+        ]
+        addSubtract = [
+            thumb.constructADD3,
+            thumb.constructSUB3,
+            thumb.constructADD1,
+            thumb.constructSUB1
+        ]
+        shiftImmediate = [
+            thumb.constructLSL1,
+            thumb.constructLSR1,
+            thumb.constructASR1
+        ]
+        immediate = [
+            thumb.constructMOV1,
+            thumb.constructCMP1,
+            thumb.constructADD2,
+            thumb.constructSUB2
+        ]
+        registerOffset = [
+            thumb.constructSTR2,
+            thumb.constructSTRH2,
+            thumb.constructSTRB2,
+            thumb.constructLDRSB,
+            thumb.constructLDR2,
+            thumb.constructLDRH2,
+            thumb.constructLDRB2,
+            thumb.constructLDRSH
+        ]
+        for index in range(1024):
+            instruction = index << 6
+            decode = self.decodeUndefined
+            if (instruction & 0xfc00) == 0x4000:
+                decode = self.thumbTwoRegister(dataProcessing[(instruction & 0x03c0) >> 6])
+            elif (instruction & 0xfc00) == 0x4400:
+                decode = specialDataProcessing[(instruction & 0x0300) >> 8]
+            elif (instruction & 0xf800) == 0x1800:
+                kind = (instruction & 0x0600) >> 9
+                if kind == 2 and not (instruction & 0x01c0):
+                    decode = self.thumbThreeRegister(thumb.constructMOV2)
+                else:
+                    decode = self.thumbThreeRegister(addSubtract[kind])
+            elif not (instruction & 0xe000):
+                kind = (instruction & 0x1800) >> 11
+                decode = self.thumbShiftImmediate(shiftImmediate[kind])
+            elif (instruction & 0xe000) == 0x2000:
+                decode = self.thumbImmediate(immediate[(instruction & 0x1800) >> 11], 0)
+            elif (instruction & 0xf800) == 0x4800:
+                decode = self.thumbImmediate(thumb.constructLDR3, 2)
+            elif (instruction & 0xf000) == 0x5000:
+                decode = self.thumbThreeRegister(registerOffset[(instruction & 0x0e00) >> 9])
+            elif (instruction & 0xe000) == 0x6000:
+                load = instruction & 0x0800
+                if instruction & 0x1000:
+                    decode = self.thumbImmediateOffset(thumb.constructLDRB1 if load else thumb.constructSTRB1, 0)
+                else:
+                    decode = self.thumbImmediateOffset(thumb.constructLDR1 if load else thumb.constructSTR1, 2)
+            elif (instruction & 0xf600) == 0xb400:
+                decode = self.decodeThumbPOP if instruction & 0x0800 else self.decodeThumbPUSH
+            elif (instruction & 0xf000) == 0x8000:
+                decode = self.thumbImmediateOffset(thumb.constructLDRH1 if instruction & 0x0800 else thumb.constructSTRH1, 1)
+            elif (instruction & 0xf000) == 0x9000:
+                decode = self.thumbImmediate(thumb.constructLDR4 if instruction & 0x0800 else thumb.constructSTR3, 2)
+            elif (instruction & 0xf000) == 0xa000:
+                decode = self.thumbImmediate(thumb.constructADD6 if instruction & 0x0800 else thumb.constructADD5, 2)
+            elif (instruction & 0xff00) == 0xb000:
+                decode = self.decodeThumbADD7
+            elif (instruction & 0xf000) == 0xc000:
+                decode = self.thumbMultiple(thumb.constructLDMIA if instruction & 0x0800 else thumb.constructSTMIA)
+            elif (instruction & 0xf000) == 0xd000:
+                cond = (instruction & 0x0f00) >> 8
+                if cond == 0xf:
+                    decode = self.decodeThumbSWI
+                elif cond != 0xe:
+                    decode = self.thumbConditionalBranch(cond)
+            elif (instruction & 0xf800) == 0xe000:
+                decode = self.decodeThumbB2
+            elif (instruction & 0xf800) == 0xf000:
+                decode = self.decodeThumbBL1
+            elif (instruction & 0xf800) == 0xf800:
+                decode = self.decodeThumbBL2
+            self.thumbTable[index] = decode
+
+    def decodeUndefined(self, instruction):
+        return self.cpu.badOp(instruction)
+
+    def armShifterOperand(self, instruction):
+        arm = self.cpu.armCompiler
+        rm = instruction & 0x0000000f
+        shiftType = instruction & 0x00000060
+        if instruction & 0x02000000:
+            immediate = instruction & 0x000000ff
+            rotate = (instruction & 0x00000f00) >> 7
+            if not rotate:
+                return arm.constructAddressingMode1Immediate(immediate)
+            return arm.constructAddressingMode1ImmediateRotate(immediate, rotate)
+        elif instruction & 0x00000010:
+            rs = (instruction & 0x00000f00) >> 8
+            if shiftType == 0x00000000:
+                return arm.constructAddressingMode1LSL(rs, rm)
+            elif shiftType == 0x00000020:
+                return arm.constructAddressingMode1LSR(rs, rm)
+            elif shiftType == 0x00000040:
+                return arm.constructAddressingMode1ASR(rs, rm)
+            return arm.constructAddressingMode1ROR(rs, rm)
+        immediate = (instruction & 0x00000f80) >> 7
+        return self.cpu.barrel_shift_immediate(shiftType, immediate, rm)
+
+    def armDataProcessing(self, construct):
+        cpu = self.cpu
+        def decode(instruction):
+            rn = (instruction & 0x000f0000) >> 16
+            rd = (instruction & 0x0000f000) >> 12
+            shiftOp = self.armShifterOperand(instruction)
+            op = construct(rd, rn, shiftOp, cpu.conds[instruction >> 28])
+            op.writesPC = rd == cpu.PC
+            return op
+        return decode
+
+    def decodeArmBX(self, instruction):
+        cpu = self.cpu
+        if (instruction & 0x0ffffff0) != 0x012fff10:
+            return self.decodeArmStatus(instruction)
+        op = cpu.armCompiler.constructBX(instruction & 0xf, cpu.conds[instruction >> 28])
+        op.writesPC = True
+        op.fixedJump = False
+        return op
+
+    def decodeArmStatus(self, instruction):
+        cpu = self.cpu
+        condOp = cpu.conds[instruction >> 28]
+        r = instruction & 0x00400000
+        if (instruction & 0x00b0f000) == 0x0020f000:
+            # MSR
+            rm = instruction & 0x0000000f
+            immediate = instruction & 0x000000ff
+            rotateImm = (instruction & 0x00000f00) >> 7
+            immediate = ((immediate >> rotateImm) | (immediate << (32 - rotateImm))) & 0xffffffff
+            op = cpu.armCompiler.constructMSR(rm, r, instruction, immediate, condOp)
+            op.writesPC = False
+        elif (instruction & 0x00bf0000) == 0x000f0000:
+            # MRS
+            rd = (instruction & 0x0000f000) >> 12
+            op = cpu.armCompiler.constructMRS(rd, r, condOp)
+            op.writesPC = rd == cpu.PC
+        else:
+            op = cpu.badOp(instruction)
+        return op
+
+    def decodeArmSwap(self, instruction):
+        cpu = self.cpu
+        if (instruction & 0x0fb00ff0) != 0x01000090:
+            return cpu.badOp(instruction)
+        rm = instruction & 0x0000000f
+        rd = (instruction >> 12) & 0x0000000f
+        rn = (instruction >> 16) & 0x0000000f
+        if instruction & 0x00400000:
+            op = cpu.armCompiler.constructSWPB(rd, rn, rm, cpu.conds[instruction >> 28])
+        else:
+            op = cpu.armCompiler.constructSWP(rd, rn, rm, cpu.conds[instruction >> 28])
+        op.writesPC = rd == cpu.PC
+        return op
+
+    def armMultiplyShort(self, construct):
+        cpu = self.cpu
+        def decode(instruction):
+            rd = (instruction & 0x000f0000) >> 16
+            rs = (instruction & 0x00000f00) >> 8
+            rm = instruction & 0x0000000f
+            op = construct(rd, rs, rm, cpu.conds[instruction >> 28])
+            op.writesPC = rd == cpu.PC
+            return op
+        return decode
+
+    def armMultiply(self, construct):
+        cpu = self.cpu
+        def decode(instruction):
+            rd = (instruction & 0x000f0000) >> 16
+            rn = (instruction & 0x0000f000) >> 12
+            rs = (instruction & 0x00000f00) >> 8
+            rm = instruction & 0x0000000f
+            op = construct(rd, rn, rs, rm, cpu.conds[instruction >> 28])
+            op.writesPC = rd == cpu.PC
+            return op
+        return decode
+
+    def armHalfwordTransfer(self, construct):
+        cpu = self.cpu
+        def decode(instruction):
+            condOp = cpu.conds[instruction >> 28]
+            rd = (instruction & 0x0000f000) >> 12
+            if instruction & 0x00400000:
+                immediate = (instruction & 0x0000000f) | ((instruction & 0x00000f00) >> 4)
+                address = cpu.armCompiler.constructAddressingMode23Immediate(instruction, immediate, condOp)
+            else:
+                address = cpu.armCompiler.constructAddressingMode23Register(instruction, instruction & 0x0000000f, condOp)
+            op = construct(rd, address, condOp)
+            op.writesPC = rd == cpu.PC or address.writesPC
+            return op
+        return decode
+
+    def armSingleTransfer(self, construct):
+        cpu = self.cpu
+        def decode(instruction):
+            condOp = cpu.conds[instruction >> 28]
+            rd = (instruction & 0x0000f000) >> 12
+            if instruction & 0x02000000:
+                # Register offset
+                rm = instruction & 0x0000000f
+                shiftType = instruction & 0x00000060
+                shiftImmediate = (instruction & 0x00000f80) >> 7
+                if shiftType or shiftImmediate:
+                    shiftOp = cpu.barrel_shift_immediate(shiftType, shiftImmediate, rm)
+                    address = cpu.armCompiler.constructAddressingMode2RegisterShifted(instruction, shiftOp, condOp)
+                else:
+                    address = cpu.armCompiler.constructAddressingMode23Register(instruction, rm, condOp)
+            else:
+                # Immediate
+                address = cpu.armCompiler.constructAddressingMode23Immediate(instruction, instruction & 0x00000fff, condOp)
+            op = construct(rd, address, condOp)
+            op.writesPC = rd == cpu.PC or address.writesPC
+            return op
+        return decode
+
+    def armBlockTransfer(self, construct, load):
+        cpu = self.cpu
+        def decode(instruction):
+            w = instruction & 0x00200000
+            rs = instruction & 0x0000ffff
+            rn = (instruction & 0x000f0000) >> 16
+            immediate = 0
+            offset = 0
+            overlap = False
+            if instruction & 0x00800000:
+                if instruction & 0x01000000:
+                    immediate = 4
+                for i in range(16):
+                    m = 1 << i
+                    if rs & m:
+                        if w and i == rn and not offset:
+                            rs &= ~m
+                            immediate += 4
+                            overlap = True
+                        offset += 4
+            else:
+                if not (instruction & 0x01000000):
+                    immediate = 4
+                for i in range(16):
+                    m = 1 << i
+                    if rs & m:
+                        if w and i == rn and not offset:
+                            rs &= ~m
+                            immediate += 4
+                            overlap = True
+                        immediate -= 4
+                        offset -= 4
+            if w:
+                address = cpu.armCompiler.constructAddressingMode4Writeback(immediate, offset, rn, overlap)
+            else:
+                address = cpu.armCompiler.constructAddressingMode4(immediate, rn)
+            op = construct(rs, address, cpu.conds[instruction >> 28])
+            op.writesPC = load and bool(rs & 0x8000)
+            return op
+        return decode
+
+    def armBranch(self, construct):
+        cpu = self.cpu
+        def decode(instruction):
+            immediate = instruction & 0x00ffffff
+            if immediate & 0x00800000:
+                immediate -= 0x01000000
+            op = construct(immediate << 2, cpu.conds[instruction >> 28])
+            op.writesPC = True
+            op.fixedJump = True
+            return op
+        return decode
+
+    def decodeArmSWI(self, instruction):
+        cpu = self.cpu
+        op = cpu.armCompiler.constructSWI(instruction & 0x00ffffff, cpu.conds[instruction >> 28])
+        op.writesPC = False
+        return op
+
+    def thumbTwoRegister(self, construct):
+        def decode(instruction):
+            op = construct(instruction & 0x0007, (instruction & 0x0038) >> 3)
+            op.writesPC = False
+            return op
+        return decode
+
+    def thumbThreeRegister(self, construct):
+        def decode(instruction):
+            op = construct(instruction & 0x0007, (instruction & 0x0038) >> 3, (instruction & 0x01c0) >> 6)
+            op.writesPC = False
+            return op
+        return decode
+
+    def thumbShiftImmediate(self, construct):
+        def decode(instruction):
+            op = construct(instruction & 0x0007, (instruction & 0x0038) >> 3, (instruction & 0x07c0) >> 6)
+            op.writesPC = False
+            return op
+        return decode
+
+    def thumbImmediate(self, construct, shift):
+        def decode(instruction):
+            op = construct((instruction & 0x0700) >> 8, (instruction & 0x00ff) << shift)
+            op.writesPC = False
+            return op
+        return decode
+
+    def thumbImmediateOffset(self, construct, shift):
+        def decode(instruction):
+            immediate = ((instruction & 0x07c0) >> 6) << shift
+            op = construct(instruction & 0x0007, (instruction & 0x0038) >> 3, immediate)
+            op.writesPC = False
+            return op
+        return decode
+
+    def thumbMultiple(self, construct):
+        def decode(instruction):
+            op = construct((instruction & 0x0700) >> 8, instruction & 0x00ff)
+            op.writesPC = False
+            return op
+        return decode
+
+    def thumbConditionalBranch(self, cond):
+        cpu = self.cpu
+        def decode(instruction):
+            immediate = instruction & 0x00ff
+            if immediate & 0x0080:
+                immediate -= 0x0100
+            op = cpu.thumbCompiler.constructB1(immediate << 1, cpu.conds[cond])
+            op.writesPC = True
+            op.fixedJump = True
+            return op
+        return decode
+
+    def decodeThumbADD4(self, instruction):
+        rd = (instruction & 0x0007) | ((instruction & 0x0080) >> 4)
+        op = self.cpu.thumbCompiler.constructADD4(rd, (instruction & 0x0078) >> 3)
+        op.writesPC = rd == self.cpu.PC
+        return op
+
+    def decodeThumbCMP3(self, instruction):
+        rd = (instruction & 0x0007) | ((instruction & 0x0080) >> 4)
+        op = self.cpu.thumbCompiler.constructCMP3(rd, (instruction & 0x0078) >> 3)
+        op.writesPC = False
+        return op
+
+    def decodeThumbMOV3(self, instruction):
+        rd = (instruction & 0x0007) | ((instruction & 0x0080) >> 4)
+        op = self.cpu.thumbCompiler.constructMOV3(rd, (instruction & 0x0078) >> 3)
+        op.writesPC = rd == self.cpu.PC
+        return op
+
+    def decodeThumbBX(self, instruction):
+        rd = (instruction & 0x0007) | ((instruction & 0x0080) >> 4)
+        op = self.cpu.thumbCompiler.constructBX(rd, (instruction & 0x0078) >> 3)
+        op.writesPC = True
+        op.fixedJump = False
+        return op
+
+    def decodeThumbPUSH(self, instruction):
+        op = self.cpu.thumbCompiler.constructPUSH(instruction & 0x00ff, bool(instruction & 0x0100))
+        op.writesPC = False
+        return op
+
+    def decodeThumbPOP(self, instruction):
+        r = bool(instruction & 0x0100)
+        op = self.cpu.thumbCompiler.constructPOP(instruction & 0x00ff, r)
+        op.writesPC = r
+        op.fixedJump = False
+        return op
+
+    def decodeThumbADD7(self, instruction):
+        immediate = (instruction & 0x7f) << 2
+        if instruction & 0x0080:
+            immediate = -immediate
+        op = self.cpu.thumbCompiler.constructADD7(immediate)
+        op.writesPC = False
+        return op
+
+    def decodeThumbSWI(self, instruction):
+        op = self.cpu.thumbCompiler.constructSWI(instruction & 0x00ff)
+        op.writesPC = False
+        return op
+
+    def decodeThumbB2(self, instruction):
+        immediate = instruction & 0x07ff
+        if immediate & 0x0400:
+            immediate -= 0x0800
+        op = self.cpu.thumbCompiler.constructB2(immediate << 1)
+        op.writesPC = True
+        op.fixedJump = True
+        return op
+
+    def decodeThumbBL1(self, instruction):
+        immediate = instruction & 0x07ff
+        if immediate & 0x0400:
+            immediate -= 0x0800
+        op = self.cpu.thumbCompiler.constructBL1(immediate << 12)
+        op.writesPC = False
+        return op
+
+    def decodeThumbBL2(self, instruction):
+        op = self.cpu.thumbCompiler.constructBL2(instruction & 0x07ff)
+        op.writesPC = True
+        op.fixedJump = False
+        return op
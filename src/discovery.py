@@ -0,0 +1,144 @@
+import mmap
+
+
+def discoverCode(rom):
+    # Entry point for the worker process; only plain data crosses the process boundary
+    return ARMCodeDiscovery(rom).run()
+
+
+def discoverCodeFromPath(path):
+    # Maps the ROM in the worker so the main process never copies or pickles it
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as rom:
+        return discoverCode(rom)
+
+
+class ARMCodeDiscovery:
+    def __init__(self, rom):
+        self.BASE_CART = 0x08000000
+        self.MAX_INSTRUCTIONS = 0x40000
+
+        self.rom = rom
+        self.size = min(len(rom), 0x02000000)
+        self.arm = set()
+        self.thumb = set()
+
+    def run(self):
+        work = [(self.BASE_CART, False)]
+        while work and len(self.arm) + len(self.thumb) < self.MAX_INSTRUCTIONS:
+            address, thumb = work.pop()
+            if thumb:
+                self.walkThumb(address, work)
+            else:
+                self.walkArm(address, work)
+        return sorted(self.arm), sorted(self.thumb)
+
+    def inRom(self, address, width):
+        offset = address - self.BASE_CART
+        return 0 <= offset and offset + width <= self.size
+
+    def read16(self, address):
+        offset = address - self.BASE_CART
+        return self.rom[offset] | (self.rom[offset + 1] << 8)
+
+    def read32(self, address):
+        offset = address - self.BASE_CART
+        return int.from_bytes(self.rom[offset:offset + 4], 'little')
+
+    def queuePointer(self, work, value, branch=False):
+        # Odd literals are Thumb function pointers; even ones are only trusted as branch targets
+        if value & 1:
+            if self.inRom(value & 0xfffffffe, 2):
+                work.append((value & 0xfffffffe, True))
+        elif branch and self.inRom(value & 0xfffffffc, 4):
+            work.append((value & 0xfffffffc, False))
+
+    def walkArm(self, address, work):
+        literals = {}
+        while address & 3 == 0 and self.inRom(address, 4) and address not in self.arm:
+            self.arm.add(address)
+            op = self.read32(address)
+            cond = op >> 28
+            pc = address + 8
+            always = cond == 0xe
+            if cond == 0xf:
+                if op & 0x0e000000 != 0x0a000000:
+                    break
+                # BLX immediate
+                target = pc + ((((op & 0xffffff) ^ 0x800000) - 0x800000) << 2) + ((op >> 23) & 2)
+                work.append((target, True))
+            elif op & 0x0e000000 == 0x0a000000:
+                target = pc + ((((op & 0xffffff) ^ 0x800000) - 0x800000) << 2)
+                work.append((target, False))
+                if always and not op & 0x01000000:
+                    break
+            elif op & 0x0ffffff0 == 0x012fff10:
+                value = literals.get(op & 0xf)
+                if value is not None:
+                    self.queuePointer(work, value, True)
+                if always:
+                    break
+            elif op & 0x0f7f0000 == 0x051f0000:
+                offset = op & 0xfff
+                literal = pc + offset if op & 0x00800000 else pc - offset
+                if self.inRom(literal, 4):
+                    value = self.read32(literal)
+                    rd = (op >> 12) & 0xf
+                    literals[rd] = value
+                    self.queuePointer(work, value, rd == 15)
+                if always and op & 0x0000f000 == 0x0000f000:
+                    break
+            elif op & 0x0fff0000 == 0x028f0000:
+                rotate = (op >> 7) & 0x1e
+                immediate = op & 0xff
+                immediate = ((immediate >> rotate) | (immediate << (32 - rotate))) & 0xffffffff
+                literals[(op >> 12) & 0xf] = (pc + immediate) & 0xffffffff
+            elif always and self.armWritesPC(op):
+                break
+            address += 4
+
+    def armWritesPC(self, op):
+        if op & 0x0c000000 == 0:
+            # Data processing, excluding the flag-only compares
+            return op & 0x0000f000 == 0x0000f000 and not (op & 0x01900000 == 0x01000000)
+        if op & 0x0c000000 == 0x04000000:
+            return op & 0x0010f000 == 0x0010f000
+        if op & 0x0e000000 == 0x08000000:
+            return op & 0x00108000 == 0x00108000
+        return False
+
+    def walkThumb(self, address, work):
+        literals = {}
+        while self.inRom(address, 2) and address not in self.thumb:
+            self.thumb.add(address)
+            op = self.read16(address)
+            pc = address + 4
+            if op & 0xf800 == 0xf000 and self.inRom(address + 2, 2):
+                low = self.read16(address + 2)
+                if low & 0xf800 == 0xf800:
+                    target = pc + ((((op & 0x7ff) ^ 0x400) - 0x400) << 12) + ((low & 0x7ff) << 1)
+                    work.append((target, True))
+                    self.thumb.add(address + 2)
+                    address += 4
+                    continue
+            if op & 0xf800 == 0xe000:
+                work.append((pc + ((((op & 0x7ff) ^ 0x400) - 0x400) << 1), True))
+                break
+            elif op & 0xf000 == 0xd000 and op & 0x0f00 < 0x0e00:
+                work.append((pc + ((((op & 0xff) ^ 0x80) - 0x80) << 1), True))
+            elif op & 0xff80 == 0x4700:
+                value = literals.get((op >> 3) & 0xf)
+                if value is not None:
+                    self.queuePointer(work, value, True)
+                break
+            elif op & 0xf800 == 0x4800:
+                literal = (pc & 0xfffffffc) + ((op & 0xff) << 2)
+                if self.inRom(literal, 4):
+                    value = self.read32(literal)
+                    literals[(op >> 8) & 7] = value
+                    self.queuePointer(work, value)
+            elif op & 0xf800 == 0xa000:
+                literals[(op >> 8) & 7] = (pc & 0xfffffffc) + ((op & 0xff) << 2)
+            elif op & 0xff00 == 0xbd00 or op & 0xfd87 == 0x4487:
+                # POP {..., PC}, or ADD/MOV with PC as the destination
+                break
+            address += 2
@@ -1,4 +1,7 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
 from core import ARMCore
+from discovery import discoverCode, discoverCodeFromPath
 from mmu import GameBoyAdvanceMMU
 from irq import GameBoyAdvanceInterruptHandler
 from gbio import GameBoyAdvanceIO
@@ -19,6 +22,15 @@ class GameBoyAdvance:
         self.logLevel = self.LOG_ERROR | self.LOG_WARN
 
         self.rom = None
+        self.romPath = None
+        self.blockCacheDir = None
+        self.blockCachePath = None
+
+        # Optional pre-pass that finds reachable ROM code in a worker process
+        self.codeDiscovery = False
+        self.PREDECODE_CHUNK = 2048
+        self.discovery = None
+        self.discovered = []
 
         self.cpu = ARMCore()
         self.cycles = self.cpu.cycles
@@ -112,12 +124,72 @@ class GameBoyAdvance:
     def setRom(self, rom):
         self.reset()
 
-        self.rom = self.mmu.loadRom(rom, True)
+        self.romPath = None
+        self.blockCachePath = None
+        self.cpu.blockCompiler.persisted = {}
+        self.rom = self.mmu.loadRom(rom, True, True)
+        if not self.rom:
+            return False
+        self.startCodeDiscovery()
+        self.retrieveSavedata()
+        return True
+
+    def loadRomFromPath(self, path):
+        self.reset()
+
+        self.romPath = None
+        self.rom = self.mmu.loadRomFromPath(path, True)
         if not self.rom:
             return False
+        self.romPath = path
+        if self.blockCacheDir:
+            self.blockCachePath = os.path.join(self.blockCacheDir, os.path.basename(path) + '.blocks')
+        else:
+            self.blockCachePath = path + '.blocks'
+        self.cpu.blockCompiler.loadCache(self.blockCachePath)
+        self.startCodeDiscovery()
         self.retrieveSavedata()
         return True
 
+    def startCodeDiscovery(self):
+        self.discovered = []
+        self.discovery = None
+        if not self.codeDiscovery:
+            return
+        executor = ProcessPoolExecutor(max_workers=1)
+        if self.romPath:
+            self.discovery = executor.submit(discoverCodeFromPath, self.romPath)
+        else:
+            self.discovery = executor.submit(discoverCode, bytes(self.mmu.cart['memory']))
+        executor.shutdown(wait=False)
+
+    def predecodeDiscovered(self):
+        # Results are applied a chunk per frame so no single frame absorbs the whole cost
+        if self.discovery and self.discovery.done():
+            try:
+                arm, thumb = self.discovery.result()
+            except Exception:
+                arm, thumb = [], []
+            self.discovery = None
+            self.discovered = [(arm, False), (thumb, True)]
+        if not self.discovered:
+            return
+        addresses, thumb = self.discovered[-1]
+        chunk = addresses[:self.PREDECODE_CHUNK]
+        done = self.cpu.predecode(chunk, thumb)
+        if done < len(chunk):
+            # The icache budget is full
+            self.discovered = []
+            return
+        del addresses[:self.PREDECODE_CHUNK]
+        if not addresses:
+            self.discovered.pop()
+
+    def saveBlockCache(self):
+        if not self.blockCachePath:
+            return False
+        return self.cpu.blockCompiler.saveCache(self.blockCachePath)
+
     def hasRom(self):
         return bool(self.rom)
 
@@ -160,6 +232,20 @@ class GameBoyAdvance:
 
     def advanceFrame(self):
         self.step()
+        self.syncSavedata()
+        self.predecodeDiscovered()
+
+    def runFrames(self, frames):
+        for i in range(frames):
+            if not self.cpu.runUntil(self.cpu.cycles + self.video.TOTAL_LENGTH):
+                return False
+            self.syncSavedata()
+            self.predecodeDiscovered()
+        return True
+
+    def syncSavedata(self):
+        if self.mmu.save is None:
+            return
         if self.seenSave:
             if not self.mmu.saveNeedsFlush():
                 self.storeSavedata()
@@ -144,6 +144,10 @@ class GameBoyAdvanceIO:
         self.DEFAULT_BGPD = 1
         self.DEFAULT_RCNT = 0x8000
 
+        self.REGISTER_COUNT = 0x200
+
+        self.defineHandlers()
+
     def clear(self):
         self.registers = [0] * (self.cpu.mmu.SIZE_IO // 2)
 
@@ -172,15 +176,307 @@ class GameBoyAdvanceIO:
     def load16(self, offset):
         return (self.loadU16(offset) << 16) >> 16
 
+    def defineHandlers(self):
+        # Handlers are indexed by halfword; a read returns the value, a write
+        # returns the value to latch into self.registers, or None to skip it
+        count = self.REGISTER_COUNT
+        self.readMasks = [0xffff] * count
+        self.readers = [self.readBad] * count
+        self.writers = [self.writeStub] * count
+        self.wordReaders = [None] * (count >> 1)
+        self.wordWriters = [None] * (count >> 1)
+
+        for offset in [self.DISPCNT, self.BG0CNT, self.BG1CNT, self.BG2CNT, self.BG3CNT, self.WININ, self.WINOUT,
+                       self.SOUND1CNT_LO, self.SOUND3CNT_LO, self.SOUNDCNT_LO, self.SOUNDCNT_HI, self.SOUNDBIAS,
+                       self.BLDCNT, self.BLDALPHA, self.TM0CNT_HI, self.TM1CNT_HI, self.TM2CNT_HI, self.TM3CNT_HI,
+                       self.DMA0CNT_HI, self.DMA1CNT_HI, self.DMA2CNT_HI, self.DMA3CNT_HI, self.RCNT, self.WAITCNT,
+                       self.IE, self.IF, self.IME, self.POSTFLG]:
+            self.readers[offset >> 1] = self.readRegister
+        for offset, mask in [(self.SOUND1CNT_HI, 0xffc0), (self.SOUND2CNT_LO, 0xffc0), (self.SOUND1CNT_X, 0x4000),
+                             (self.SOUND2CNT_HI, 0x4000), (self.SOUND3CNT_X, 0x4000), (self.SOUND3CNT_HI, 0xe000),
+                             (self.SOUND4CNT_LO, 0xff00), (self.SOUND4CNT_HI, 0x40ff)]:
+            self.readers[offset >> 1] = self.readRegister
+            self.readMasks[offset >> 1] = mask
+        for offset in [self.BG0HOFS, self.BG0VOFS, self.BG1HOFS, self.BG1VOFS, self.BG2HOFS, self.BG2VOFS,
+                       self.BG3HOFS, self.BG3VOFS, self.BG2PA, self.BG2PB, self.BG2PC, self.BG2PD, self.BG3PA,
+                       self.BG3PB, self.BG3PC, self.BG3PD, self.BG2X_LO, self.BG2X_HI, self.BG2Y_LO, self.BG2Y_HI,
+                       self.BG3X_LO, self.BG3X_HI, self.BG3Y_LO, self.BG3Y_HI, self.WIN0H, self.WIN1H, self.WIN0V,
+                       self.WIN1V, self.BLDY, self.DMA0SAD_LO, self.DMA0SAD_HI, self.DMA0DAD_LO, self.DMA0DAD_HI,
+                       self.DMA0CNT_LO, self.DMA1SAD_LO, self.DMA1SAD_HI, self.DMA1DAD_LO, self.DMA1DAD_HI,
+                       self.DMA1CNT_LO, self.DMA2SAD_LO, self.DMA2SAD_HI, self.DMA2DAD_LO, self.DMA2DAD_HI,
+                       self.DMA2CNT_LO, self.DMA3SAD_LO, self.DMA3SAD_HI, self.DMA3DAD_LO, self.DMA3DAD_HI,
+                       self.DMA3CNT_LO, self.FIFO_A_LO, self.FIFO_A_HI, self.FIFO_B_LO, self.FIFO_B_HI]:
+            self.readers[offset >> 1] = self.readWriteOnly
+
+        def readStub(offset):
+            self.core.STUB("Unimplemented I/O register read: 0x" + hex(offset))
+            return 0
+
+        def readSoundControlX(offset):
+            self.core.STUB("Unimplemented sound register read: SOUNDCNT_X")
+            return self.registers[offset >> 1]
+
+        def readMosaic(offset):
+            self.core.WARN("Read for write-only register: 0x" + hex(offset))
+            return 0
+
+        def readKeypad(offset):
+            self.keypad.pollGamepads()
+            return self.keypad.currentDown
+
+        readers = self.readers
+        readers[self.DISPSTAT >> 1] = lambda offset: self.registers[offset >> 1] | self.video.readDisplayStat()
+        readers[self.VCOUNT >> 1] = lambda offset: self.video.vcount
+        readers[self.SOUNDCNT_X >> 1] = readSoundControlX
+        for offset in [self.TM0CNT_LO, self.TM1CNT_LO, self.TM2CNT_LO, self.TM3CNT_LO]:
+            readers[offset >> 1] = lambda offset: self.cpu.irq.timerRead((offset & 0xc) >> 2)
+        readers[self.SIOCNT >> 1] = lambda offset: self.sio.readSIOCNT()
+        readers[self.KEYINPUT >> 1] = readKeypad
+        readers[self.KEYCNT >> 1] = readStub
+        readers[self.MOSAIC >> 1] = readMosaic
+        for offset in [self.SIOMULTI0, self.SIOMULTI1, self.SIOMULTI2, self.SIOMULTI3]:
+            readers[offset >> 1] = lambda offset: self.sio.read((offset - self.SIOMULTI0) >> 1)
+        for offset in [self.SIODATA8, self.JOYCNT, self.JOYSTAT]:
+            readers[offset >> 1] = readStub
+
+        def readDMAControl(offset):
+            return self.loadU16(offset | 2) << 16
+
+        for offset in [self.DMA0CNT_LO, self.DMA1CNT_LO, self.DMA2CNT_LO, self.DMA3CNT_LO]:
+            self.wordReaders[offset >> 2] = readDMAControl
+        self.wordReaders[self.IME >> 2] = lambda offset: self.loadU16(offset)
+        for offset in [self.JOY_RECV, self.JOY_TRANS]:
+            self.wordReaders[offset >> 2] = readStub
+
+        def render(method, *args, mask=0xffff):
+            def write(offset, value):
+                value &= mask
+                getattr(self.video.renderPath, method)(*args, value)
+                return value
+            return write
+
+        def renderRefLo(method, bg):
+            def write(offset, value):
+                getattr(self.video.renderPath, method)(bg, (self.registers[(offset >> 1) | 1] << 16) | value)
+                return value
+            return write
+
+        def renderRefHi(method, bg):
+            def write(offset, value):
+                getattr(self.video.renderPath, method)(bg, self.registers[(offset >> 1) ^ 1] | (value << 16))
+                return value
+            return write
+
+        def sound(method, *args, mask=0xffff, latch=0xffff):
+            def write(offset, value):
+                value &= mask
+                getattr(self.audio, method)(*args, value)
+                return value & latch
+            return write
+
+        def writeDisplayStat(offset, value):
+            value &= self.video.DISPSTAT_MASK
+            self.video.writeDisplayStat(value)
+            return value
+
+        def writeWaveData(offset, value):
+            self.audio.writeWaveData(offset - self.WAVE_RAM0_LO, value, 2)
+            return value
+
+        def writeDMAAddressLo(offset, value):
+            self.store32(offset, (self.registers[(offset >> 1) + 1] << 16) | value)
+
+        def writeDMAAddressHi(offset, value):
+            self.store32(offset - 2, self.registers[(offset >> 1) - 1] | (value << 16))
+
+        def writeDMACount(dma):
+            def write(offset, value):
+                self.cpu.irq.dmaSetWordCount(dma, value)
+                return value
+            return write
+
+        def writeDMAControl(dma):
+            def write(offset, value):
+                self.registers[offset >> 1] = value & 0xffe0
+                self.cpu.irq.dmaWriteControl(dma, value)
+            return write
+
+        def writeTimerReload(offset, value):
+            self.cpu.irq.timerSetReload((offset & 0xc) >> 2, value)
+
+        def writeTimerControl(offset, value):
+            value &= 0x00c7
+            self.cpu.irq.timerWriteControl((offset & 0xc) >> 2, value)
+            return value
+
+        def writeSIOStub(offset, value):
+            self.STUB_REG("SIO", offset)
+            return value
+
+        def writeRCNT(offset, value):
+            self.sio.setMode(((value >> 12) & 0xc) | ((self.registers[self.SIOCNT >> 1] >> 12) & 0x3))
+            self.sio.writeRCNT(value)
+            return value
+
+        def writeSIOCNT(offset, value):
+            self.sio.setMode(((value >> 12) & 0x3) | ((self.registers[self.RCNT >> 1] >> 12) & 0xc))
+            self.sio.writeSIOCNT(value)
+
+        def writeJOYStub(offset, value):
+            self.STUB_REG("JOY", offset)
+
+        def writeInterruptsEnabled(offset, value):
+            value &= 0x3fff
+            self.cpu.irq.setInterruptsEnabled(value)
+            return value
+
+        def writeInterruptFlags(offset, value):
+            self.cpu.irq.dismissIRQs(value)
+
+        def writeWaitControl(offset, value):
+            value &= 0xdfff
+            self.cpu.mmu.adjustTimings(value)
+            return value
+
+        def writeMasterEnable(offset, value):
+            value &= 0x0001
+            self.cpu.irq.masterEnable(value)
+            return value
+
+        writers = self.writers
+        writers[self.DISPCNT >> 1] = render('writeDisplayControl')
+        writers[self.DISPSTAT >> 1] = writeDisplayStat
+        for bg, control, hofs, vofs in [(0, self.BG0CNT, self.BG0HOFS, self.BG0VOFS),
+                                        (1, self.BG1CNT, self.BG1HOFS, self.BG1VOFS),
+                                        (2, self.BG2CNT, self.BG2HOFS, self.BG2VOFS),
+                                        (3, self.BG3CNT, self.BG3HOFS, self.BG3VOFS)]:
+            writers[control >> 1] = render('writeBackgroundControl', bg)
+            writers[hofs >> 1] = render('writeBackgroundHOffset', bg)
+            writers[vofs >> 1] = render('writeBackgroundVOffset', bg)
+        for bg, base in [(2, self.BG2PA), (3, self.BG3PA)]:
+            writers[base >> 1] = render('writeBackgroundParamA', bg)
+            writers[(base >> 1) + 1] = render('writeBackgroundParamB', bg)
+            writers[(base >> 1) + 2] = render('writeBackgroundParamC', bg)
+            writers[(base >> 1) + 3] = render('writeBackgroundParamD', bg)
+            writers[(base >> 1) + 4] = renderRefLo('writeBackgroundRefX', bg)
+            writers[(base >> 1) + 5] = renderRefHi('writeBackgroundRefX', bg)
+            writers[(base >> 1) + 6] = renderRefLo('writeBackgroundRefY', bg)
+            writers[(base >> 1) + 7] = renderRefHi('writeBackgroundRefY', bg)
+        writers[self.WIN0H >> 1] = render('writeWin0H')
+        writers[self.WIN1H >> 1] = render('writeWin1H')
+        writers[self.WIN0V >> 1] = render('writeWin0V')
+        writers[self.WIN1V >> 1] = render('writeWin1V')
+        writers[self.WININ >> 1] = render('writeWinIn', mask=0x3f3f)
+        writers[self.WINOUT >> 1] = render('writeWinOut', mask=0x3f3f)
+        writers[self.BLDCNT >> 1] = render('writeBlendControl', mask=0x7fff)
+        writers[self.BLDALPHA >> 1] = render('writeBlendAlpha', mask=0x1f1f)
+        writers[self.BLDY >> 1] = render('writeBlendY', mask=0x001f)
+        writers[self.MOSAIC >> 1] = render('writeMosaic')
+
+        writers[self.SOUND1CNT_LO >> 1] = sound('writeSquareChannelSweep', 0, mask=0x007f)
+        writers[self.SOUND1CNT_HI >> 1] = sound('writeSquareChannelDLE', 0)
+        writers[self.SOUND1CNT_X >> 1] = sound('writeSquareChannelFC', 0, mask=0xc7ff, latch=0x7fff)
+        writers[self.SOUND2CNT_LO >> 1] = sound('writeSquareChannelDLE', 1)
+        writers[self.SOUND2CNT_HI >> 1] = sound('writeSquareChannelFC', 1, mask=0xc7ff, latch=0x7fff)
+        writers[self.SOUND3CNT_LO >> 1] = sound('writeChannel3Lo', mask=0x00e0)
+        writers[self.SOUND3CNT_HI >> 1] = sound('writeChannel3Hi', mask=0xe0ff)
+        writers[self.SOUND3CNT_X >> 1] = sound('writeChannel3X', mask=0xc7ff, latch=0x7fff)
+        writers[self.SOUND4CNT_LO >> 1] = sound('writeChannel4LE', mask=0xff3f)
+        writers[self.SOUND4CNT_HI >> 1] = sound('writeChannel4FC', mask=0xc0ff, latch=0x7fff)
+        writers[self.SOUNDCNT_LO >> 1] = sound('writeSoundControlLo', mask=0xff77)
+        writers[self.SOUNDCNT_HI >> 1] = sound('writeSoundControlHi', mask=0xff0f)
+        writers[self.SOUNDCNT_X >> 1] = sound('writeEnable', mask=0x0080)
+        for offset in range(self.WAVE_RAM0_LO, self.WAVE_RAM3_HI + 2, 2):
+            writers[offset >> 1] = writeWaveData
+
+        for dma, base in enumerate([self.DMA0SAD_LO, self.DMA1SAD_LO, self.DMA2SAD_LO, self.DMA3SAD_LO]):
+            writers[base >> 1] = writeDMAAddressLo
+            writers[(base >> 1) + 1] = writeDMAAddressHi
+            writers[(base >> 1) + 2] = writeDMAAddressLo
+            writers[(base >> 1) + 3] = writeDMAAddressHi
+            writers[(base >> 1) + 4] = writeDMACount(dma)
+            writers[(base >> 1) + 5] = writeDMAControl(dma)
+        for offset in [self.TM0CNT_LO, self.TM1CNT_LO, self.TM2CNT_LO, self.TM3CNT_LO]:
+            writers[offset >> 1] = writeTimerReload
+            writers[(offset >> 1) + 1] = writeTimerControl
+
+        for offset in [self.SIOMULTI0, self.SIOMULTI1, self.SIOMULTI2, self.SIOMULTI3, self.SIODATA8]:
+            writers[offset >> 1] = writeSIOStub
+        writers[self.RCNT >> 1] = writeRCNT
+        writers[self.SIOCNT >> 1] = writeSIOCNT
+        writers[self.JOYCNT >> 1] = writeJOYStub
+        writers[self.JOYSTAT >> 1] = writeJOYStub
+        writers[self.IE >> 1] = writeInterruptsEnabled
+        writers[self.IF >> 1] = writeInterruptFlags
+        writers[self.WAITCNT >> 1] = writeWaitControl
+        writers[self.IME >> 1] = writeMasterEnable
+
+        def renderRef(method, bg):
+            def write(offset, value):
+                value &= 0x0fffffff
+                getattr(self.video.renderPath, method)(bg, value)
+                return value
+            return write
+
+        def writeDMASource(dma):
+            def write(offset, value):
+                self.cpu.irq.dmaSetSourceAddress(dma, value)
+                return value
+            return write
+
+        def writeDMADest(dma):
+            def write(offset, value):
+                self.cpu.irq.dmaSetDestAddress(dma, value)
+                return value
+            return write
+
+        def fifo(method):
+            def write(offset, value):
+                getattr(self.audio, method)(value)
+            return write
+
+        wordWriters = self.wordWriters
+        for bg, base in [(2, self.BG2X_LO), (3, self.BG3X_LO)]:
+            wordWriters[base >> 2] = renderRef('writeBackgroundRefX', bg)
+            wordWriters[(base >> 2) + 1] = renderRef('writeBackgroundRefY', bg)
+        for dma, base in enumerate([self.DMA0SAD_LO, self.DMA1SAD_LO, self.DMA2SAD_LO, self.DMA3SAD_LO]):
+            wordWriters[base >> 2] = writeDMASource(dma)
+            wordWriters[(base >> 2) + 1] = writeDMADest(dma)
+        wordWriters[self.FIFO_A_LO >> 2] = fifo('appendToFifoA')
+        wordWriters[self.FIFO_B_LO >> 2] = fifo('appendToFifoB')
+
+        # Byte writes to these are merged into their halfword silently
+        self.byteWritable = frozenset([
+            self.WININ, self.WININ | 1, self.WINOUT, self.WINOUT | 1, self.SOUND1CNT_LO, self.SOUND1CNT_LO | 1,
+            self.SOUND1CNT_HI, self.SOUND1CNT_HI | 1, self.SOUND1CNT_X, self.SOUND1CNT_X | 1,
+            self.SOUND2CNT_LO, self.SOUND2CNT_LO | 1, self.SOUND2CNT_HI, self.SOUND2CNT_HI | 1,
+            self.SOUND3CNT_LO, self.SOUND3CNT_LO | 1, self.SOUND3CNT_HI, self.SOUND3CNT_HI | 1,
+            self.SOUND3CNT_X, self.SOUND3CNT_X | 1, self.SOUND4CNT_LO, self.SOUND4CNT_LO | 1,
+            self.SOUND4CNT_HI, self.SOUND4CNT_HI | 1, self.SOUNDCNT_LO, self.SOUNDCNT_LO | 1,
+            self.SOUNDCNT_X, self.IF, self.IME
+        ])
+
+    def readRegister(self, offset):
+        return self.registers[offset >> 1] & self.readMasks[offset >> 1]
+
+    def readWriteOnly(self, offset):
+        self.core.WARN("Read for write-only register: 0x" + hex(offset))
+        return self.core.mmu.badMemory.loadU16(0)
+
+    def readBad(self, offset):
+        self.core.WARN("Bad I/O register read: 0x" + hex(offset))
+        return self.core.mmu.badMemory.loadU16(0)
+
+    def writeStub(self, offset, value):
+        self.STUB_REG("I/O", offset)
+        return value
+
     def load32(self, offset):
         offset &= 0xfffffffc
-        if offset in [self.DMA0CNT_LO, self.DMA1CNT_LO, self.DMA2CNT_LO, self.DMA3CNT_LO]:
-            return self.loadU16(offset | 2) << 16
-        elif offset == self.IME:
-            return self.loadU16(offset) & 0xffff
-        elif offset in [self.JOY_RECV, self.JOY_TRANS]:
-            self.core.STUB("Unimplemented JOY register read: 0x" + hex(offset))
-            return 0
+        if offset < 0x400:
+            reader = self.wordReaders[offset >> 2]
+            if reader:
+                return reader(offset)
         return self.loadU16(offset) | (self.loadU16(offset | 2) << 16)
 
     def loadU8(self, offset):
@@ -189,84 +485,25 @@ class GameBoyAdvanceIO:
         return (value >> (odd << 3)) & 0xff
 
     def loadU16(self, offset):
-        if offset in [self.DISPCNT, self.BG0CNT, self.BG1CNT, self.BG2CNT, self.BG3CNT, self.WININ, self.WINOUT,
-                      self.SOUND1CNT_LO, self.SOUND3CNT_LO, self.SOUNDCNT_LO, self.SOUNDCNT_HI, self.SOUNDBIAS,
-                      self.BLDCNT, self.BLDALPHA, self.TM0CNT_HI, self.TM1CNT_HI, self.TM2CNT_HI, self.TM3CNT_HI,
-                      self.DMA0CNT_HI, self.DMA1CNT_HI, self.DMA2CNT_HI, self.DMA3CNT_HI, self.RCNT, self.WAITCNT,
-                      self.IE, self.IF, self.IME, self.POSTFLG]:
-            return self.registers[offset >> 1]
-        elif offset == self.DISPSTAT:
-            return self.registers[offset >> 1] | self.video.readDisplayStat()
-        elif offset == self.VCOUNT:
-            return self.video.vcount
-        elif offset == self.SOUND1CNT_HI or offset == self.SOUND2CNT_LO:
-            return self.registers[offset >> 1] & 0xffc0
-        elif offset == self.SOUND1CNT_X or offset == self.SOUND2CNT_HI or offset == self.SOUND3CNT_X:
-            return self.registers[offset >> 1] & 0x4000
-        elif offset == self.SOUND3CNT_HI:
-            return self.registers[offset >> 1] & 0xe000
-        elif offset == self.SOUND4CNT_LO:
-            return self.registers[offset >> 1] & 0xff00
-        elif offset == self.SOUND4CNT_HI:
-            return self.registers[offset >> 1] & 0x40ff
-        elif offset == self.SOUNDCNT_X:
-            self.core.STUB("Unimplemented sound register read: SOUNDCNT_X")
-            return self.registers[offset >> 1] | 0x0000
-        elif offset in [self.TM0CNT_LO, self.TM1CNT_LO, self.TM2CNT_LO, self.TM3CNT_LO]:
-            return self.cpu.irq.timerRead(offset // 4)
-        elif offset == self.SIOCNT:
-            return self.sio.readSIOCNT()
-        elif offset == self.KEYINPUT:
-            self.keypad.pollGamepads()
-            return self.keypad.currentDown
-        elif offset == self.KEYCNT:
-            self.core.STUB("Unimplemented I/O register read: KEYCNT")
-            return 0
-        elif offset in [self.BG0HOFS, self.BG0VOFS, self.BG1HOFS, self.BG1VOFS, self.BG2HOFS, self.BG2VOFS,
-                        self.BG3HOFS, self.BG3VOFS, self.BG2PA, self.BG2PB, self.BG2PC, self.BG2PD, self.BG3PA,
-                        self.BG3PB, self.BG3PC, self.BG3PD, self.BG2X_LO, self.BG2X_HI, self.BG2Y_LO, self.BG2Y_HI,
-                        self.BG3X_LO, self.BG3X_HI, self.BG3Y_LO, self.BG3Y_HI, self.WIN0H, self.WIN1H, self.WIN0V,
-                        self.WIN1V, self.BLDY, self.DMA0SAD_LO, self.DMA0SAD_HI, self.DMA0DAD_LO, self.DMA0DAD_HI,
-                        self.DMA0CNT_LO, self.DMA1SAD_LO, self.DMA1SAD_HI, self.DMA1DAD_LO, self.DMA1DAD_HI,
-                        self.DMA1CNT_LO, self.DMA2SAD_LO, self.DMA2SAD_HI, self.DMA2DAD_LO, self.DMA2DAD_HI,
-                        self.DMA2CNT_LO, self.DMA3SAD_LO, self.DMA3SAD_HI, self.DMA3DAD_LO, self.DMA3DAD_HI,
-                        self.DMA3CNT_LO, self.FIFO_A_LO, self.FIFO_A_HI, self.FIFO_B_LO, self.FIFO_B_HI]:
-            self.core.WARN("Read for write-only register: 0x" + hex(offset))
-            return self.core.mmu.badMemory.loadU16(0)
-        elif offset == self.MOSAIC:
-            self.core.WARN("Read for write-only register: 0x" + hex(offset))
-            return 0
-        elif offset in [self.SIOMULTI0, self.SIOMULTI1, self.SIOMULTI2, self.SIOMULTI3]:
-            return self.sio.read((offset - self.SIOMULTI0) >> 1)
-        elif offset == self.SIODATA8:
-            self.core.STUB("Unimplemented SIO register read: 0x" + hex(offset))
-            return 0
-        elif offset in [self.JOYCNT, self.JOYSTAT]:
-            self.core.STUB("Unimplemented JOY register read: 0x" + hex(offset))
-            return 0
-        else:
-            self.core.WARN("Bad I/O register read: 0x" + hex(offset))
-            return self.core.mmu.badMemory.loadU16(0)
+        if offset < 0x400:
+            return self.readers[offset >> 1](offset)
+        return self.readBad(offset)
 
     def store8(self, offset, value):
-        if offset in [self.WININ, self.WININ | 1, self.WINOUT, self.WINOUT | 1, self.SOUND1CNT_LO, self.SOUND1CNT_LO | 1,
-                      self.SOUND1CNT_HI, self.SOUND1CNT_HI | 1, self.SOUND1CNT_X, self.SOUND1CNT_X | 1,
-                      self.SOUND2CNT_LO, self.SOUND2CNT_LO | 1, self.SOUND2CNT_HI, self.SOUND2CNT_HI | 1,
-                      self.SOUND3CNT_LO, self.SOUND3CNT_LO | 1, self.SOUND3CNT_HI, self.SOUND3CNT_HI | 1,
-                      self.SOUND3CNT_X, self.SOUND3CNT_X | 1, self.SOUND4CNT_LO, self.SOUND4CNT_LO | 1,
-                      self.SOUND4CNT_HI, self.SOUND4CNT_HI | 1, self.SOUNDCNT_LO, self.SOUNDCNT_LO | 1,
-                      self.SOUNDCNT_X, self.IF, self.IME]:
-            pass
-        elif offset == self.SOUNDBIAS | 1:
-            self.STUB_REG("sound", offset)
-        elif offset == self.HALTCNT:
+        if offset == self.HALTCNT:
             value &= 0x80
             if not value:
                 self.core.irq.halt()
             else:
                 self.core.STUB("Stop")
             return
-        else:
+        elif offset & ~1 == self.IF:
+            # Acknowledge only the bits written; merging the other byte would clear its IRQs too
+            self.cpu.irq.dismissIRQs((value & 0xff) << ((offset & 1) << 3))
+            return
+        elif offset == self.SOUNDBIAS | 1:
+            self.STUB_REG("sound", offset)
+        elif offset not in self.byteWritable:
             self.STUB_REG("8-bit I/O", offset)
         if offset & 1:
             value <<= 8
@@ -277,275 +514,23 @@ class GameBoyAdvanceIO:
         self.store16(offset & 0xffffffe, value)
 
     def store16(self, offset, value):
-        if offset == self.DISPCNT:
-            self.video.renderPath.writeDisplayControl(value)
-        elif offset == self.DISPSTAT:
-            value &= self.video.DISPSTAT_MASK
-            self.video.writeDisplayStat(value)
-        elif offset == self.BG0CNT:
-            self.video.renderPath.writeBackgroundControl(0, value)
-        elif offset == self.BG1CNT:
-            self.video.renderPath.writeBackgroundControl(1, value)
-        elif offset == self.BG2CNT:
-            self.video.renderPath.writeBackgroundControl(2, value)
-        elif offset == self.BG3CNT:
-            self.video.renderPath.writeBackgroundControl(3, value)
-        elif offset == self.BG0HOFS:
-            self.video.renderPath.writeBackgroundHOffset(0, value)
-        elif offset == self.BG0VOFS:
-            self.video.renderPath.writeBackgroundVOffset(0, value)
-        elif offset == self.BG1HOFS:
-            self.video.renderPath.writeBackgroundHOffset(1, value)
-        elif offset == self.BG1VOFS:
-            self.video.renderPath.writeBackgroundVOffset(1, value)
-        elif offset == self.BG2HOFS:
-            self.video.renderPath.writeBackgroundHOffset(2, value)
-        elif offset == self.BG2VOFS:
-            self.video.renderPath.writeBackgroundVOffset(2, value)
-        elif offset == self.BG3HOFS:
-            self.video.renderPath.writeBackgroundHOffset(3, value)
-        elif offset == self.BG3VOFS:
-            self.video.renderPath.writeBackgroundVOffset(3, value)
-        elif offset == self.BG2X_LO:
-            self.video.renderPath.writeBackgroundRefX(2, (self.registers[(offset >> 1) | 1] << 16) | value)
-        elif offset == self.BG2X_HI:
-            self.video.renderPath.writeBackgroundRefX(2, self.registers[(offset >> 1) ^ 1] | (value << 16))
-        elif offset == self.BG2Y_LO:
-            self.video.renderPath.writeBackgroundRefY(2, (self.registers[(offset >> 1) | 1] << 16) | value)
-        elif offset == self.BG2Y_HI:
-            self.video.renderPath.writeBackgroundRefY(2, self.registers[(offset >> 1) ^ 1] | (value << 16))
-        elif offset == self.BG2PA:
-            self.video.renderPath.writeBackgroundParamA(2, value)
-        elif offset == self.BG2PB:
-            self.video.renderPath.writeBackgroundParamB(2, value)
-        elif offset == self.BG2PC:
-            self.video.renderPath.writeBackgroundParamC(2, value)
-        elif offset == self.BG2PD:
-            self.video.renderPath.writeBackgroundParamD(2, value)
-        elif offset == self.BG3X_LO:
-            self.video.renderPath.writeBackgroundRefX(3, (self.registers[(offset >> 1) | 1] << 16) | value)
-        elif offset == self.BG3X_HI:
-            self.video.renderPath.writeBackgroundRefX(3, self.registers[(offset >> 1) ^ 1] | (value << 16))
-        elif offset == self.BG3Y_LO:
-            self.video.renderPath.writeBackgroundRefY(3, (self.registers[(offset >> 1) | 1] << 16) | value)
-        elif offset == self.BG3Y_HI:
-            self.video.renderPath.writeBackgroundRefY(3, self.registers[(offset >> 1) ^ 1] | (value << 16))
-        elif offset == self.BG3PA:
-            self.video.renderPath.writeBackgroundParamA(3, value)
-        elif offset == self.BG3PB:
-            self.video.renderPath.writeBackgroundParamB(3, value)
-        elif offset == self.BG3PC:
-            self.video.renderPath.writeBackgroundParamC(3, value)
-        elif offset == self.BG3PD:
-            self.video.renderPath.writeBackgroundParamD(3, value)
-        elif offset == self.WIN0H:
-            self.video.renderPath.writeWin0H(value)
-        elif offset == self.WIN1H:
-            self.video.renderPath.writeWin1H(value)
-        elif offset == self.WIN0V:
-            self.video.renderPath.writeWin0V(value)
-        elif offset == self.WIN1V:
-            self.video.renderPath.writeWin1V(value)
-        elif offset == self.WININ:
-            value &= 0x3f3f
-            self.video.renderPath.writeWinIn(value)
-        elif offset == self.WINOUT:
-            value &= 0x3f3f
-            self.video.renderPath.writeWinOut(value)
-        elif offset == self.BLDCNT:
-            value &= 0x7fff
-            self.video.renderPath.writeBlendControl(value)
-        elif offset == self.BLDALPHA:
-            value &= 0x1f1f
-            self.video.renderPath.writeBlendAlpha(value)
-        elif offset == self.BLDY:
-            value &= 0x001f
-            self.video.renderPath.writeBlendY(value)
-        elif offset == self.MOSAIC:
-            self.video.renderPath.writeMosaic(value)
-        elif offset == self.SOUND1CNT_LO:
-            value &= 0x007f
-            self.audio.writeSquareChannelSweep(0, value)
-        elif offset == self.SOUND1CNT_HI:
-            self.audio.writeSquareChannelDLE(0, value)
-        elif offset == self.SOUND1CNT_X:
-            value &= 0xc7ff
-            self.audio.writeSquareChannelFC(0, value)
-            value &= ~0x8000
-        elif offset == self.SOUND2CNT_LO:
-            self.audio.writeSquareChannelDLE(1, value)
-        elif offset == self.SOUND2CNT_HI:
-            value &= 0xc7ff
-            self.audio.writeSquareChannelFC(1, value)
-            value &= ~0x8000
-        elif offset == self.SOUND3CNT_LO:
-            value &= 0x00e0
-            self.audio.writeChannel3Lo(value)
-        elif offset == self.SOUND3CNT_HI:
-            value &= 0xe0ff
-            self.audio.writeChannel3Hi(value)
-        elif offset == self.SOUND3CNT_X:
-            value &= 0xc7ff
-            self.audio.writeChannel3X(value)
-            value &= ~0x8000
-        elif offset == self.SOUND4CNT_LO:
-            value &= 0xff3f
-            self.audio.writeChannel4LE(value)
-        elif offset == self.SOUND4CNT_HI:
-            value &= 0xc0ff
-            self.audio.writeChannel4FC(value)
-            value &= ~0x8000
-        elif offset == self.SOUNDCNT_LO:
-            value &= 0xff77
-            self.audio.writeSoundControlLo(value)
-        elif offset == self.SOUNDCNT_HI:
-            value &= 0xff0f
-            self.audio.writeSoundControlHi(value)
-        elif offset == self.SOUNDCNT_X:
-            value &= 0x0080
-            self.audio.writeEnable(value)
-        elif offset in [self.WAVE_RAM0_LO, self.WAVE_RAM0_HI, self.WAVE_RAM1_LO, self.WAVE_RAM1_HI,
-                        self.WAVE_RAM2_LO, self.WAVE_RAM2_HI, self.WAVE_RAM3_LO, self.WAVE_RAM3_HI]:
-            self.audio.writeWaveData(offset - self.WAVE_RAM0_LO, value, 2)
-        elif offset in [self.DMA0SAD_LO, self.DMA0DAD_LO, self.DMA1SAD_LO, self.DMA1DAD_LO,
-                        self.DMA2SAD_LO, self.DMA2DAD_LO, self.DMA3SAD_LO, self.DMA3DAD_LO]:
-            self.store32(offset, (self.registers[(offset >> 1) + 1] << 16) | value)
-            return
-        elif offset in [self.DMA0SAD_HI, self.DMA0DAD_HI, self.DMA1SAD_HI, self.DMA1DAD_HI,
-                        self.DMA2SAD_HI, self.DMA2DAD_HI, self.DMA3SAD_HI, self.DMA3DAD_HI]:
-            self.store32(offset - 2, self.registers[(offset >> 1) - 1] | (value << 16))
-            return
-        elif offset == self.DMA0CNT_LO:
-            self.cpu.irq.dmaSetWordCount(0, value)
-        elif offset == self.DMA0CNT_HI:
-            self.registers[offset >> 1] = value & 0xffe0
-            self.cpu.irq.dmaWriteControl(0, value)
-            return
-        elif offset == self.DMA1CNT_LO:
-            self.cpu.irq.dmaSetWordCount(1, value)
-        elif offset == self.DMA1CNT_HI:
-            self.registers[offset >> 1] = value & 0xffe0
-            self.cpu.irq.dmaWriteControl(1, value)
-            return
-        elif offset == self.DMA2CNT_LO:
-            self.cpu.irq.dmaSetWordCount(2, value)
-        elif offset == self.DMA2CNT_HI:
-            self.registers[offset >> 1] = value & 0xffe0
-            self.cpu.irq.dmaWriteControl(2, value)
-            return
-        elif offset == self.DMA3CNT_LO:
-            self.cpu.irq.dmaSetWordCount(3, value)
-        elif offset == self.DMA3CNT_HI:
-            self.registers[offset >> 1] = value & 0xffe0
-            self.cpu.irq.dmaWriteControl(3, value)
-            return
-        elif offset in [self.TM0CNT_LO, self.TM1CNT_LO, self.TM2CNT_LO, self.TM3CNT_LO]:
-            self.cpu.irq.timerSetReload(offset // 4, value)
-            return
-        elif offset in [self.TM0CNT_HI, self.TM1CNT_HI, self.TM2CNT_HI, self.TM3CNT_HI]:
-            value &= 0x00c7
-            self.cpu.irq.timerWriteControl(offset // 4, value)
-        elif offset in [self.SIOMULTI0, self.SIOMULTI1, self.SIOMULTI2, self.SIOMULTI3, self.SIODATA8]:
-            self.STUB_REG("SIO", offset)
-        elif offset == self.RCNT:
-            self.sio.setMode(((value >> 12) & 0xc) | ((self.registers[self.SIOCNT >> 1] >> 12) & 0x3))
-            self.sio.writeRCNT(value)
-        elif offset == self.SIOCNT:
-            self.sio.setMode(((value >> 12) & 0x3) | ((self.registers[self.RCNT >> 1] >> 12) & 0xc))
-            self.sio.writeSIOCNT(value)
-            return
-        elif offset in [self.JOYCNT, self.JOYSTAT]:
-            self.STUB_REG("JOY", offset)
-            return
-        elif offset in [self.IE, self.IF]:
-            self.STUB_REG("JOY", offset)
-            return
-        elif offset == self.WAITCNT:
-            value &= 0xdfff
-            self.cpu.mmu.adjustTimings(value)
-        elif offset == self.IME:
-            value &= 0x0001
-            self.cpu.irq.masterEnable(value)
-        else:
+        if offset >= 0x400:
             self.STUB_REG("I/O", offset)
-        self.registers[offset >> 1] = value
+            return
+        value = self.writers[offset >> 1](offset, value)
+        if value is not None:
+            self.registers[offset >> 1] = value
 
     def store32(self, offset, value):
-        if offset == self.BG2X_LO:
-            value &= 0x0fffffff
-            self.video.renderPath.writeBackgroundRefX(2, value)
-        elif offset == self.BG2Y_LO:
-            value &= 0x0fffffff
-            self.video.renderPath.writeBackgroundRefY(2, value)
-        elif offset == self.BG3X_LO:
-            value &= 0x0fffffff
-            self.video.renderPath.writeBackgroundRefX(3, value)
-        elif offset == self.BG3Y_LO:
-            value &= 0x0fffffff
-            self.video.renderPath.writeBackgroundRefY(3, value)
-        elif offset in [self.DMA0SAD_LO, self.DMA0DAD_LO, self.DMA1SAD_LO, self.DMA1DAD_LO,
-                        self.DMA2SAD_LO, self.DMA2DAD_LO, self.DMA3SAD_LO, self.DMA3DAD_LO]:
-            self.store32(offset, (self.registers[(offset >> 1) + 1] << 16) | value)
-            return
-        elif offset in [self.DMA0SAD_HI, self.DMA0DAD_HI, self.DMA1SAD_HI, self.DMA1DAD_HI,
-                        self.DMA2SAD_HI, self.DMA2DAD_HI, self.DMA3SAD_HI, self.DMA3DAD_HI]:
-            self.store32(offset - 2, self.registers[(offset >> 1) - 1] | (value << 16))
-            return
-        elif offset == self.DMA0CNT_LO:
-            self.cpu.irq.dmaSetWordCount(0, value)
-        elif offset == self.DMA0CNT_HI:
-            self.registers[offset >> 1] = value & 0xffe0
-            self.cpu.irq.dmaWriteControl(0, value)
-            return
-        elif offset == self.DMA1CNT_LO:
-            self.cpu.irq.dmaSetWordCount(1, value)
-        elif offset == self.DMA1CNT_HI:
-            self.registers[offset >> 1] = value & 0xffe0
-            self.cpu.irq.dmaWriteControl(1, value)
-            return
-        elif offset == self.DMA2CNT_LO:
-            self.cpu.irq.dmaSetWordCount(2, value)
-        elif offset == self.DMA2CNT_HI:
-            self.registers[offset >> 1] = value & 0xffe0
-            self.cpu.irq.dmaWriteControl(2, value)
-            return
-        elif offset == self.DMA3CNT_LO:
-            self.cpu.irq.dmaSetWordCount(3, value)
-        elif offset == self.DMA3CNT_HI:
-            self.registers[offset >> 1] = value & 0xffe0
-            self.cpu.irq.dmaWriteControl(3, value)
-            return
-        elif offset in [self.TM0CNT_LO, self.TM1CNT_LO, self.TM2CNT_LO, self.TM3CNT_LO]:
-            self.cpu.irq.timerSetReload(offset // 4, value)
+        writer = self.wordWriters[offset >> 2] if offset < 0x400 else None
+        if not writer:
+            self.store16(offset, value & 0xffff)
+            self.store16(offset | 2, value >> 16)
             return
-        elif offset in [self.TM0CNT_HI, self.TM1CNT_HI, self.TM2CNT_HI, self.TM3CNT_HI]:
-            value &= 0x00c7
-            self.cpu.irq.timerWriteControl(offset // 4, value)
-        elif offset in [self.SIOMULTI0, self.SIOMULTI1, self.SIOMULTI2, self.SIOMULTI3, self.SIODATA8]:
-            self.STUB_REG("SIO", offset)
-        elif offset == self.RCNT:
-            self.sio.setMode(((value >> 12) & 0xc) | ((self.registers[self.SIOCNT >> 1] >> 12) & 0x3))
-            self.sio.writeRCNT(value)
-        elif offset == self.SIOCNT:
-            self.sio.setMode(((value >> 12) & 0x3) | ((self.registers[self.RCNT >> 1] >> 12) & 0xc))
-            self.sio.writeSIOCNT(value)
-            return
-        elif offset in [self.JOYCNT, self.JOYSTAT]:
-            self.STUB_REG("JOY", offset)
-            return
-        elif offset in [self.IE, self.IF]:
-            self.STUB_REG("JOY", offset)
-            return
-        elif offset == self.WAITCNT:
-            value &= 0xdfff
-            self.cpu.mmu.adjustTimings(value)
-        elif offset == self.IME:
-            value &= 0x0001
-            self.cpu.irq.masterEnable(value)
-        else:
-            self.STUB_REG("I/O", offset)
-        self.registers[offset >> 1] = value & 0xffff
-        self.registers[(offset >> 1) + 1] = value >> 16
+        value = writer(offset, value)
+        if value is not None:
+            self.registers[offset >> 1] = value & 0xffff
+            self.registers[(offset >> 1) + 1] = value >> 16
 
     def invalidatePage(self, address):
         pass
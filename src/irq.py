@@ -1,4 +1,10 @@
+import heapq
+import math
+from array import array
+from itertools import accumulate
+
 from dma import GameBoyAdvanceDMA
+from timer import GameBoyAdvanceTimer
 class GameBoyAdvanceInterruptHandler:
     def __init__(self):
         self.FREQUENCY = 0x1000000
@@ -6,80 +12,76 @@ class GameBoyAdvanceInterruptHandler:
         self.cpu = None
         self.enable = False
         self.timersEnabled = False
-        self.dmaog = GameBoyAdvanceDMA()
-        self.dma_dat = self.dmaog.data
-        self.IRQ_VBLANK = '0x0'
-        self.IRQ_HBLANK = '0x1'
-        self.IRQ_VCOUNTER = '0x2'
-        self.IRQ_TIMER0 = '0x3'
-        self.IRQ_TIMER1 = '0x4'
-        self.IRQ_TIMER2 = '0x5'
-        self.IRQ_TIMER3 = '0x6'
-        self.IRQ_SIO = '0x7'
-        self.IRQ_DMA0 = '0x8'
-        self.IRQ_DMA1 = '0x9'
-        self.IRQ_DMA2 = '0xa'
-        self.IRQ_DMA3 = '0xb'
-        self.IRQ_KEYPAD = '0xc'
-        self.IRQ_GAMEPAK = '0xd'
-
-        self.MASK_VBLANK = '0x0001'
-        self.MASK_HBLANK = '0x0002'
-        self.MASK_VCOUNTER = '0x0004'
-        self.MASK_TIMER0 = '0x0008'
-        self.MASK_TIMER1 = '0x0010'
-        self.MASK_TIMER2 = '0x0020'
-        self.MASK_TIMER3 = '0x0040'
-        self.MASK_SIO = '0x0080'
-        self.MASK_DMA0 = '0x0100'
-        self.MASK_DMA1 = '0x0200'
-        self.MASK_DMA2 = '0x0400'
-        self.MASK_DMA3 = '0x0800'
-        self.MASK_KEYPAD = '0x1000'
-        self.MASK_GAMEPAK = '0x2000'
+        self.IRQ_VBLANK = 0x0
+        self.IRQ_HBLANK = 0x1
+        self.IRQ_VCOUNTER = 0x2
+        self.IRQ_TIMER0 = 0x3
+        self.IRQ_TIMER1 = 0x4
+        self.IRQ_TIMER2 = 0x5
+        self.IRQ_TIMER3 = 0x6
+        self.IRQ_SIO = 0x7
+        self.IRQ_DMA0 = 0x8
+        self.IRQ_DMA1 = 0x9
+        self.IRQ_DMA2 = 0xa
+        self.IRQ_DMA3 = 0xb
+        self.IRQ_KEYPAD = 0xc
+        self.IRQ_GAMEPAK = 0xd
+        self.IRQ_DMA = [self.IRQ_DMA0, self.IRQ_DMA1, self.IRQ_DMA2, self.IRQ_DMA3]
+        self.IRQ_TIMER = [self.IRQ_TIMER0, self.IRQ_TIMER1, self.IRQ_TIMER2, self.IRQ_TIMER3]
+        self.TIMER_PRESCALE = [0, 6, 8, 10]
+
+        # Acknowledged interrupts that IntrWait polls; the game's handler sets these
+        self.BIOS_IRQ_FLAGS = 0x03007ff8
+
+        self.DMA_TIMING_VBLANK = 1
+        self.DMA_TIMING_HBLANK = 2
+
+        self.NO_EVENT = float('inf')
+        self.events = []
+        self.eventCount = 0
+        self.nextEvent = self.NO_EVENT
+        # Filled in by clear(); audio and timer writes can reschedule before the first one
+        self.timers = []
+        self.dma = []
+        self.videoEntry = None
+        self.audioStepEntry = None
+        self.audioSampleEntry = None
+        self.timerEntries = [None] * 4
+        self.dmaEntries = [None] * 4
+        self.timerCallbacks = [lambda when, number=i: self.timerEvent(number, when) for i in range(4)]
+        self.dmaCallbacks = [lambda when, number=i: self.dmaEvent(number, when) for i in range(4)]
+
+        self.MASK_VBLANK = 0x0001
+        self.MASK_HBLANK = 0x0002
+        self.MASK_VCOUNTER = 0x0004
+        self.MASK_TIMER0 = 0x0008
+        self.MASK_TIMER1 = 0x0010
+        self.MASK_TIMER2 = 0x0020
+        self.MASK_TIMER3 = 0x0040
+        self.MASK_SIO = 0x0080
+        self.MASK_DMA0 = 0x0100
+        self.MASK_DMA1 = 0x0200
+        self.MASK_DMA2 = 0x0400
+        self.MASK_DMA3 = 0x0800
+        self.MASK_KEYPAD = 0x1000
+        self.MASK_GAMEPAK = 0x2000
 
     def clear(self):
         self.enable = False
         self.enabledIRQs = 0
         self.interruptFlags = 0
 
-        self.dma = []
-        for i in range(4):
-            self.dma.append({
-                'source': 0,
-                'dest': 0,
-                'count': 0,
-                'nextSource': 0,
-                'nextDest': 0,
-                'nextCount': 0,
-                'srcControl': 0,
-                'dstControl': 0,
-                'repeat': False,
-                'width': 0,
-                'drq': False,
-                'timing': 0,
-                'doIrq': False,
-                'enable': False,
-                'nextIRQ': 0
-            })
+        self.dma = [GameBoyAdvanceDMA(i) for i in range(4)]
+        self.updateDmaLists()
 
         self.timersEnabled = 0
         self.timers = []
         for i in range(4):
-            self.timers.append({
-                'reload': 0,
-                'oldReload': 0,
-                'prescaleBits': 0,
-                'countUp': False,
-                'doIrq': False,
-                'enable': False,
-                'lastEvent': 0,
-                'nextEvent': 0,
-                'overflowInterval': 1
-            })
-
-        self.nextEvent = 0
+            self.timers.append(GameBoyAdvanceTimer(i, self.timers[-1] if self.timers else None))
+
         self.springIRQ = False
+        self.intrWaiting = False
+        self.rebuildEvents()
         self.resetSP()
 
     def freeze(self):
@@ -87,199 +89,179 @@ class GameBoyAdvanceInterruptHandler:
             'enable': self.enable,
             'enabledIRQs': self.enabledIRQs,
             'interruptFlags': self.interruptFlags,
-            'dma': self.dma,
-            'timers': self.timers,
-            'nextEvent': self.nextEvent,
-            'springIRQ': self.springIRQ
+            'dma': [dma.freeze() for dma in self.dma],
+            'timers': [timer.freeze() for timer in self.timers],
+            'springIRQ': self.springIRQ,
+            'intrWaiting': self.intrWaiting
         }
 
     def defrost(self, frost):
         self.enable = frost['enable']
         self.enabledIRQs = frost['enabledIRQs']
         self.interruptFlags = frost['interruptFlags']
-        self.dma = frost['dma']
-        self.timers = frost['timers']
-        self.timersEnabled = 0
-        if self.timers[0]['enable']:
-            self.timersEnabled += 1
-        if self.timers[1]['enable']:
-            self.timersEnabled += 1
-        if self.timers[2]['enable']:
-            self.timersEnabled += 1
-        if self.timers[3]['enable']:
-            self.timersEnabled += 1
-        self.nextEvent = frost['nextEvent']
+        for dma, frozen in zip(self.dma, frost['dma']):
+            dma.defrost(frozen)
+        self.updateDmaLists()
+        for timer, frozen in zip(self.timers, frost['timers']):
+            timer.defrost(frozen)
+        self.timersEnabled = sum(1 for timer in self.timers if timer.enable)
         self.springIRQ = frost['springIRQ']
+        self.intrWaiting = bool(frost.get('intrWaiting'))
+        # Video and audio are defrosted first, so their next events can be requeued here
+        self.rebuildEvents()
 
     def updateTimers(self):
-        if self.nextEvent > self.cpu.cycles:
-            return
+        # Runs every event that is due; each callback reschedules its own subsystem
+        events = self.events
+        cycles = self.cpu.cycles
+        while events and events[0][0] <= cycles:
+            when, seq, callback = heapq.heappop(events)
+            if callback:
+                callback(when)
+        self.pollNextEvent()
 
+    def scheduleEvent(self, when, callback):
+        self.eventCount += 1
+        entry = [when, self.eventCount, callback]
+        heapq.heappush(self.events, entry)
+        if when < self.nextEvent:
+            self.nextEvent = when
+        return entry
+
+    def cancelEvent(self, entry):
+        # Cancelled entries stay in the heap until they reach the head
+        if entry:
+            entry[2] = None
+
+    def rebuildEvents(self):
+        self.events = []
+        self.eventCount = 0
+        self.nextEvent = self.NO_EVENT
+        self.videoEntry = self.scheduleEvent(self.video.nextEvent, self.videoEvent)
+        self.audioStepEntry = None
+        self.audioSampleEntry = None
+        self.timerEntries = [None] * 4
+        self.rescheduleAudio()
+        self.dmaEntries = [None] * 4
+        for dma in self.dma:
+            if dma.doIrq and dma.nextIRQ:
+                self.scheduleDmaIRQ(dma)
+        if self.springIRQ:
+            self.scheduleEvent(self.cpu.cycles, self.springEvent)
+        self.pollNextEvent()
+
+    def videoEvent(self, when):
+        video = self.video
+        video.updateTimers(self.cpu)
+        self.videoEntry = self.scheduleEvent(video.nextEvent, self.videoEvent)
+
+    def rescheduleAudio(self):
+        audio = self.audio
+        self.cancelEvent(self.audioStepEntry)
+        self.cancelEvent(self.audioSampleEntry)
+        self.audioStepEntry = None
+        self.audioSampleEntry = None
+        if audio.enabled:
+            if audio.nextEvent != self.NO_EVENT:
+                self.audioStepEntry = self.scheduleEvent(int(audio.nextEvent), self.audioStepEvent)
+            self.audioSampleEntry = self.scheduleEvent(int(audio.nextSample), self.audioSampleEvent)
+        # Timers 0 and 1 only need overflow events while they can feed the FIFOs
+        self.scheduleTimers()
+
+    def audioStepEvent(self, when):
+        audio = self.audio
+        audio.stepChannels(self.cpu.cycles)
+        if audio.nextEvent != self.NO_EVENT:
+            self.audioStepEntry = self.scheduleEvent(int(audio.nextEvent), self.audioStepEvent)
+        else:
+            self.audioStepEntry = None
+
+    def audioSampleEvent(self, when):
+        audio = self.audio
+        audio.sample()
+        audio.nextSample += audio.sampleInterval
+        self.audioSampleEntry = self.scheduleEvent(int(audio.nextSample), self.audioSampleEvent)
+
+    def springEvent(self, when):
         if self.springIRQ:
-            self.cpu.raiseIRQ()
             self.springIRQ = False
+            self.cpu.raiseIRQ()
+
+    def scheduleTimers(self):
+        # Overflows are only queued when something observes them; counter reads and
+        # cascades are computed from cycles, so an unobserved timer costs nothing
+        cycles = self.cpu.cycles
+        for timer in self.timers:
+            self.cancelEvent(self.timerEntries[timer.number])
+            self.timerEntries[timer.number] = None
+            if timer.enable and (timer.doIrq or (timer.number < 2 and self.audio.enabled)):
+                when = timer.overflowTime(timer.overflows(cycles) + 1)
+                if when != self.NO_EVENT:
+                    self.timerEntries[timer.number] = self.scheduleEvent(when, self.timerCallbacks[timer.number])
+
+    def timerEvent(self, number, when):
+        timer = self.timers[number]
+        self.timerEntries[number] = self.scheduleEvent(timer.overflowTime(timer.overflows(when) + 1), self.timerCallbacks[number])
+
+        if timer.doIrq:
+            self.raiseIRQ(self.IRQ_TIMER[number])
+
+        audio = self.audio
+        if audio.enabled and number < 2:
+            if audio.enableChannelA and int(audio.soundTimerA) == number and audio.dmaA >= 0:
+                audio.sampleFifoA()
+            if audio.enableChannelB and int(audio.soundTimerB) == number and audio.dmaB >= 0:
+                audio.sampleFifoB()
+
+    def rebaseTimers(self):
+        cycles = self.cpu.cycles
+        values = [timer.read(cycles) for timer in self.timers]
+        for timer, value in zip(self.timers, values):
+            timer.rebase(cycles, value)
+
+    def timerSetReload(self, timer, reload):
+        self.rebaseTimers()
+        self.timers[timer].reload = reload & 0xffff
+        self.scheduleTimers()
+        self.pollNextEvent()
 
-        self.video.updateTimers(self.cpu)
-        self.audio.updateTimers()
-        if self.timersEnabled:
-            timer = self.timers[0]
-            if timer['enable']:
-                if self.cpu.cycles >= timer['nextEvent']:
-                    timer['lastEvent'] = timer['nextEvent']
-                    timer['nextEvent'] += timer['overflowInterval']
-                    self.io.registers[self.io.TM0CNT_LO >> 1] = timer['reload']
-                    timer['oldReload'] = timer['reload']
-
-                    if timer['doIrq']:
-                        self.raiseIRQ(self.IRQ_TIMER0)
-
-                    if self.audio.enabled:
-                        if (
-                            self.audio.enableChannelA and
-                            not self.audio.soundTimerA and
-                            self.audio.dmaA >= 0
-                        ):
-                            self.audio.sampleFifoA()
-
-                        if (
-                            self.audio.enableChannelB and
-                            not self.audio.soundTimerB and
-                            self.audio.dmaB >= 0
-                        ):
-                            self.audio.sampleFifoB()
-
-                    timer = self.timers[1]
-                    if timer['countUp']:
-                        if (
-                            self.io.registers[self.io.TM1CNT_LO >> 1] ==
-                            0x10000
-                        ):
-                            timer['nextEvent'] = self.cpu.cycles
-            timer = self.timers[1]
-            if timer['enable']:
-                if self.cpu.cycles >= timer['nextEvent']:
-                    timer['lastEvent'] = timer['nextEvent']
-                    timer['nextEvent'] += timer['overflowInterval']
-                    if (
-                        not timer['countUp'] or
-                        self.io.registers[self.io.TM1CNT_LO >> 1] == 0x10000
-                    ):
-                        self.io.registers[self.io.TM1CNT_LO >> 1] = timer['reload']
-                    timer['oldReload'] = timer['reload']
-
-                    if timer['doIrq']:
-                        self.raiseIRQ(self.IRQ_TIMER1)
-
-                    if timer['countUp']:
-                        timer['nextEvent'] = 0
-
-                    if self.audio.enabled:
-                        if (
-                            self.audio.enableChannelA and
-                            self.audio.soundTimerA and
-                            self.audio.dmaA >= 0
-                        ):
-                            self.audio.sampleFifoA()
-
-                        if (
-                            self.audio.enableChannelB and
-                            self.audio.soundTimerB and
-                            self.audio.dmaB >= 0
-                        ):
-                            self.audio.sampleFifoB()
-
-                    timer = self.timers[2]
-                    if timer['countUp']:
-                        if (
-                            self.io.registers[self.io.TM2CNT_LO >> 1] ==
-                            0x10000
-                        ):
-                            timer['nextEvent'] = self.cpu.cycles
-            timer = self.timers[2]
-            if timer['enable']:
-                if self.cpu.cycles >= timer['nextEvent']:
-                    timer['lastEvent'] = timer['nextEvent']
-                    timer['nextEvent'] += timer['overflowInterval']
-                    if (
-                        not timer['countUp'] or
-                        self.io.registers[self.io.TM2CNT_LO >> 1] == 0x10000
-                    ):
-                        self.io.registers[self.io.TM2CNT_LO >> 1] = timer['reload']
-                    timer['oldReload'] = timer['reload']
-
-                    if timer['doIrq']:
-                        self.raiseIRQ(self.IRQ_TIMER2)
-
-                    if timer['countUp']:
-                        timer['nextEvent'] = 0
-
-                    timer = self.timers[3]
-                    if timer['countUp']:
-                        if (
-                            self.io.registers[self.io.TM3CNT_LO >> 1] ==
-                            0x10000
-                        ):
-                            timer['nextEvent'] = self.cpu.cycles
-            timer = self.timers[3]
-            if timer['enable']:
-                if self.cpu.cycles >= timer['nextEvent']:
-                    timer['lastEvent'] = timer['nextEvent']
-                    timer['nextEvent'] += timer['overflowInterval']
-                    if (
-                        not timer['countUp'] or
-                        self.io.registers[self.io.TM3CNT_LO >> 1] == 0x10000
-                    ):
-                        self.io.registers[self.io.TM3CNT_LO >> 1] = timer['reload']
-                    timer['oldReload'] = timer['reload']
-
-                    if timer['doIrq']:
-                        self.raiseIRQ(self.IRQ_TIMER3)
-
-                    if timer['countUp']:
-                        timer['nextEvent'] = 0
-
-        dma = self.dma[0]
-        if (
-            dma['enable'] and
-            dma['doIrq'] and
-            dma['nextIRQ'] and
-            self.cpu.cycles >= dma['nextIRQ']
-        ):
-            dma['nextIRQ'] = 0
-            self.raiseIRQ(self.IRQ_DMA0)
-
-        dma = self.dma[1]
-        if (
-            dma['enable'] and
-            dma['doIrq'] and
-            dma['nextIRQ'] and
-            self.cpu.cycles >= dma['nextIRQ']
-        ):
-            dma['nextIRQ'] = 0
-            self.raiseIRQ(self.IRQ_DMA1)
-
-        dma = self.dma[2]
-        if (
-            dma['enable'] and
-            dma['doIrq'] and
-            dma['nextIRQ'] and
-            self.cpu.cycles >= dma['nextIRQ']
-        ):
-            dma['nextIRQ'] = 0
-            self.raiseIRQ(self.IRQ_DMA2)
-
-        dma = self.dma[3]
-        if (
-            dma['enable'] and
-            dma['doIrq'] and
-            dma['nextIRQ'] and
-            self.cpu.cycles >= dma['nextIRQ']
-        ):
-            dma['nextIRQ'] = 0
-            self.raiseIRQ(self.IRQ_DMA3)
+    def timerWriteControl(self, timer, control):
+        self.rebaseTimers()
+        currentTimer = self.timers[timer]
+        prescaleBits = currentTimer.prescaleBits
+        currentTimer.prescaleBits = self.TIMER_PRESCALE[control & 0x0003]
+        currentTimer.countUp = bool(control & 0x0004)
+        currentTimer.doIrq = bool(control & 0x0040)
+        wasEnabled = currentTimer.enable
+        currentTimer.enable = bool(control & 0x0080)
+
+        if not wasEnabled and currentTimer.enable:
+            currentTimer.counter = currentTimer.reload
+            currentTimer.start = self.cpu.cycles
+            self.timersEnabled += 1
+        elif wasEnabled and not currentTimer.enable:
+            self.timersEnabled -= 1
+        elif currentTimer.cascades() or currentTimer.prescaleBits != prescaleBits:
+            # Restart the prescaler phase rather than crediting ticks at the new rate
+            currentTimer.start = self.cpu.cycles
 
+        self.scheduleTimers()
         self.pollNextEvent()
 
+    def timerRead(self, timer):
+        return self.timers[timer].read(self.cpu.cycles)
+
+    def scheduleDmaIRQ(self, dma):
+        self.cancelEvent(self.dmaEntries[dma.number])
+        self.dmaEntries[dma.number] = self.scheduleEvent(dma.nextIRQ, self.dmaCallbacks[dma.number])
+
+    def dmaEvent(self, number, when):
+        dma = self.dma[number]
+        self.dmaEntries[number] = None
+        if dma.doIrq and dma.nextIRQ:
+            dma.nextIRQ = 0
+            self.raiseIRQ(self.IRQ_DMA[number])
+
     def resetSP(self):
         self.cpu.switchMode(self.cpu.MODE_SUPERVISOR)
         self.cpu.gprs[self.cpu.SP] = 0x3007fe0
@@ -308,16 +290,17 @@ class GameBoyAdvanceInterruptHandler:
             else:
                 self.cpu.gprs[self.cpu.LR] = 0x02000000
             self.cpu.switchExecMode(self.cpu.MODE_ARM)
-            self.cpu.instruction.writesPC = True
-            self.cpu.gprs[self.cpu.PC] = self.cpu.gprs[self.cpu.LR]
+            # The SWI doesn't write PC as far as the CPU loop knows, so prefetch the target here
+            self.cpu.gprs[self.cpu.PC] = self.cpu.gprs[self.cpu.LR] + self.cpu.WORD_SIZE_ARM
         elif opcode == 0x01:
             # RegisterRamReset
             regions = self.cpu.gprs[0]
+            # Cleared in place: compiled blocks hold on to the RAM region objects
+            mmu = self.core.mmu
             if regions & 0x01:
-                self.core.mmu.memory[self.core.mmu.REGION_WORKING_RAM] = MemoryBlock(self.core.mmu.SIZE_WORKING_RAM, 9)
+                mmu.storeBulk(mmu.BASE_WORKING_RAM, bytes(mmu.SIZE_WORKING_RAM), 4)
             if regions & 0x02:
-                for i in range(0, self.core.mmu.SIZE_WORKING_IRAM - 0x200, 4):
-                    self.core.mmu.memory[self.core.mmu.REGION_WORKING_IRAM].store32(i, 0)
+                mmu.storeBulk(mmu.BASE_WORKING_IRAM, bytes(mmu.SIZE_WORKING_IRAM - 0x200), 4)
             if regions & 0x1c:
                 self.video.renderPath.clearSubsets(self.core.mmu, regions)
             if regions & 0xe0:
@@ -325,18 +308,14 @@ class GameBoyAdvanceInterruptHandler:
         elif opcode == 0x02:
             # Halt
             self.halt()
+        elif opcode == 0x04:
+            # IntrWait
+            self.intrWait(self.cpu.gprs[0], self.cpu.gprs[1])
         elif opcode == 0x05:
             # VBlankIntrWait
             self.cpu.gprs[0] = 1
             self.cpu.gprs[1] = 1
-        elif opcode == 0x04:
-            # IntrWait
-            if not self.enable:
-                self.io.store16(self.io.IME, 1)
-            if not self.cpu.gprs[0] and self.interruptFlags & self.cpu.gprs[1]:
-                return
-            self.dismissIRQs(0xffffffff)
-            self.cpu.raiseTrap()
+            self.intrWait(1, 1)
         elif opcode == 0x06:
             # Div
             result = (self.cpu.gprs[0] | 0) / (self.cpu.gprs[1] | 0)
@@ -487,6 +466,15 @@ class GameBoyAdvanceInterruptHandler:
         elif opcode == 0x15:
             # RlUnCompVram
             self.rl(self.cpu.gprs[0], self.cpu.gprs[1], 2)
+        elif opcode == 0x16:
+            # Diff8bitUnFilterWram
+            self.unFilter(self.cpu.gprs[0], self.cpu.gprs[1], 1, 1)
+        elif opcode == 0x17:
+            # Diff8bitUnFilterVram
+            self.unFilter(self.cpu.gprs[0], self.cpu.gprs[1], 1, 2)
+        elif opcode == 0x18:
+            # Diff16bitUnFilter
+            self.unFilter(self.cpu.gprs[0], self.cpu.gprs[1], 2, 2)
         elif opcode == 0x1f:
             # MidiKey2Freq
             key = self.cpu.mmu.load32(self.cpu.gprs[0] + 4)
@@ -494,11 +482,134 @@ class GameBoyAdvanceInterruptHandler:
         else:
             raise Exception("Unimplemented software interrupt: 0x" + hex(opcode)[2:])
 
+    def decompressionSource(self, source):
+        # Returns the view past the header and the decompressed size, or None if unreadable
+        data = self.cpu.mmu.loadView(source & 0xfffffffc)
+        if data is None or len(data) < 4:
+            self.core.WARN("Decompression from unreadable memory: 0x" + hex(source)[2:])
+            return None, 0
+        return data, data[1] | (data[2] << 8) | (data[3] << 16)
+
+    def lz77(self, source, dest, width):
+        data, size = self.decompressionSource(source)
+        if data is None:
+            return
+        out = bytearray()
+        i = 4
+        while len(out) < size:
+            flags = data[i]
+            i += 1
+            for bit in range(8):
+                if len(out) >= size:
+                    break
+                if flags & (0x80 >> bit):
+                    length = (data[i] >> 4) + 3
+                    disp = (((data[i] & 0xf) << 8) | data[i + 1]) + 1
+                    i += 2
+                    start = len(out) - disp
+                    if disp >= length:
+                        out += out[start:start + length]
+                    else:
+                        # Overlapping copies repeat the last disp bytes
+                        out += (out[start:] * (length // disp + 1))[:length]
+                else:
+                    out.append(data[i])
+                    i += 1
+        self.cpu.mmu.storeBulk(dest, out[:size & ~(width - 1)], width)
+
+    def huffman(self, source, dest):
+        data, size = self.decompressionSource(source)
+        if data is None:
+            return
+        bits = data[0] & 0xf
+        mask = (1 << bits) - 1
+        root = 5
+        stream = 4 + ((data[4] + 1) << 1)
+        out = bytearray()
+        node = root
+        value = 0
+        shift = 0
+        while len(out) < size:
+            word = data[stream] | (data[stream + 1] << 8) | (data[stream + 2] << 16) | (data[stream + 3] << 24)
+            stream += 4
+            for bit in range(31, -1, -1):
+                direction = (word >> bit) & 1
+                entry = data[node]
+                child = (node & ~1) + ((entry & 0x3f) << 1) + 2 + direction
+                if not entry & (0x40 if direction else 0x80):
+                    node = child
+                    continue
+                node = root
+                value |= (data[child] & mask) << shift
+                shift += bits
+                if shift == 32:
+                    out += value.to_bytes(4, 'little')
+                    value = 0
+                    shift = 0
+                    if len(out) >= size:
+                        break
+        self.cpu.mmu.storeBulk(dest & 0xfffffffc, out[:size & ~3], 4)
+
+    def rl(self, source, dest, width):
+        data, size = self.decompressionSource(source)
+        if data is None:
+            return
+        out = bytearray()
+        i = 4
+        while len(out) < size:
+            flag = data[i]
+            if flag & 0x80:
+                out += bytes((data[i + 1],)) * ((flag & 0x7f) + 3)
+                i += 2
+            else:
+                length = (flag & 0x7f) + 1
+                out += data[i + 1:i + 1 + length]
+                i += 1 + length
+        self.cpu.mmu.storeBulk(dest, out[:size & ~(width - 1)], width)
+
+    def unFilter(self, source, dest, unit, width):
+        data, size = self.decompressionSource(source)
+        if data is None:
+            return
+        if unit == 1:
+            out = bytearray(accumulate(data[4:4 + size], lambda a, b: (a + b) & 0xff))
+        else:
+            deltas = data[4:4 + (size & ~1)].cast('H')
+            out = array('H', accumulate(deltas, lambda a, b: (a + b) & 0xffff)).tobytes()
+        self.cpu.mmu.storeBulk(dest, out[:size & ~(width - 1)], width)
+
+    def halt(self):
+        if not self.enabledIRQs:
+            self.core.WARN("Halted with no interrupts enabled")
+            return False
+        if not self.enabledIRQs & self.interruptFlags:
+            self.cpu.halted = True
+            # Force a dispatch so the CPU loop stops before running another block
+            self.nextEvent = self.cpu.cycles
+        return True
+
+    def intrWait(self, discard, mask):
+        # The SWI is rewound so that it runs again when the IRQ handler returns, until the
+        # handler has acknowledged one of the wanted interrupts in the BIOS flags
+        if not self.enable:
+            self.io.store16(self.io.IME, 1)
+        mmu = self.cpu.mmu
+        flags = mmu.loadU16(self.BIOS_IRQ_FLAGS)
+        if discard and not self.intrWaiting:
+            mmu.store16(self.BIOS_IRQ_FLAGS, flags & ~mask)
+        elif flags & mask:
+            mmu.store16(self.BIOS_IRQ_FLAGS, flags & ~mask)
+            self.intrWaiting = False
+            return
+        if not self.halt():
+            self.intrWaiting = False
+            return
+        self.intrWaiting = True
+        self.cpu.gprs[self.cpu.PC] -= self.cpu.instructionWidth
+
     def masterEnable(self, value):
         self.enable = value
-
-        if self.enable and self.enabledIRQs & self.interruptFlags:
-            self.cpu.raiseIRQ()
+        self.testIRQ()
 
     def setInterruptsEnabled(self, value):
         self.enabledIRQs = value
@@ -509,93 +620,22 @@ class GameBoyAdvanceInterruptHandler:
         if self.enabledIRQs & self.MASK_KEYPAD:
             self.core.STUB("Keypad interrupts not implemented")
 
-        if self.enable and self.enabledIRQs & self.interruptFlags:
-            self.cpu.raiseIRQ()
+        if self.enabledIRQs & self.interruptFlags:
+            self.cpu.halted = False
+            self.testIRQ()
 
     def pollNextEvent(self):
-        nextEvent = self.video.nextEvent
-        test = 0
-
-        if self.audio.enabled:
-            test = self.audio.nextEvent
-            if not nextEvent or test < nextEvent:
-                nextEvent = test
-
-        if self.timersEnabled:
-            timer = self.timers[0]
-            test = timer.nextEvent
-            if timer.enable and test and (not nextEvent or test < nextEvent):
-                nextEvent = test
-
-            timer = self.timers[1]
-            test = timer.nextEvent
-            if timer.enable and test and (not nextEvent or test < nextEvent):
-                nextEvent = test
-
-            timer = self.timers[2]
-            test = timer.nextEvent
-            if timer.enable and test and (not nextEvent or test < nextEvent):
-                nextEvent = test
-
-            timer = self.timers[3]
-            test = timer.nextEvent
-            if timer.enable and test and (not nextEvent or test < nextEvent):
-                nextEvent = test
-        dma = self.dma_dat.head
-        if self.dmaog.enable and self.dmaog.doIrq and dma.next != None:
-            nextEvent = dma.next
-
-        dma = dma.next
-        if self.dmaog.enable and self.dmaog.doIrq and dma.next != None:
-            nextEvent = dma.next
-
-        dma = dma.next
-        print(dma)
-        if self.dmaog.enable and self.dmaog.doIrq and dma.next != None:
-            nextEvent = dma.next
-
-        dma = dma.next
-        if self.dmaog.enable and self.dmaog.doIrq and dma.next != None:
-            nextEvent = dma.next
-
-        self.core.ASSERT(int(nextEvent.data, 0) >= self.cpu.cycles, "Next event is before present")
-        self.nextEvent = nextEvent
-
-    def waitForIRQ(self):
-        timer = None
-        irqPending = (
-            self.testIRQ() or
-            self.video.hblankIRQ or
-            self.video.vblankIRQ or
-            self.video.vcounterIRQ
-        )
-        if self.timersEnabled:
-            timer = self.timers[0]
-            irqPending = irqPending or timer.doIrq
-            timer = self.timers[1]
-            irqPending = irqPending or timer.doIrq
-            timer = self.timers[2]
-            irqPending = irqPending or timer.doIrq
-            timer = self.timers[3]
-            irqPending = irqPending or timer.doIrq
-        if not irqPending:
-            return False
-
-        while True:
-            self.pollNextEvent()
-
-            if not self.nextEvent:
-                return False
-            else:
-                self.cpu.cycles = self.nextEvent
-                self.updateTimers()
-                if self.interruptFlags:
-                    return True
+        events = self.events
+        while events and not events[0][2]:
+            heapq.heappop(events)
+        self.nextEvent = events[0][0] if events else self.NO_EVENT
 
     def testIRQ(self):
         if self.enable and self.enabledIRQs & self.interruptFlags:
-            self.springIRQ = True
-            self.nextEvent = self.cpu.cycles
+            # Taken at the next dispatch, between blocks, so a write mid-block can't redirect PC
+            if not self.springIRQ:
+                self.springIRQ = True
+                self.scheduleEvent(self.cpu.cycles, self.springEvent)
             return True
         return False
 
@@ -603,40 +643,47 @@ class GameBoyAdvanceInterruptHandler:
         self.interruptFlags |= 1 << irqType
         self.io.registers[self.io.IF >> 1] = self.interruptFlags
 
-        if self.enable and self.enabledIRQs & (1 << irqType):
-            self.cpu.raiseIRQ()
+        if self.enabledIRQs & (1 << irqType):
+            self.cpu.halted = False
+            self.testIRQ()
 
     def dismissIRQs(self, irqMask):
         self.interruptFlags &= ~irqMask
         self.io.registers[self.io.IF >> 1] = self.interruptFlags
 
     def dmaSetSourceAddress(self, dma, address):
-        self.dma[dma]['source'] = address & 0xfffffffe
+        self.dma[dma].source = address & 0xfffffffe
 
     def dmaSetDestAddress(self, dma, address):
-        self.dma[dma]['dest'] = address & 0xfffffffe
+        self.dma[dma].dest = address & 0xfffffffe
 
     def dmaSetWordCount(self, dma, count):
-        self.dma[dma]['count'] = count if count else 0x10000 if dma == 3 else 0x4000
+        self.dma[dma].count = count if count else 0x10000 if dma == 3 else 0x4000
 
     def dmaWriteControl(self, dma, control):
         currentDma = self.dma[dma]
-        wasEnabled = currentDma['enable']
-        currentDma['dstControl'] = (control & 0x0060) >> 5
-        currentDma['srcControl'] = (control & 0x0180) >> 7
-        currentDma['repeat'] = bool(control & 0x0200)
-        currentDma['width'] = 4 if control & 0x0400 else 2
-        currentDma['drq'] = bool(control & 0x0800)
-        currentDma['timing'] = (control & 0x3000) >> 12
-        currentDma['doIrq'] = bool(control & 0x4000)
-        currentDma['enable'] = bool(control & 0x8000)
-        currentDma['nextIRQ'] = 0
-
-        if currentDma['drq']:
+        wasEnabled = currentDma.enable
+        currentDma.dstControl = (control & 0x0060) >> 5
+        currentDma.srcControl = (control & 0x0180) >> 7
+        currentDma.repeat = bool(control & 0x0200)
+        currentDma.width = 4 if control & 0x0400 else 2
+        currentDma.drq = bool(control & 0x0800)
+        currentDma.timing = (control & 0x3000) >> 12
+        currentDma.doIrq = bool(control & 0x4000)
+        currentDma.enable = bool(control & 0x8000)
+        currentDma.nextIRQ = 0
+        self.updateDmaLists()
+
+        if currentDma.drq:
             self.core.WARN("DRQ not implemented")
 
-        if not wasEnabled and currentDma['enable']:
-            currentDma['nextSource'] = currentDma['source']
-            currentDma['nextDest'] = currentDma['dest']
-            currentDma['nextCount'] = currentDma['count']
-            self.cpu.mmu.scheduleDma(dma, currentDma)
\ No newline at end of file
+        if not wasEnabled and currentDma.enable:
+            currentDma.nextSource = currentDma.source
+            currentDma.nextDest = currentDma.dest
+            currentDma.nextCount = currentDma.count
+            self.cpu.mmu.scheduleDma(dma, currentDma)
+
+    def updateDmaLists(self):
+        # Rebuilt only when a channel's control changes, so per-scanline and per-event checks stay O(1)
+        self.hblankDmas = [dma for dma in self.dma if dma.enable and dma.timing == self.DMA_TIMING_HBLANK]
+        self.vblankDmas = [dma for dma in self.dma if dma.enable and dma.timing == self.DMA_TIMING_VBLANK]
\ No newline at end of file
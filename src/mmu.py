@@ -1,9 +1,37 @@
-from savedata import FlashSavedata
+import hashlib
+import json
+import mmap
+from array import array
+from collections import OrderedDict
+from savedata import SRAMSavedata, FlashSavedata, EEPROMSavedata
+
+class ICachePage:
+    __slots__ = ('bits', 'thumb', 'arm', 'blocks', 'invalid', 'generation')
+
+    def __init__(self, bits):
+        self.bits = bits
+        self.thumb = None
+        self.arm = None
+        self.blocks = {}
+        self.invalid = False
+        self.generation = 0
+
+    def thumbSlots(self):
+        # A page is usually only ever fetched in one mode, so each table is allocated on first use
+        if self.thumb is None:
+            self.thumb = [None] * (1 << self.bits)
+        return self.thumb
+
+    def armSlots(self):
+        if self.arm is None:
+            self.arm = [None] * (1 << (self.bits - 1))
+        return self.arm
+
 
 class MemoryView:
     def __init__(self, memory, offset=0):
         self.buffer = memory
-        self.view = memory[offset:] if offset else memory
+        self.view = memoryview(memory)[offset:]
         self.mask = len(memory) - 1
         self.reset_mask()
 
@@ -11,39 +39,45 @@ class MemoryView:
         self.mask8 = self.mask & 0xffffffff
         self.mask16 = self.mask & 0xfffffffe
         self.mask32 = self.mask & 0xfffffffc
-    
+        # Typed views share the bytes of self.buffer, so every access is one index
+        length = len(self.view)
+        self.view16 = self.view[:length & ~1].cast('H')
+        self.view32 = self.view[:length & ~3].cast('I')
+
     def load8(self, offset):
-        return self.view[offset & self.mask8]
+        return (self.view[offset & self.mask8] ^ 0x80) - 0x80
 
     def load16(self, offset):
-        return self.view[offset & self.mask16]
+        return (self.view16[(offset & self.mask16) >> 1] ^ 0x8000) - 0x8000
 
     def loadU8(self, offset):
         return self.view[offset & self.mask8]
 
     def loadU16(self, offset):
-        return self.view[offset & self.mask16]
+        return self.view16[(offset & self.mask16) >> 1]
 
     def load32(self, offset):
         rotate = (offset & 3) << 3
-        mem = self.view[offset & self.mask32]
-        return (mem >> rotate) | (mem << (32 - rotate))
+        mem = self.view32[(offset & self.mask32) >> 2]
+        if rotate:
+            return ((mem >> rotate) | (mem << (32 - rotate))) & 0xffffffff
+        return mem
 
     def store8(self, offset, value):
-        self.view[offset & self.mask8] = value
+        self.view[offset & self.mask8] = value & 0xff
 
     def store16(self, offset, value):
-        self.view[offset & self.mask16] = value
+        self.view16[(offset & self.mask16) >> 1] = value & 0xffff
 
     def store32(self, offset, value):
-        self.view[offset & self.mask32] = value
+        self.view32[(offset & self.mask32) >> 2] = value & 0xffffffff
 
     def invalidatePage(self, address):
         pass
 
     def replaceData(self, memory, offset=0):
         self.buffer = memory
-        self.view = memory[offset:] if offset else memory
+        self.view = memoryview(memory)[offset:]
         self.reset_mask()
 
 class MemoryBlock(MemoryView):
@@ -51,12 +85,13 @@ class MemoryBlock(MemoryView):
         super().__init__(bytearray(size))
         self.ICACHE_PAGE_BITS = cacheBits
         self.PAGE_MASK = (2 << self.ICACHE_PAGE_BITS) - 1
-        self.icache = [None] * (size >> (self.ICACHE_PAGE_BITS + 1))
+        self.icache = [None] * (size >> self.ICACHE_PAGE_BITS)
 
     def invalidatePage(self, address):
         page = self.icache[(address & self.mask) >> self.ICACHE_PAGE_BITS]
         if page:
-            page['invalid'] = True
+            page.invalid = True
+            page.generation += 1
 
 
 class ROMView(MemoryView):
@@ -64,7 +99,8 @@ class ROMView(MemoryView):
         super().__init__(rom, offset)
         self.ICACHE_PAGE_BITS = 10
         self.PAGE_MASK = (2 << self.ICACHE_PAGE_BITS) - 1
-        self.icache = [None] * (len(rom) >> (self.ICACHE_PAGE_BITS + 1))
+        # Pages of large ROMs are mostly never executed, so only track the ones that are
+        self.icache = {}
         self.mask = 0x01ffffff
         self.reset_mask()
 
@@ -90,16 +126,31 @@ class BIOSView(MemoryView):
         self.ICACHE_PAGE_BITS = 16
         self.PAGE_MASK = (2 << self.ICACHE_PAGE_BITS) - 1
         self.icache = [None]
+        # stmfd sp!, {r0-r3, r12, lr}; mov r0, #0x04000000; add lr, pc, #0; ldr pc, [r0, #-4];
+        # ldmfd sp!, {r0-r3, r12, lr}; subs pc, lr, #4
+        self.IRQ_DISPATCHER = [0xe92d500f, 0xe3a00301, 0xe28fe000, 0xe510f004, 0xe8bd500f, 0xe25ef004]
+        self.irqReturn = self.findIRQDispatcher()
+
+    def findIRQDispatcher(self):
+        # Returns the address the handler comes back to if the IRQ vector reaches the stock
+        # dispatcher, which the CPU can then perform itself
+        branch = self.load32(0x18)
+        if branch < 0 or branch & 0xff000000 != 0xea000000:
+            return None
+        target = 0x20 + ((((branch & 0xffffff) ^ 0x800000) - 0x800000) << 2)
+        if [self.load32(target + i * 4) for i in range(6)] != self.IRQ_DISPATCHER:
+            return None
+        return target + 0x10
 
     def load8(self, offset):
         if offset >= len(self.buffer):
             return -1
-        return self.view[offset]
+        return (self.view[offset] ^ 0x80) - 0x80
 
     def load16(self, offset):
         if offset >= len(self.buffer):
             return -1
-        return self.view[offset]
+        return (self.view16[offset >> 1] ^ 0x8000) - 0x8000
 
     def loadU8(self, offset):
         if offset >= len(self.buffer):
@@ -109,12 +160,12 @@ class BIOSView(MemoryView):
     def loadU16(self, offset):
         if offset >= len(self.buffer):
             return -1
-        return self.view[offset]
+        return self.view16[offset >> 1]
 
     def load32(self, offset):
         if offset >= len(self.buffer):
             return -1
-        return self.view[offset]
+        return self.view32[offset >> 2]
 
     def store8(self, offset, value):
         pass
@@ -162,7 +213,7 @@ class BadMemory:
     def load32(self, offset):
         if self.cpu.execMode == self.cpu.MODE_ARM:
             return self.mmu.load32(
-                self.cpu.gprs[self.cpu.gprs.PC] - self.cpu.instructionWidth
+                self.cpu.gprs[self.cpu.PC] - self.cpu.instructionWidth
             )
         else:
             halfword = self.mmu.loadU16(
@@ -239,6 +290,10 @@ class GameBoyAdvanceMMU:
         self.DMA_INCREMENT_RELOAD = 3
 
         self.DMA_OFFSET = [1, -1, 0, 1]
+        self.DMA_BULK_DESTS = (self.REGION_WORKING_RAM, self.REGION_WORKING_IRAM, self.REGION_VRAM)
+        self.DMA_BULK_SOURCES = (self.REGION_WORKING_RAM, self.REGION_WORKING_IRAM, self.REGION_VRAM, self.REGION_OAM,
+                                 self.REGION_CART0, self.REGION_CART0 + 1, self.REGION_CART1, self.REGION_CART1 + 1,
+                                 self.REGION_CART2, self.REGION_CART2 + 1)
 
         #self.WAITSTATES = [0, 0, 2, 0, 0, 0, 0, 0, 4, 4, 4, 4, 4, 4, 4]
         #self.WAITSTATES_32 = [0, 0, 5, 0, 0, 1, 0, 1, 7, 7, 9, 9, 13, 13, 8]
@@ -265,7 +320,17 @@ class GameBoyAdvanceMMU:
         self.ICACHE_PAGE_BITS = 8
         self.PAGE_MASK = (2 << self.ICACHE_PAGE_BITS) - 1
 
+        self.SAVE_SIGNATURES = (b'FLASH_V', b'FLASH512_V', b'FLASH1M_V', b'SRAM_V', b'EEPROM_V')
+
         self.bios = None
+        self.cartCachePath = None
+
+        # Upper bound on resident cartridge pages; each covers 1 KiB of ROM plus its compiled code
+        self.icacheBudget = 2048
+        self.residentPages = OrderedDict()
+        self.icacheHits = 0
+        self.icacheMisses = 0
+        self.icacheEvictions = 0
 
         self.memory = {}
         
@@ -300,8 +365,13 @@ class GameBoyAdvanceMMU:
             self.badMemory,  # Unused
         ]
         for i in range(16, 256):
-            self.memory[i] = self.badMemory
-        self.memory[255] = self.badMemory
+            self.memory.append(self.badMemory)
+        # BIOS blocks survive a reset but are bound to the old RAM regions
+        self.invalidateRegionBlocks(self.REGION_BIOS)
+        self.residentPages = OrderedDict()
+        self.icacheHits = 0
+        self.icacheMisses = 0
+        self.icacheEvictions = 0
         self.waitstates = self.WAITSTATES[:]
         self.waitstatesSeq = self.WAITSTATES_SEQ[:]
         self.waitstates32 = self.WAITSTATES_32[:]
@@ -333,6 +403,12 @@ class GameBoyAdvanceMMU:
         self.bios = BIOSView(bios)
         self.bios.real = bool(real)
 
+    def loadRomFromPath(self, path, process=None):
+        # The mapping outlives the file handle; ROMViews slice it without copying
+        with open(path, 'rb') as romFile:
+            data = mmap.mmap(romFile.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.loadRom(data, True, process)
+
     def loadRom(self, data, raw=False, process=None):
         global rom
         rom = data
@@ -360,39 +436,9 @@ class GameBoyAdvanceMMU:
             self.memory[self.REGION_CART2 + 1] = hi
 
         if process:
-            name = ''.join(chr(lo.view[i + 0xa0]) for i in range(12) if lo.view[i + 0xa0])
-            cart['title'] = name
-
-            code = ''.join(chr(lo.view[i + 0xac]) for i in range(4) if lo.view[i + 0xac])
-            cart['code'] = code
-
-            maker = ''.join(chr(lo.view[i + 0xb0]) for i in range(2) if lo.view[i + 0xb0])
-            cart['maker'] = maker
-
-            state = ''
-            terminal = False
-            for i in range(0xe4, len(rom)):
-                next_char = chr(lo.view[i])
-                state += next_char
-                if state in ['F', 'FL', 'FLA', 'FLAS', 'FLASH', 'FLASH_', 'FLASH5', 'FLASH51', 'FLASH512', 'FLASH512_', 'FLASH1', 'FLASH1M', 'FLASH1M_', 'S', 'SR', 'SRA', 'SRAM', 'SRAM_', 'E', 'EE', 'EEP', 'EEPR', 'EEPRO', 'EEPROM', 'EEPROM_']:
-                    pass
-                elif state in ['FLASH_V', 'FLASH512_V']:
-                    terminal = True
-                    break
-                elif state in ['FLASH1M_V']:
-                    terminal = True
-                    break
-                elif state in ['SRAM_V']:
-                    terminal = True
-                    break
-                elif state in ['EEPROM_V']:
-                    terminal = True
-                    break
-                else:
-                    state = next_char
-
-            if terminal:
-                cart['saveType'] = state
+            cart.update(self.detectCart(rom))
+            state = cart['saveType']
+            if state:
                 if state in ['FLASH_V', 'FLASH512_V']:
                     self.save = self.memory[self.REGION_CART_SRAM] = FlashSavedata(self.SIZE_CART_FLASH512)
                 elif state in ['FLASH1M_V']:
@@ -407,6 +453,50 @@ class GameBoyAdvanceMMU:
         self.cart = cart
         return cart
 
+    def detectCart(self, rom):
+        key = None
+        cache = None
+        if self.cartCachePath:
+            key = hashlib.sha1(rom).hexdigest()
+            cache = self.loadCartCache()
+            if key in cache:
+                return cache[key]
+
+        header = bytes(rom[0xa0:0xb2])
+        # One native find per signature; the earliest hit names the save type
+        saveType = None
+        first = len(rom)
+        for signature in self.SAVE_SIGNATURES:
+            index = rom.find(signature, 0xe4, first)
+            if index >= 0:
+                first = index
+                saveType = signature.decode('ascii')
+        info = {
+            'title': header[0:12].replace(b'\0', b'').decode('latin-1'),
+            'code': header[12:16].replace(b'\0', b'').decode('latin-1'),
+            'maker': header[16:18].replace(b'\0', b'').decode('latin-1'),
+            'saveType': saveType,
+        }
+
+        if cache is not None:
+            cache[key] = info
+            self.storeCartCache(cache)
+        return info
+
+    def loadCartCache(self):
+        try:
+            with open(self.cartCachePath) as cacheFile:
+                return json.load(cacheFile)
+        except (OSError, ValueError):
+            return {}
+
+    def storeCartCache(self, cache):
+        try:
+            with open(self.cartCachePath, 'w') as cacheFile:
+                json.dump(cache, cacheFile)
+        except OSError:
+            pass
+
     def loadSavedata(self, save):
         self.save.replaceData(save)
 
@@ -481,16 +571,61 @@ class GameBoyAdvanceMMU:
 
     def accessPage(self, region, page_id):
         memory = self.memory[region]
-        page = memory.icache[page_id]
-        if not page or page['invalid']:
-            page = {
-                'thumb': [None] * (1 << memory.ICACHE_PAGE_BITS),
-                'arm': [None] * (1 << (memory.ICACHE_PAGE_BITS - 1)),
-                'invalid': False,
-            }
-            memory.icache[page_id] = page
+        icache = memory.icache
+        try:
+            page = icache[page_id]
+        except KeyError:
+            page = None
+        if page and not page.invalid:
+            self.icacheHits += 1
+            if isinstance(memory, ROMView):
+                self.residentPages.move_to_end((memory, page_id))
+            return page
+        self.icacheMisses += 1
+        page = ICachePage(memory.ICACHE_PAGE_BITS)
+        icache[page_id] = page
+        if isinstance(memory, ROMView):
+            key = (memory, page_id)
+            self.residentPages[key] = page
+            self.residentPages.move_to_end(key)
+            if len(self.residentPages) > self.icacheBudget:
+                self.evictPages(self.icacheBudget)
         return page
 
+    def evictPages(self, budget):
+        resident = self.residentPages
+        current = self.cpu.page
+        skipped = 0
+        while len(resident) > budget and skipped < len(resident):
+            (memory, page_id), page = resident.popitem(last=False)
+            if page is current:
+                # Still executing from it; keep it as the most recent entry
+                resident[(memory, page_id)] = page
+                skipped += 1
+                continue
+            if memory.icache.get(page_id) is page:
+                del memory.icache[page_id]
+            # Bumping the generation breaks any block links that still point into the page
+            page.invalid = True
+            page.generation += 1
+            page.blocks.clear()
+            self.icacheEvictions += 1
+
+    def setICacheBudget(self, pages):
+        self.icacheBudget = pages
+        self.evictPages(pages)
+
+    def icacheStats(self):
+        lookups = self.icacheHits + self.icacheMisses
+        return {
+            'hits': self.icacheHits,
+            'misses': self.icacheMisses,
+            'hitRate': self.icacheHits / lookups if lookups else 0.0,
+            'evictions': self.icacheEvictions,
+            'residentPages': len(self.residentPages),
+            'budget': self.icacheBudget,
+        }
+
     def scheduleDma(self, number, info):
         if info.timing == self.DMA_TIMING_NOW:
             self.serviceDma(number, info)
@@ -504,25 +639,24 @@ class GameBoyAdvanceMMU:
             elif number == 1 or number == 2:
                 self.cpu.irq.audio.scheduleFIFODma(number, info)
             elif number == 3:
-                self.cpu.irq.video.scheduleVCaptureDma(dma, info)
+                self.cpu.irq.video.scheduleVCaptureDma(number, info)
 
     def runHblankDmas(self):
-        for dma in self.cpu.irq.dma:
-            if dma.enable and dma.timing == self.DMA_TIMING_HBLANK:
-                self.serviceDma(i, dma)
+        # Servicing may disable a one-shot channel, which rebuilds the list
+        for dma in self.cpu.irq.hblankDmas[:]:
+            self.serviceDma(dma.number, dma)
 
     def runVblankDmas(self):
-        for dma in self.cpu.irq.dma:
-            if dma.enable and dma.timing == self.DMA_TIMING_VBLANK:
-                self.serviceDma(i, dma)
+        for dma in self.cpu.irq.vblankDmas[:]:
+            self.serviceDma(dma.number, dma)
 
     def serviceDma(self, number, info):
         if not info.enable:
             return
 
         width = info.width
-        source_offset = self.DMA_OFFSET[info.srcControl] * width
-        dest_offset = self.DMA_OFFSET[info.dstControl] * width
+        source_step = self.DMA_OFFSET[info.srcControl]
+        dest_step = self.DMA_OFFSET[info.dstControl]
         words_remaining = info.nextCount
         source = info.nextSource & self.OFFSET_MASK
         dest = info.nextDest & self.OFFSET_MASK
@@ -530,76 +664,35 @@ class GameBoyAdvanceMMU:
         dest_region = info.nextDest >> self.BASE_OFFSET
         source_block = self.memory[source_region]
         dest_block = self.memory[dest_region]
-        source_view = None
-        dest_view = None
-        source_mask = 0xffffffff
-        dest_mask = 0xffffffff
-
-        if dest_block.ICACHE_PAGE_BITS:
-            end_page = (dest + words_remaining * width) >> dest_block.ICACHE_PAGE_BITS
-            for i in range(dest >> dest_block.ICACHE_PAGE_BITS, end_page + 1):
-                dest_block.invalidatePage(i << dest_block.ICACHE_PAGE_BITS)
-
-        if dest_region == self.REGION_WORKING_RAM or dest_region == self.REGION_WORKING_IRAM:
-            dest_view = dest_block.view
-            dest_mask = dest_block.mask
-
-        if source_region == self.REGION_WORKING_RAM or source_region == self.REGION_WORKING_IRAM or source_region == self.REGION_CART0 or source_region == self.REGION_CART1:
-            source_view = source_block.view
-            source_mask = source_block.mask
+        if width == 4:
+            source &= 0xfffffffc
+            dest &= 0xfffffffc
 
         if source_block and dest_block:
-            if source_view and dest_view:
-                if width == 4:
-                    source &= 0xfffffffc
-                    dest &= 0xfffffffc
-                    while words_remaining:
-                        word = source_view.getInt32(source & source_mask)
-                        dest_view.setInt32(dest & dest_mask, word)
-                        source += source_offset
-                        dest += dest_offset
-                        words_remaining -= 1
-                else:
-                    while words_remaining:
-                        word = source_view.getUint16(source & source_mask)
-                        dest_view.setUint16(dest & dest_mask, word)
-                        source += source_offset
-                        dest += dest_offset
-                        words_remaining -= 1
-            elif source_view:
-                if width == 4:
-                    source &= 0xfffffffc
-                    dest &= 0xfffffffc
-                    while words_remaining:
-                        word = source_view.getInt32(source & source_mask, True)
-                        dest_block.store32(dest, word)
-                        source += source_offset
-                        dest += dest_offset
-                        words_remaining -= 1
-                else:
-                    while words_remaining:
-                        word = source_view.getUint16(source & source_mask, True)
-                        dest_block.store16(dest, word)
-                        source += source_offset
-                        dest += dest_offset
-                        words_remaining -= 1
+            if getattr(dest_block, 'icache', None) is not None and words_remaining:
+                # One pass over the touched pages instead of one invalidation per word
+                bits = dest_block.ICACHE_PAGE_BITS
+                last = dest + (words_remaining - 1) * width * dest_step
+                for page in range(min(dest, last) >> bits, (max(dest, last) >> bits) + 1):
+                    dest_block.invalidatePage(page << bits)
+
+            if self.dmaBulk(source_block, dest_block, source_region, dest_region, source, dest,
+                            source_step, dest_step, words_remaining, width):
+                source += source_step * width * words_remaining
+                dest += dest_step * width * words_remaining
+                words_remaining = 0
+            elif width == 4:
+                while words_remaining:
+                    dest_block.store32(dest, source_block.load32(source))
+                    source += source_step * 4
+                    dest += dest_step * 4
+                    words_remaining -= 1
             else:
-                if width == 4:
-                    source &= 0xfffffffc
-                    dest &= 0xfffffffc
-                    while words_remaining:
-                        word = source_block.load32(source)
-                        dest_block.store32(dest, word)
-                        source += source_offset
-                        dest += dest_offset
-                        words_remaining -= 1
-                else:
-                    while words_remaining:
-                        word = source_block.loadU16(source)
-                        dest_block.store16(dest, word)
-                        source += source_offset
-                        dest += dest_offset
-                        words_remaining -= 1
+                while words_remaining:
+                    dest_block.store16(dest, source_block.loadU16(source))
+                    source += source_step * 2
+                    dest += dest_step * 2
+                    words_remaining -= 1
         else:
             self.core.WARN("Invalid DMA")
 
@@ -607,6 +700,7 @@ class GameBoyAdvanceMMU:
             info.nextIRQ = self.cpu.cycles + 2
             info.nextIRQ += (self.waitstates32[source_region] + self.waitstates32[dest_region]) if width == 4 else (self.waitstates[source_region] + self.waitstates[dest_region])
             info.nextIRQ += (info.count - 1) * ((self.waitstatesSeq32[source_region] + self.waitstatesSeq32[dest_region]) if width == 4 else (self.waitstatesSeq[source_region] + self.waitstatesSeq[dest_region]))
+            self.cpu.irq.scheduleDmaIRQ(info)
 
         info.nextSource = source | (source_region << self.BASE_OFFSET)
         info.nextDest = dest | (dest_region << self.BASE_OFFSET)
@@ -614,6 +708,7 @@ class GameBoyAdvanceMMU:
 
         if not info.repeat:
             info.enable = False
+            self.cpu.irq.updateDmaLists()
 
             # Clear the enable bit in memory
             io = self.memory[self.REGION_IO]
@@ -624,6 +719,62 @@ class GameBoyAdvanceMMU:
                 info.nextDest = info.dest
             self.scheduleDma(number, info)
 
+    def dmaBulk(self, source_block, dest_block, source_region, dest_region, source, dest,
+                source_step, dest_step, count, width):
+        # Plain typed-view destinations take the whole transfer as one slice operation;
+        # everything else (IO, palette, OAM, save) needs its per-word store side effects
+        if dest_region not in self.DMA_BULK_DESTS or source_region not in self.DMA_BULK_SOURCES or count < 2:
+            return False
+        if dest_step != 1 or source_step == -1:
+            return False
+        shift = 2 if width == 4 else 1
+        source_view = source_block.view32 if width == 4 else source_block.view16
+        dest_view = dest_block.view32 if width == 4 else dest_block.view16
+        source_index = (source & getattr(source_block, 'mask', self.OFFSET_MASK)) >> shift
+        dest_index = (dest & getattr(dest_block, 'mask', self.OFFSET_MASK)) >> shift
+        if dest_index + count > len(dest_view):
+            return False
+        if source_step:
+            if source_index + count > len(source_view):
+                return False
+            dest_view[dest_index:dest_index + count] = source_view[source_index:source_index + count]
+        else:
+            if source_index >= len(source_view):
+                return False
+            fill = array('I' if width == 4 else 'H', [source_view[source_index]])
+            dest_view[dest_index:dest_index + count] = fill * count
+        return True
+
+    def loadView(self, address):
+        # A zero-copy view from address to the end of its region, for bulk readers
+        block = self.memory[address >> self.BASE_OFFSET]
+        view = getattr(block, 'view', None)
+        if view is None:
+            return None
+        return view[address & getattr(block, 'mask', self.OFFSET_MASK):]
+
+    def storeBulk(self, address, data, width):
+        # Plain typed-view destinations take the data as one slice; anything else, and byte
+        # writes to VRAM (which the hardware widens to halfwords), keeps its per-unit stores
+        if not data:
+            return
+        region = address >> self.BASE_OFFSET
+        block = self.memory[region]
+        offset = address & getattr(block, 'mask', self.OFFSET_MASK)
+        end = offset + len(data)
+        if region in self.DMA_BULK_DESTS and (width != 1 or region != self.REGION_VRAM) and end <= len(block.view):
+            if getattr(block, 'icache', None) is not None:
+                bits = block.ICACHE_PAGE_BITS
+                for page in range(offset >> bits, ((end - 1) >> bits) + 1):
+                    block.invalidatePage(page << bits)
+            block.view[offset:end] = data
+        elif width == 1:
+            for i in range(len(data)):
+                self.store8(address + i, data[i])
+        else:
+            for i in range(0, len(data) & ~1, 2):
+                self.store16(address + i, data[i] | (data[i + 1] << 8))
+
     def adjustTimings(self, word):
         sram = word & 0x0003
         ws0 = (word & 0x000c) >> 2
@@ -670,7 +821,25 @@ class GameBoyAdvanceMMU:
             self.waitstatesPrefetch32[self.REGION_CART1] = self.waitstatesPrefetch32[self.REGION_CART1 + 1] = self.waitstatesSeq32[self.REGION_CART1]
             self.waitstatesPrefetch32[self.REGION_CART2] = self.waitstatesPrefetch32[self.REGION_CART2 + 1] = self.waitstatesSeq32[self.REGION_CART2]
 
+        # The three wait state mirrors share their ROMViews, so visit each view once
+        views = {}
+        for region in range(self.REGION_CART0, self.REGION_CART_SRAM):
+            views[id(self.memory[region])] = region
+        for region in views.values():
+            self.invalidateRegionBlocks(region)
+
+    def invalidateRegionBlocks(self, region):
+        # Compiled blocks fold in their region's fetch timings
+        memory = self.memory[region]
+        icache = getattr(memory, 'icache', ())
+        for page in icache.values() if isinstance(icache, dict) else icache:
+            if page:
+                page.blocks.clear()
+                page.generation += 1
+
     def saveNeedsFlush(self):
+        if self.save is None:
+            return False
         return self.save.writePending
 
     def flushSave(self):
@@ -1,25 +1,50 @@
 class SRAMSavedata:
 
     def __init__(self, size):
-        super().__init__(bytearray(size), 0)
+        self.view = bytearray(size)
+        self.mask = size - 1
         self.writePending = False
 
+    def load8(self, offset):
+        return (self.loadU8(offset) ^ 0x80) - 0x80
+
+    def load16(self, offset):
+        return (self.loadU16(offset) ^ 0x8000) - 0x8000
+
+    def load32(self, offset):
+        return self.loadU16(offset & ~2) | (self.loadU16(offset | 2) << 16)
+
+    def loadU8(self, offset):
+        return self.view[offset & self.mask]
+
+    def loadU16(self, offset):
+        offset &= self.mask & ~1
+        return self.view[offset] | (self.view[offset + 1] << 8)
+
     def store8(self, offset, value):
-        self.view[offset] = value
+        self.view[offset & self.mask] = value & 0xFF
         self.writePending = True
 
     def store16(self, offset, value):
+        offset &= self.mask & ~1
         self.view[offset] = value & 0xFF
         self.view[offset + 1] = (value >> 8) & 0xFF
         self.writePending = True
 
     def store32(self, offset, value):
+        offset &= self.mask & ~3
         self.view[offset] = value & 0xFF
         self.view[offset + 1] = (value >> 8) & 0xFF
         self.view[offset + 2] = (value >> 16) & 0xFF
         self.view[offset + 3] = (value >> 24) & 0xFF
         self.writePending = True
 
+    def replaceData(self, memory):
+        self.view = memory
+
+    def invalidatePage(self, address):
+        pass
+
 
 class FlashSavedata:
 
@@ -132,6 +157,9 @@ class FlashSavedata:
     def store32(self, offset, value):
         raise Exception('Unaligned save to flash!')
 
+    def invalidatePage(self, address):
+        pass
+
     def replaceData(self, memory):
         bank = self.view is self.bank1
         self.view = memory
@@ -150,7 +178,7 @@ class FlashSavedata:
         return self
 class EEPROMSavedata:
     def __init__(self, size, mmu):
-        super().__init__(bytearray(size), 0)
+        self.view = bytearray(size)
 
         self.writeAddress = 0
         self.readBitsRemaining = 0
@@ -244,5 +272,8 @@ class EEPROMSavedata:
     def store32(self, offset, value):
         raise Exception('Unsupported 32-bit access!')
 
+    def invalidatePage(self, address):
+        pass
+
     def replaceData(self, memory):
         self.view = memory
\ No newline at end of file
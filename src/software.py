@@ -1,42 +1,41 @@
+from array import array
+
+
 class MemoryAligned16:
     def __init__(self, size):
-        self.buffer = bytearray(size >> 1)
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.view16 = self.view.cast('H')
+        self.view32 = self.view.cast('I')
     
     def load8(self, offset):
-        return (self.loadU8(offset) << 24) >> 24
+        return (self.view[offset] ^ 0x80) - 0x80
     
     def load16(self, offset):
-        return (self.loadU16(offset) << 16) >> 16
+        return (self.view16[offset >> 1] ^ 0x8000) - 0x8000
     
     def loadU8(self, offset):
-        index = offset >> 1
-        if offset & 1:
-            return (self.buffer[index] & 0xFF00) >> 8
-        else:
-            return self.buffer[index] & 0x00FF
+        return self.view[offset]
     
     def loadU16(self, offset):
-        return self.buffer[offset >> 1]
+        return self.view16[offset >> 1]
     
     def load32(self, offset):
-        return self.buffer[(offset >> 1) & ~1] | (self.buffer[(offset >> 1) | 1] << 16)
+        return self.view32[offset >> 2]
     
     def store8(self, offset, value):
-        index = offset >> 1
+        value &= 0xFF
         self.store16(offset, (value << 8) | value)
     
     def store16(self, offset, value):
-        self.buffer[offset >> 1] = value
+        self.view16[offset >> 1] = value & 0xFFFF
     
     def store32(self, offset, value):
-        index = offset >> 1
-        self.buffer[index] = value & 0xFFFF
-        self.store16(offset, self.buffer[index])
-        self.buffer[index + 1] = value >> 16
-        self.store16(offset + 2, self.buffer[index + 1])
+        self.store16(offset, value & 0xFFFF)
+        self.store16(offset + 2, (value >> 16) & 0xFFFF)
     
     def insert(self, start, data):
-        self.buffer[start:start+len(data)] = data
+        self.view16[start:start + len(data)] = array('H', data)
     
     def invalidatePage(self, address):
         pass
@@ -7,17 +7,13 @@ class ARMCoreThumb:
         gprs = cpu.gprs
         def adc():
             cpu.mmu.waitPrefetch(gprs[cpu.PC])
-            m = (gprs[rm] >> 0) + int(cpu.cpsrC)
-            oldD = gprs[rd]
-            d = (oldD >> 0) + m
-            oldDn = oldD >> 31
-            dn = d >> 31
-            mn = m >> 31
-            cpu.cpsrN = dn
-            cpu.cpsrZ = not (d & 0xffffffff)
-            cpu.cpsrC = d > 0xffffffff
-            cpu.cpsrV = oldDn == mn and oldDn != dn and mn != dn
-            gprs[rd] = d
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
+            n = gprs[rd] & 0xffffffff
+            m = gprs[rm] & 0xffffffff
+            d = n + m + (1 if cpu.cpsrC else 0)
+            cpu.lazyFlags = (cpu.FLAGS_ADD, n, m, d)
+            gprs[rd] = d & 0xffffffff
         return adc
     
     def constructADD1(self, rd, rn, immediate):
@@ -25,12 +21,11 @@ class ARMCoreThumb:
         gprs = cpu.gprs
         def add():
             cpu.mmu.waitPrefetch(gprs[cpu.PC])
-            d = (gprs[rn] >> 0) + immediate
-            cpu.cpsrN = d >> 31
-            cpu.cpsrZ = not (d & 0xffffffff)
-            cpu.cpsrC = d > 0xffffffff
-            cpu.cpsrV = not (gprs[rn] >> 31) and ((gprs[rn] >> 31) ^ d) >> 31 and d >> 31
-            gprs[rd] = d
+            n = gprs[rn] & 0xffffffff
+            m = immediate
+            d = n + m
+            cpu.lazyFlags = (cpu.FLAGS_ADD, n, m, d)
+            gprs[rd] = d & 0xffffffff
         return add
     
     def constructADD2(self, rn, immediate):
@@ -38,12 +33,11 @@ class ARMCoreThumb:
         gprs = cpu.gprs
         def add():
             cpu.mmu.waitPrefetch(gprs[cpu.PC])
-            d = (gprs[rn] >> 0) + immediate
-            cpu.cpsrN = d >> 31
-            cpu.cpsrZ = not (d & 0xffffffff)
-            cpu.cpsrC = d > 0xffffffff
-            cpu.cpsrV = not (gprs[rn] >> 31) and (gprs[rn] ^ d) >> 31 and (immediate ^ d) >> 31
-            gprs[rn] = d
+            n = gprs[rn] & 0xffffffff
+            m = immediate
+            d = n + m
+            cpu.lazyFlags = (cpu.FLAGS_ADD, n, m, d)
+            gprs[rn] = d & 0xffffffff
         return add
     
     def constructADD3(self, rd, rn, rm):
@@ -51,12 +45,11 @@ class ARMCoreThumb:
         gprs = cpu.gprs
         def add():
             cpu.mmu.waitPrefetch(gprs[cpu.PC])
-            d = (gprs[rn] >> 0) + (gprs[rm] >> 0)
-            cpu.cpsrN = d >> 31
-            cpu.cpsrZ = not (d & 0xffffffff)
-            cpu.cpsrC = d > 0xffffffff
-            cpu.cpsrV = not ((gprs[rn] ^ gprs[rm]) >> 31) and (gprs[rn] ^ d) >> 31 and (gprs[rm] ^ d) >> 31
-            gprs[rd] = d
+            n = gprs[rn] & 0xffffffff
+            m = gprs[rm] & 0xffffffff
+            d = n + m
+            cpu.lazyFlags = (cpu.FLAGS_ADD, n, m, d)
+            gprs[rd] = d & 0xffffffff
         return add
     
     def constructADD4(self, rd, rm):
@@ -96,7 +89,9 @@ class ARMCoreThumb:
         gprs = cpu.gprs
         def and_():
             cpu.mmu.waitPrefetch(gprs[cpu.PC])
-            gprs[rd] = gprs[rd] & gprs[rm]
+            gprs[rd] = gprs[rd] & gprs[rm] & 0xffffffff
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             cpu.cpsrN = gprs[rd] >> 31
             cpu.cpsrZ = not (gprs[rd] & 0xffffffff)
         return and_
@@ -106,6 +101,8 @@ class ARMCoreThumb:
         gprs = cpu.gprs
         def asr():
             cpu.mmu.waitPrefetch(gprs[cpu.PC])
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             if immediate == 0:
                 cpu.cpsrC = gprs[rm] >> 31
                 if cpu.cpsrC:
@@ -114,7 +111,7 @@ class ARMCoreThumb:
                     gprs[rd] = 0
             else:
                 cpu.cpsrC = gprs[rm] & (1 << (immediate - 1))
-                gprs[rd] = gprs[rm] >> immediate
+                gprs[rd] = ((((gprs[rm] & 0xffffffff) ^ 0x80000000) - 0x80000000) >> immediate) & 0xffffffff
             cpu.cpsrN = gprs[rd] >> 31
             cpu.cpsrZ = not (gprs[rd] & 0xffffffff)
         return asr
@@ -125,6 +122,8 @@ class ARMCoreThumb:
         def asr():
             cpu.mmu.waitPrefetch(gprs[cpu.PC])
             rs = gprs[rm] & 0xff
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             if rs:
                 if rs < 32:
                     cpu.cpsrC = gprs[rd] & (1 << (rs - 1))
@@ -144,8 +143,10 @@ class ARMCoreThumb:
         gprs = cpu.gprs
         def b():
             cpu.mmu.waitPrefetch(gprs[cpu.PC])
-            if condOp():
+            if condOp[cpu.nzcv if cpu.lazyFlags is None else cpu.resolveFlags()]:
                 gprs[cpu.PC] += immediate
+            else:
+                cpu.conditionPassed = False
         return b
     
     def constructB2(self, immediate):
@@ -161,7 +162,9 @@ class ARMCoreThumb:
         gprs = cpu.gprs
         def bic():
             cpu.mmu.waitPrefetch(gprs[cpu.PC])
-            gprs[rd] = gprs[rd] & ~gprs[rm]
+            gprs[rd] = gprs[rd] & ~gprs[rm] & 0xffffffff
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             cpu.cpsrN = gprs[rd] >> 31
             cpu.cpsrZ = not (gprs[rd] & 0xffffffff)
         return bic
@@ -201,11 +204,10 @@ class ARMCoreThumb:
         gprs = cpu.gprs
         def cmn():
             cpu.mmu.waitPrefetch(gprs[cpu.PC])
-            aluOut = (gprs[rd] >> 0) + (gprs[rm] >> 0)
-            cpu.cpsrN = aluOut >> 31
-            cpu.cpsrZ = not (aluOut & 0xffffffff)
-            cpu.cpsrC = aluOut > 0xffffffff
-            cpu.cpsrV = gprs[rd] >> 31 == gprs[rm] >> 31 and gprs[rd] >> 31 != aluOut >> 31 and gprs[rm] >> 31 != aluOut >> 31
+            n = gprs[rd] & 0xffffffff
+            m = gprs[rm] & 0xffffffff
+            d = n + m
+            cpu.lazyFlags = (cpu.FLAGS_ADD, n, m, d)
         return cmn
     
     def constructCMP1(self, rn, immediate):
@@ -213,11 +215,10 @@ class ARMCoreThumb:
         gprs = cpu.gprs
         def cmp():
             cpu.mmu.waitPrefetch(gprs[cpu.PC])
-            aluOut = gprs[rn] - immediate
-            cpu.cpsrN = aluOut >> 31
-            cpu.cpsrZ = not (aluOut & 0xffffffff)
-            cpu.cpsrC = gprs[rn] >> 0 >= immediate
-            cpu.cpsrV = gprs[rn] >> 31 and (gprs[rn] ^ aluOut) >> 31
+            n = gprs[rn] & 0xffffffff
+            m = immediate
+            d = n - m
+            cpu.lazyFlags = (cpu.FLAGS_SUB, n, m, d)
         return cmp
     
     def constructCMP2(self, rd, rm):
@@ -225,15 +226,10 @@ class ARMCoreThumb:
         gprs = cpu.gprs
         def cmp():
             cpu.mmu.waitPrefetch(gprs[cpu.PC])
-            d = gprs[rd]
-            m = gprs[rm]
-            aluOut = d - m
-            an = aluOut >> 31
-            dn = d >> 31
-            cpu.cpsrN = an
-            cpu.cpsrZ = not (aluOut & 0xffffffff)
-            cpu.cpsrC = d >> 0 >= m >> 0
-            cpu.cpsrV = dn != m >> 31 and dn != an
+            n = gprs[rd] & 0xffffffff
+            m = gprs[rm] & 0xffffffff
+            d = n - m
+            cpu.lazyFlags = (cpu.FLAGS_SUB, n, m, d)
         return cmp
     
     def constructCMP3(self, rd, rm):
@@ -241,11 +237,10 @@ class ARMCoreThumb:
         gprs = cpu.gprs
         def cmp():
             cpu.mmu.waitPrefetch(gprs[cpu.PC])
-            aluOut = gprs[rd] - gprs[rm]
-            cpu.cpsrN = aluOut >> 31
-            cpu.cpsrZ = not (aluOut & 0xffffffff)
-            cpu.cpsrC = gprs[rd] >> 0 >= gprs[rm] >> 0
-            cpu.cpsrV = (gprs[rd] ^ gprs[rm]) >> 31 and (gprs[rd] ^ aluOut) >> 31
+            n = gprs[rd] & 0xffffffff
+            m = gprs[rm] & 0xffffffff
+            d = n - m
+            cpu.lazyFlags = (cpu.FLAGS_SUB, n, m, d)
         return cmp
     
     def constructEOR(self, rd, rm):
@@ -253,7 +248,9 @@ class ARMCoreThumb:
         gprs = cpu.gprs
         def eor():
             cpu.mmu.waitPrefetch(gprs[cpu.PC])
-            gprs[rd] = gprs[rd] ^ gprs[rm]
+            gprs[rd] = (gprs[rd] ^ gprs[rm]) & 0xffffffff
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             cpu.cpsrN = gprs[rd] >> 31
             cpu.cpsrZ = not (gprs[rd] & 0xffffffff)
         return eor
@@ -386,11 +383,13 @@ class ARMCoreThumb:
         gprs = cpu.gprs
         def lsl():
             cpu.mmu.waitPrefetch(gprs[cpu.PC])
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             if immediate == 0:
                 gprs[rd] = gprs[rm]
             else:
                 cpu.cpsrC = gprs[rm] & (1 << (32 - immediate))
-                gprs[rd] = gprs[rm] << immediate
+                gprs[rd] = (gprs[rm] << immediate) & 0xffffffff
             cpu.cpsrN = gprs[rd] >> 31
             cpu.cpsrZ = not (gprs[rd] & 0xffffffff)
         return lsl
@@ -401,6 +400,8 @@ class ARMCoreThumb:
         def lsl():
             cpu.mmu.waitPrefetch(gprs[cpu.PC])
             rs = gprs[rm] & 0xff
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             if rs:
                 if rs < 32:
                     cpu.cpsrC = gprs[rd] & (1 << (32 - rs))
@@ -420,12 +421,14 @@ class ARMCoreThumb:
         gprs = cpu.gprs
         def lsr():
             cpu.mmu.waitPrefetch(gprs[cpu.PC])
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             if immediate == 0:
                 cpu.cpsrC = gprs[rm] >> 31
                 gprs[rd] = 0
             else:
                 cpu.cpsrC = gprs[rm] & (1 << (immediate - 1))
-                gprs[rd] = gprs[rm] >> immediate
+                gprs[rd] = (gprs[rm] & 0xffffffff) >> immediate
             cpu.cpsrN = 0
             cpu.cpsrZ = not (gprs[rd] & 0xffffffff)
         return lsr
@@ -436,6 +439,8 @@ class ARMCoreThumb:
         def lsr():
             cpu.mmu.waitPrefetch(gprs[cpu.PC])
             rs = gprs[rm] & 0xff
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             if rs:
                 if rs < 32:
                     cpu.cpsrC = gprs[rd] & (1 << (rs - 1))
@@ -456,6 +461,8 @@ class ARMCoreThumb:
         def mov():
             cpu.mmu.waitPrefetch(gprs[cpu.PC])
             gprs[rn] = immediate
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             cpu.cpsrN = immediate >> 31
             cpu.cpsrZ = not (immediate & 0xffffffff)
         return mov
@@ -466,6 +473,7 @@ class ARMCoreThumb:
         def mov():
             cpu.mmu.waitPrefetch(gprs[cpu.PC])
             d = gprs[rn]
+            cpu.lazyFlags = None
             cpu.cpsrN = d >> 31
             cpu.cpsrZ = not (d & 0xffffffff)
             cpu.cpsrC = 0
@@ -493,6 +501,8 @@ class ARMCoreThumb:
                 gprs[rd] = (hi + lo) & 0xffffffff
             else:
                 gprs[rd] *= gprs[rm]
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             cpu.cpsrN = gprs[rd] >> 31
             cpu.cpsrZ = not (gprs[rd] & 0xffffffff)
         return mul
@@ -502,7 +512,9 @@ class ARMCoreThumb:
         gprs = cpu.gprs
         def mvn():
             cpu.mmu.waitPrefetch(gprs[cpu.PC])
-            gprs[rd] = ~gprs[rm]
+            gprs[rd] = ~gprs[rm] & 0xffffffff
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             cpu.cpsrN = gprs[rd] >> 31
             cpu.cpsrZ = not (gprs[rd] & 0xffffffff)
         return mvn
@@ -512,12 +524,11 @@ class ARMCoreThumb:
         gprs = cpu.gprs
         def neg():
             cpu.mmu.waitPrefetch(gprs[cpu.PC])
-            d = -gprs[rm]
-            cpu.cpsrN = d >> 31
-            cpu.cpsrZ = not (d & 0xffffffff)
-            cpu.cpsrC = 0 >= d >> 0
-            cpu.cpsrV = gprs[rm] >> 31 and d >> 31
-            gprs[rd] = d
+            n = 0
+            m = gprs[rm] & 0xffffffff
+            d = n - m
+            cpu.lazyFlags = (cpu.FLAGS_SUB, n, m, d)
+            gprs[rd] = d & 0xffffffff
         return neg
     
     def constructORR(self, rd, rm):
@@ -525,7 +536,9 @@ class ARMCoreThumb:
         gprs = cpu.gprs
         def orr():
             cpu.mmu.waitPrefetch(gprs[cpu.PC])
-            gprs[rd] = gprs[rd] | gprs[rm]
+            gprs[rd] = (gprs[rd] | gprs[rm]) & 0xffffffff
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             cpu.cpsrN = gprs[rd] >> 31
             cpu.cpsrZ = not (gprs[rd] & 0xffffffff)
         return orr
@@ -594,6 +607,8 @@ class ARMCoreThumb:
         def ror():
             cpu.mmu.waitPrefetch(gprs[cpu.PC])
             rs = gprs[rm] & 0xff
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             if rs:
                 r4 = rs & 0x1f
                 if r4 > 0:
@@ -610,13 +625,13 @@ class ARMCoreThumb:
         gprs = cpu.gprs
         def sbc():
             cpu.mmu.waitPrefetch(gprs[cpu.PC])
-            m = (gprs[rm] >> 0) + (1 - cpu.cpsrC)
-            d = (gprs[rd] >> 0) - m
-            cpu.cpsrN = d >> 31
-            cpu.cpsrZ = not (d & 0xffffffff)
-            cpu.cpsrC = gprs[rd] >> 0 >= d >> 0
-            cpu.cpsrV = (gprs[rd] ^ m) >> 31 and (gprs[rd] ^ d) >> 31
-            gprs[rd] = d
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
+            n = gprs[rd] & 0xffffffff
+            m = gprs[rm] & 0xffffffff
+            d = n - m - (0 if cpu.cpsrC else 1)
+            cpu.lazyFlags = (cpu.FLAGS_SUB, n, m, d)
+            gprs[rd] = d & 0xffffffff
         return sbc
     
     def constructSTMIA(self, rn, rs):
@@ -719,12 +734,11 @@ class ARMCoreThumb:
         gprs = cpu.gprs
         def sub():
             cpu.mmu.waitPrefetch(gprs[cpu.PC])
-            d = gprs[rn] - immediate
-            cpu.cpsrN = d >> 31
-            cpu.cpsrZ = not (d & 0xffffffff)
-            cpu.cpsrC = gprs[rn] >> 0 >= immediate
-            cpu.cpsrV = gprs[rn] >> 31 and (gprs[rn] ^ d) >> 31
-            gprs[rd] = d
+            n = gprs[rn] & 0xffffffff
+            m = immediate
+            d = n - m
+            cpu.lazyFlags = (cpu.FLAGS_SUB, n, m, d)
+            gprs[rd] = d & 0xffffffff
         return sub
     
     def constructSUB2(self, rn, immediate):
@@ -732,12 +746,11 @@ class ARMCoreThumb:
         gprs = cpu.gprs
         def sub():
             cpu.mmu.waitPrefetch(gprs[cpu.PC])
-            d = gprs[rn] - immediate
-            cpu.cpsrN = d >> 31
-            cpu.cpsrZ = not (d & 0xffffffff)
-            cpu.cpsrC = gprs[rn] >> 0 >= immediate
-            cpu.cpsrV = gprs[rn] >> 31 and (gprs[rn] ^ d) >> 31
-            gprs[rn] = d
+            n = gprs[rn] & 0xffffffff
+            m = immediate
+            d = n - m
+            cpu.lazyFlags = (cpu.FLAGS_SUB, n, m, d)
+            gprs[rn] = d & 0xffffffff
         return sub
     
     def constructSUB3(self, rd, rn, rm):
@@ -745,12 +758,11 @@ class ARMCoreThumb:
         gprs = cpu.gprs
         def sub():
             cpu.mmu.waitPrefetch(gprs[cpu.PC])
-            d = gprs[rn] - gprs[rm]
-            cpu.cpsrN = d >> 31
-            cpu.cpsrZ = not (d & 0xffffffff)
-            cpu.cpsrC = gprs[rn] >> 0 >= gprs[rm] >> 0
-            cpu.cpsrV = (gprs[rn] ^ gprs[rm]) >> 31 and (gprs[rn] ^ d) >> 31
-            gprs[rd] = d
+            n = gprs[rn] & 0xffffffff
+            m = gprs[rm] & 0xffffffff
+            d = n - m
+            cpu.lazyFlags = (cpu.FLAGS_SUB, n, m, d)
+            gprs[rd] = d & 0xffffffff
         return sub
     
     def constructSWI(self, immediate):
@@ -767,6 +779,8 @@ class ARMCoreThumb:
         def tst():
             cpu.mmu.waitPrefetch(gprs[cpu.PC])
             aluOut = gprs[rd] & gprs[rm]
+            if cpu.lazyFlags:
+                cpu.resolveFlags()
             cpu.cpsrN = aluOut >> 31
             cpu.cpsrZ = not (aluOut & 0xffffffff)
         return tst
\ No newline at end of file
@@ -0,0 +1,66 @@
+class GameBoyAdvanceTimer:
+    # The counter is never stepped: it is derived from the cycle the timer was last
+    # rebased at, so reads and overflow times are plain arithmetic
+    __slots__ = ('number', 'previous', 'reload', 'prescaleBits', 'countUp', 'doIrq', 'enable', 'start', 'counter')
+
+    def __init__(self, number, previous=None):
+        self.number = number
+        self.previous = previous
+        self.reload = 0
+        self.prescaleBits = 0
+        self.countUp = False
+        self.doIrq = False
+        self.enable = False
+        self.start = 0
+        self.counter = 0
+
+    def freeze(self):
+        return {name: getattr(self, name) for name in self.__slots__ if name != 'previous'}
+
+    def defrost(self, frost):
+        for name in self.__slots__:
+            if name != 'previous':
+                setattr(self, name, frost[name])
+
+    def cascades(self):
+        return self.countUp and self.previous is not None
+
+    def ticks(self, cycles):
+        # Increments received since start
+        if not self.enable:
+            return 0
+        if self.cascades():
+            return self.previous.overflows(cycles) - self.previous.overflows(self.start)
+        return (cycles - self.start) >> self.prescaleBits
+
+    def tickTime(self, ticks):
+        # Cycle at which the given number of increments since start has been received
+        if not self.enable:
+            return float('inf')
+        if self.cascades():
+            return self.previous.overflowTime(self.previous.overflows(self.start) + ticks)
+        return self.start + (ticks << self.prescaleBits)
+
+    def overflows(self, cycles):
+        value = self.counter + self.ticks(cycles)
+        if value < 0x10000:
+            return 0
+        return 1 + (value - 0x10000) // (0x10000 - self.reload)
+
+    def overflowTime(self, overflow):
+        return self.tickTime(0x10000 - self.counter + (overflow - 1) * (0x10000 - self.reload))
+
+    def read(self, cycles):
+        value = self.counter + self.ticks(cycles)
+        if value < 0x10000:
+            return value
+        return self.reload + (value - 0x10000) % (0x10000 - self.reload)
+
+    def rebase(self, cycles, value):
+        # Folds the elapsed increments into counter; value must be read() at cycles
+        if self.enable:
+            if self.cascades():
+                self.start = cycles
+            else:
+                self.start += self.ticks(cycles) << self.prescaleBits
+        self.counter = value